@@ -0,0 +1,30 @@
+# Compare the exact (scipy.special.expi) and the fast (rational approximation) evaluation of the layer
+# transmission in PROSPECT. The fast path is meant for large look up tables where an error below 1e-7 in the
+# layer transmission is acceptable.
+import timeit
+
+import numpy as np
+
+import pyrism
+
+# We simulate 2000 leaves with random parameters within the usual ranges.
+n = 2000
+rs = np.random.RandomState(0)
+
+N = rs.uniform(1, 3, n)
+Cab = rs.uniform(0, 100, n)
+Cxc = rs.uniform(0, 25, n)
+Cbr = rs.uniform(0, 1, n)
+Cw = rs.uniform(0.001, 0.05, n)
+Cm = rs.uniform(0.001, 0.02, n)
+
+exact = pyrism.PROSPECT.batch(N, Cab, Cxc, Cbr, Cw, Cm, tau_method='exact')
+fast = pyrism.PROSPECT.batch(N, Cab, Cxc, Cbr, Cw, Cm, tau_method='fast')
+
+print("Maximum absolute difference in ks: {0:.2e}".format(np.abs(exact.ks - fast.ks).max()))
+print("Maximum absolute difference in kt: {0:.2e}".format(np.abs(exact.kt - fast.kt).max()))
+
+# Now we measure the run time of both methods.
+for method in ['exact', 'fast']:
+    time = timeit.timeit(lambda: pyrism.PROSPECT.batch(N, Cab, Cxc, Cbr, Cw, Cm, tau_method=method), number=3) / 3
+    print("tau_method='{0}': {1:.3f} s for {2} leaves".format(method, time, n))
@@ -1,3 +1,5 @@
-from .core import (ReflectanceResult, EmissivityResult, SailResult)
+from .core import (ReflectanceResult, EmissivityResult, SailResult, Sensor, SENSORS, register_sensor,
+                   VegetationIndices, INDICES, register_index, solar_position, sun_sensor_geometry)
 from .models import (VolScatt, LIDF, PROSPECT, Rayleigh, Mie, DielConstant, CorrFunc, exponential, gaussian, xpower,
-                     I2EM, LSM, SAIL)
+                     I2EM, LSM, SAIL, SAILPlan, CanopyGeometry, PROSAIL, PROSPECTInversion, LUT,
+                     AngularGrid, parallel_map)
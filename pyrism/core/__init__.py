@@ -1,3 +1,6 @@
 from ._core import Kernel, Scattering
+from .sensors import Sensor, SENSORS, register_sensor, wavelength_index
+from .indices import VegetationIndices, VegetationIndex, INDICES, register_index
+from .solar import julian_day, solar_position, sun_sensor_geometry
 from .auxiliary import (ReflectanceResult, EmissivityResult, SailResult, BRF, BSC, BRDF, dB, sec,
-                        cot, rad, align_all, load_param, linear)
+                        cot, rad, align_all, asarrays, load_param, linear, exp1_approx, lazy_property)
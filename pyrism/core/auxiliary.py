@@ -96,7 +96,8 @@ class SailResult(dict):
     Note
     ----
     All returns have in addition the attributes `L8.Bx` and `ASTER.Bx`. L8 is the Landsat 8 average reflectance values
-    for Bx band (B2 until B7). `ASTER` is the ASTER average reflectance for Bx band (B1 until B9).
+    for Bx band (B2 until B7). `ASTER` is the ASTER average reflectance for Bx band (B1 until B9). The band values are
+    computed on first access (see SailResult.defer).
 
     Notes
     -----
@@ -119,6 +120,31 @@ class SailResult(dict):
     __setattr__ = dict.__setitem__
     __delattr__ = dict.__delitem__
 
+    def __missing__(self, key):
+        try:
+            function = self.__dict__['_deferred'].pop(key)
+        except KeyError:
+            raise KeyError(key)
+
+        self[key] = function()
+        return self[key]
+
+    def defer(self, **kwargs):
+        """
+        Register attributes that are computed by the given callables on first access. The result is cached.
+
+        Parameters
+        ----------
+        **kwargs : callable
+            Callables without arguments.
+
+        Returns
+        -------
+        self
+        """
+        self.__dict__.setdefault('_deferred', {}).update(kwargs)
+        return self
+
     def __repr__(self):
         if self.keys():
             m = max(map(len, list(self.keys()))) + 1
@@ -128,7 +154,7 @@ class SailResult(dict):
             return self.__class__.__name__ + "()"
 
     def __dir__(self):
-        return list(self.keys())
+        return list(self.keys()) + list(self.__dict__.get('_deferred', {}).keys())
 
 
 class EmissivityResult(dict):
@@ -179,6 +205,25 @@ class EmissivityResult(dict):
         return list(self.keys())
 
 
+class lazy_property(object):
+    """
+    Decorator for attributes that are computed on first access. The value is stored in the instance dictionary, so
+    the function runs only once. Deleting the attribute resets it.
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self.__name__ = function.__name__
+        self.__doc__ = function.__doc__
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        value = instance.__dict__[self.__name__] = self.function(instance)
+        return value
+
+
 def rad(angle):
     """
     Convert degrees to radians.
@@ -234,6 +279,42 @@ def linear(x):
     return 10 ** (x / 10)
 
 
+def exp1_approx(x):
+    """
+    Exponential integral E1(x) for x > 0 from the rational approximations of Abramowitz and Stegun (1964).
+
+    Parameters
+    ----------
+    x : int, float or array_like
+        Positive argument.
+
+    Returns
+    -------
+    E1 value : array_like
+
+    Note
+    ----
+    For 0 < x <= 1 the polynomial 5.1.53 is used (absolute error below 3e-7) and for x > 1 the rational
+    function 5.1.56 (relative error below 5e-8). In terms of the PROSPECT layer transmission
+    tau = (1 - x) exp(-x) + x^2 E1(x) the maximum error is below 1e-7.
+
+    """
+    x = np.asarray(x, dtype=np.float64)
+    result = np.empty_like(x)
+
+    small = x <= 1.
+    xs = x[small]
+    result[small] = (((((1.07857e-3 * xs - 9.76004e-3) * xs + 5.519968e-2) * xs - 0.24991055) * xs + 0.99999193)
+                     * xs - 0.57721566) - np.log(xs)
+
+    xl = x[~small]
+    num = (((xl + 8.5733287401) * xl + 18.0590169730) * xl + 8.6347608925) * xl + 0.2677737343
+    den = (((xl + 9.5733223454) * xl + 25.6329561486) * xl + 21.0996530827) * xl + 3.9584969228
+    result[~small] = num / (den * xl) * np.exp(-xl)
+
+    return result
+
+
 def BRDF(BSC, iza, vza, angle_unit='RAD'):
     """
     Convert a Radar Backscatter Coefficient (BSC) into a BRDF.
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+import sys
+from collections import namedtuple, OrderedDict
+
+import numpy as np
+
+from .auxiliary import Memorize
+from .sensors import Sensor
+
+# python 3.6 comparability
+if sys.version_info < (3, 0):
+    string_types = basestring
+else:
+    string_types = str
+
+# A vegetation index is a dict of bands {name: (lower, upper)} with the band limits in [nm] and a formula that
+# computes the index from the band values (dict with dot access).
+VegetationIndex = namedtuple('VegetationIndex', 'bands formula')
+
+# Catalogue of the available vegetation indices. The keys are the names of the indices.
+INDICES = {}
+
+# Engines of the catalogue indices (see VegetationIndices.get) as least recently used cache. The keys are (names,
+# wavelengths). The cache is cleared if the catalogue changes.
+_engine_cache = OrderedDict()
+_ENGINE_CACHE_SIZE = 32
+
+
+def register_index(name, bands, formula):
+    """
+    Add a vegetation index to the catalogue INDICES. An existing index with the same name is replaced.
+
+    Parameters
+    ----------
+    name : str
+        Name of the index.
+    bands : dict
+        Bands {band name: (lower, upper)} with the band limits in [nm]. Both limits are included.
+    formula : callable
+        Function that computes the index from the band values. The argument is a dict with dot access with the band
+        names as keys, e.g. lambda b: (b.nir - b.red) / (b.nir + b.red).
+
+    Returns
+    -------
+    index : VegetationIndex
+    """
+    INDICES[name] = VegetationIndex(dict((key, tuple(value)) for key, value in bands.items()), formula)
+    _engine_cache.clear()
+
+    return INDICES[name]
+
+
+class VegetationIndices(object):
+    """
+    Compute vegetation indices for many spectra at once.
+
+    All bands of the selected indices are integrated with one weight matrix (see pyrism.core.Sensor), so the
+    spectra are only read once. The formulas then work on the band values of all spectra.
+
+    Parameters
+    ----------
+    names : str or tuple of str, optional
+        Names of the indices in the catalogue INDICES or in custom. The default (None) are all indices of the
+        catalogue.
+    wavelengths : array_like, optional
+        Wavelengths in [nm] of the spectra. The default (None) is the continuous range from 400 until 2500 nm.
+    custom : dict, optional
+        Additional indices {name: (bands, formula)} (see register_index). An index with the name of a catalogue
+        index replaces it.
+
+    Returns
+    -------
+    All returns are attributes!
+    names : tuple
+        Names of the indices (columns of the output).
+    sensor : Sensor
+        Sensor with the bands of the indices.
+
+    Note
+    ----
+    The catalogue contains:
+        * NDVI: (nir - red) / (nir + red) with the Landsat 8 bands B4 and B5.
+        * EVI: 2.5 * (nir - red) / (nir + 6 * red - 7.5 * blue + 1) with the Landsat 8 bands B2, B4 and B5.
+        * NDWI: (nir - swir) / (nir + swir) at 860 and 1240 nm (Gao).
+        * NDRE: (nir - red_edge) / (nir + red_edge) at 790 and 720 nm.
+        * CIre: nir / red_edge - 1 at 770 - 800 and 720 - 730 nm (Gitelson).
+        * MTCI: (b10 - b9) / (b9 - b8) with the MERIS bands b8, b9 and b10.
+        * REIP: 700 + 40 * ((r670 + r780) / 2 - r700) / (r740 - r700) (linear four point interpolation).
+
+    Examples
+    --------
+    >>> engine = VegetationIndices(('NDVI', 'EVI'))
+    >>> values = engine(ks)  # ks with shape (M, 2101), values with shape (M, 2)
+
+    See Also
+    --------
+    VegetationIndices.get
+
+    """
+
+    def __init__(self, names=None, wavelengths=None, custom=None):
+        self.catalogue = dict(INDICES)
+
+        if custom is not None:
+            self.catalogue.update((name, VegetationIndex(*value)) for name, value in custom.items())
+
+        self.single = isinstance(names, string_types)
+
+        if names is None:
+            self.names = tuple(sorted(self.catalogue))
+        elif self.single:
+            self.names = (names,)
+        else:
+            self.names = tuple(names)
+
+        for name in self.names:
+            if name not in self.catalogue:
+                raise ValueError("Unknown index {0}. Possible indices are: {1}".format(
+                    str(name), ', '.join(sorted(self.catalogue))))
+
+        limits = sorted(set(limit for name in self.names for limit in self.catalogue[name].bands.values()))
+
+        self.columns = dict((limit, i) for i, limit in enumerate(limits))
+        self.sensor = Sensor.boxcar('indices', ['{0}-{1}'.format(*limit) for limit in limits], limits)
+        self.wavelengths = wavelengths
+
+    @classmethod
+    def get(cls, names=None, wavelengths=None):
+        """
+        Engine for indices of the catalogue. The engines and their band weights are cached per names and
+        wavelength grid (the _ENGINE_CACHE_SIZE most recently used engines), so repeated calls (e.g.
+        PROSPECT.indices) do not build the weights again.
+
+        Parameters
+        ----------
+        names, wavelengths
+            See VegetationIndices.
+
+        Returns
+        -------
+        engine : VegetationIndices
+        """
+        if wavelengths is not None:
+            wavelengths = np.asarray(wavelengths).flatten()
+
+        key = (names if names is None or isinstance(names, string_types) else tuple(names),
+               None if wavelengths is None else tuple(wavelengths.tolist()))
+
+        try:
+            engine = _engine_cache.pop(key)
+        except KeyError:
+            engine = cls(names, wavelengths)
+
+            if len(_engine_cache) >= _ENGINE_CACHE_SIZE:
+                _engine_cache.popitem(last=False)
+
+        _engine_cache[key] = engine
+        return engine
+
+    def __call__(self, spectra):
+        """
+        Compute the indices.
+
+        Parameters
+        ----------
+        spectra : array_like
+            Reflectance with shape (..., n_wavelengths), e.g. (M, n_wavelengths).
+
+        Returns
+        -------
+        indices : ndarray
+            Indices with shape (..., n_indices). If names is a single string the last axis is removed.
+
+        """
+        bands = self.sensor(np.asarray(spectra), self.wavelengths)
+        result = np.empty(bands.shape[:-1] + (len(self.names),))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for i, name in enumerate(self.names):
+                index = self.catalogue[name]
+                values = Memorize((key, bands[..., self.columns[limit]]) for key, limit in index.bands.items())
+                result[..., i] = index.formula(values)
+
+        if self.single:
+            return result[..., 0]
+        else:
+            return result
+
+
+register_index('NDVI', dict(red=(636, 673), nir=(851, 879)),
+               lambda b: (b.nir - b.red) / (b.nir + b.red))
+
+register_index('EVI', dict(blue=(452, 512), red=(636, 673), nir=(851, 879)),
+               lambda b: 2.5 * (b.nir - b.red) / (b.nir + 6 * b.red - 7.5 * b.blue + 1))
+
+register_index('NDWI', dict(nir=(855, 865), swir=(1235, 1245)),
+               lambda b: (b.nir - b.swir) / (b.nir + b.swir))
+
+register_index('NDRE', dict(red_edge=(715, 725), nir=(785, 795)),
+               lambda b: (b.nir - b.red_edge) / (b.nir + b.red_edge))
+
+register_index('CIre', dict(red_edge=(720, 730), nir=(770, 800)),
+               lambda b: b.nir / b.red_edge - 1)
+
+register_index('MTCI', dict(b8=(678, 685), b9=(704, 713), b10=(750, 757)),
+               lambda b: (b.b10 - b.b9) / (b.b9 - b.b8))
+
+register_index('REIP', dict(r670=(668, 672), r700=(698, 702), r740=(738, 742), r780=(778, 782)),
+               lambda b: 700 + 40 * ((b.r670 + b.r780) / 2 - b.r700) / (b.r740 - b.r700))
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+import numpy as np
+
+# Wavelength grid in [nm] on which the spectral response functions and the spectral library are defined.
+WAVELENGTHS = np.arange(400, 2501)
+
+
+def wavelength_index(wavelengths):
+    """
+    Index of wavelengths within the continuous 400 - 2500 nm grid (1 nm spacing) WAVELENGTHS of the spectral
+    library and the spectral response functions.
+
+    Parameters
+    ----------
+    wavelengths : int, float or array_like
+        Wavelengths in [nm]. All values must be integers between 400 and 2500 without duplicates.
+
+    Returns
+    -------
+    index : ndarray
+        Integer index of the wavelengths in WAVELENGTHS.
+
+    """
+    wavelengths = np.asarray(wavelengths, dtype=np.float64).flatten()
+    index = np.rint(wavelengths - WAVELENGTHS[0]).astype(int)
+
+    if np.any(np.abs(wavelengths - WAVELENGTHS[0] - index) > 1e-6) or np.any(index < 0) or \
+            np.any(index >= len(WAVELENGTHS)):
+        raise ValueError("wavelengths must be integers between 400 and 2500 nm.")
+
+    if len(np.unique(index)) != len(index):
+        raise ValueError("wavelengths must not contain duplicates.")
+
+    return index
+
+
+class Sensor(object):
+    """
+    Spectral response functions (SRF) of a multispectral sensor as a (n_bands, n_wavelengths) weight matrix.
+
+    The SRFs are defined on the continuous grid from 400 until 2500 nm and every row is normalized to one, so the
+    band values of spectra with shape (..., n_wavelengths) are a single matrix multiplication. The weights for other
+    wavelength grids (see the wavelengths option of PROSPECT, LSM and SAIL) are the SRFs at these wavelengths,
+    normalized again. Bands without any wavelength in the grid are NaN.
+
+    Parameters
+    ----------
+    name : str
+        Name of the sensor.
+    bands : tuple of str
+        Names of the bands.
+    response : array_like
+        Spectral response with shape (n_bands, 2101) from 400 until 2500 nm.
+
+    Returns
+    -------
+    All returns are attributes!
+    name : str
+        Name of the sensor.
+    bands : tuple
+        Names of the bands.
+    response : ndarray
+        Normalized spectral response with shape (n_bands, 2101).
+
+    See Also
+    --------
+    Sensor.boxcar
+    Sensor.gaussian
+    Sensor.tabulated
+
+    """
+
+    def __init__(self, name, bands, response):
+        response = np.array(response, dtype=np.float64)
+
+        if response.shape != (len(bands), len(WAVELENGTHS)):
+            raise AssertionError("response must have the shape (n_bands, n_wavelengths) = ({0}, {1}). The actual "
+                                 "shape is {2}".format(str(len(bands)), str(len(WAVELENGTHS)), str(response.shape)))
+
+        if np.any(response < 0):
+            raise ValueError("The spectral response must not be negative.")
+
+        self.name = name
+        self.bands = tuple(bands)
+        self.response = self.__normalize(response)
+        self.response.flags.writeable = False
+
+        self.__weights = {}
+
+    def __repr__(self):
+        return "Sensor('{0}', bands={1})".format(self.name, self.bands)
+
+    @staticmethod
+    def __normalize(response):
+        total = response.sum(axis=1, keepdims=True)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(total > 0, response / total, np.nan)
+
+    @classmethod
+    def boxcar(cls, name, bands, limits):
+        """
+        Sensor with rectangular SRFs.
+
+        Parameters
+        ----------
+        name : str
+            Name of the sensor.
+        bands : tuple of str
+            Names of the bands.
+        limits : tuple
+            Lower and upper limit (lower, upper) in [nm] for every band. Both limits are included.
+
+        Returns
+        -------
+        Sensor instance
+
+        """
+        limits = np.asarray(limits, dtype=np.float64)
+        response = (WAVELENGTHS >= limits[:, 0:1]) & (WAVELENGTHS <= limits[:, 1:2])
+
+        return cls(name, bands, response)
+
+    @classmethod
+    def gaussian(cls, name, bands, centers, fwhm):
+        """
+        Sensor with Gaussian SRFs.
+
+        Parameters
+        ----------
+        name : str
+            Name of the sensor.
+        bands : tuple of str
+            Names of the bands.
+        centers, fwhm : array_like
+            Center wavelength and full width at half maximum in [nm] of every band.
+
+        Returns
+        -------
+        Sensor instance
+
+        """
+        centers = np.asarray(centers, dtype=np.float64)[:, np.newaxis]
+        sigma = np.asarray(fwhm, dtype=np.float64)[:, np.newaxis] / (2 * np.sqrt(2 * np.log(2)))
+
+        return cls(name, bands, np.exp(-0.5 * ((WAVELENGTHS - centers) / sigma) ** 2))
+
+    @classmethod
+    def tabulated(cls, name, bands, wavelengths, response):
+        """
+        Sensor with tabulated SRFs, e.g. from the sensor documentation. The SRFs are linearly interpolated onto the
+        1 nm grid and are zero outside of the tabulated wavelengths.
+
+        Parameters
+        ----------
+        name : str
+            Name of the sensor.
+        bands : tuple of str
+            Names of the bands.
+        wavelengths : array_like
+            Ascending wavelengths in [nm] of the table with shape (n,).
+        response : array_like
+            Spectral response with shape (n_bands, n).
+
+        Returns
+        -------
+        Sensor instance
+
+        """
+        wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        response = np.atleast_2d(np.asarray(response, dtype=np.float64))
+
+        return cls(name, bands, [np.interp(WAVELENGTHS, wavelengths, item, left=0, right=0) for item in response])
+
+    def weights(self, wavelengths=None):
+        """
+        Weight matrix of the sensor for a wavelength grid.
+
+        Parameters
+        ----------
+        wavelengths : array_like, optional
+            Wavelengths in [nm] (integers between 400 and 2500 without duplicates, see wavelength_index). The
+            default (None) is the continuous range from 400 until 2500 nm.
+
+        Returns
+        -------
+        weights : ndarray
+            Read only array with shape (n_bands, n_wavelengths). The matrices are cached per grid.
+
+        """
+        if wavelengths is None:
+            return self.response
+
+        index = wavelength_index(wavelengths)
+
+        if len(index) == len(WAVELENGTHS) and np.all(index == np.arange(len(WAVELENGTHS))):
+            return self.response
+
+        key = tuple(index.tolist())
+
+        try:
+            return self.__weights[key]
+        except KeyError:
+            weights = self.__normalize(np.nan_to_num(self.response[:, index]))
+            weights.flags.writeable = False
+
+            self.__weights[key] = weights
+            return weights
+
+    def __call__(self, spectra, wavelengths=None):
+        """
+        Simulate the band values of spectra.
+
+        Parameters
+        ----------
+        spectra : array_like
+            Spectra with shape (..., n_wavelengths).
+        wavelengths : array_like, optional
+            Wavelengths in [nm] of the spectra. The default (None) is the continuous range from 400 until 2500 nm.
+
+        Returns
+        -------
+        bands : ndarray
+            Band values with shape (..., n_bands).
+
+        """
+        return np.dot(spectra, self.weights(wavelengths).T)
+
+
+# Registry of the available sensors. The keys are the names of the sensors.
+SENSORS = {}
+
+
+def register_sensor(sensor):
+    """
+    Add a sensor to the registry SENSORS. An existing sensor with the same name is replaced.
+
+    Parameters
+    ----------
+    sensor : Sensor
+        Sensor instance.
+
+    Returns
+    -------
+    sensor : Sensor
+    """
+    SENSORS[sensor.name] = sensor
+    return sensor
+
+
+# Landsat 8 OLI bands B2 - B7.
+register_sensor(Sensor.boxcar('L8', ('B2', 'B3', 'B4', 'B5', 'B6', 'B7'),
+                              [(452, 512), (533, 590), (636, 673), (851, 879), (1566, 1651), (2107, 2294)]))
+
+# ASTER VNIR and SWIR bands B1 - B9.
+register_sensor(Sensor.boxcar('ASTER', ('B1', 'B2', 'B3', 'B4', 'B5', 'B6', 'B7', 'B8', 'B9'),
+                              [(520, 600), (630, 690), (760, 860), (1600, 1700), (2145, 2185), (2185, 2225),
+                               (2235, 2285), (2295, 2365), (2360, 2430)]))
+
+# Sentinel-2A MSI bands B1 - B12 (central wavelength and bandwidth).
+register_sensor(Sensor.gaussian('S2', ('B1', 'B2', 'B3', 'B4', 'B5', 'B6', 'B7', 'B8', 'B8A', 'B9', 'B10', 'B11',
+                                       'B12'),
+                                [442.7, 492.4, 559.8, 664.6, 704.1, 740.5, 782.8, 832.8, 864.7, 945.1, 1373.5,
+                                 1613.7, 2202.4],
+                                [21, 66, 36, 31, 15, 15, 20, 106, 21, 20, 31, 91, 175]))
+
+# MODIS land bands B1 - B7 (central wavelength and bandwidth).
+register_sensor(Sensor.gaussian('MODIS', ('B1', 'B2', 'B3', 'B4', 'B5', 'B6', 'B7'),
+                                [645, 858.5, 469, 555, 1240, 1640, 2130],
+                                [50, 35, 20, 20, 20, 24, 50]))
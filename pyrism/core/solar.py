@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+import numpy as np
+
+from .auxiliary import Memorize
+
+# Julian day of the unix epoch 1970-01-01 00:00 UTC.
+JD_UNIX_EPOCH = 2440587.5
+
+
+def julian_day(time):
+    """
+    Julian day of UTC timestamps.
+
+    Parameters
+    ----------
+    time : array_like
+        UTC timestamps as numpy.datetime64, datetime.datetime or ISO 8601 strings (e.g. '2018-06-21T10:30').
+
+    Returns
+    -------
+    jd : ndarray
+        Julian day with the shape of time.
+
+    """
+    time = np.asarray(time, dtype='datetime64[ns]')
+    return (time - np.datetime64('1970-01-01T00:00', 'ns')) / np.timedelta64(1, 'D') + JD_UNIX_EPOCH
+
+
+def solar_position(time, latitude, longitude, refraction=False):
+    """
+    Position of the sun with the equations of the NOAA solar calculator (after Meeus). The accuracy is about
+    0.01 degrees between the years 1800 and 2100.
+
+    All parameters are broadcast against each other, e.g. timestamps with shape (T, 1) and pixels with shape (P,)
+    give results with shape (T, P).
+
+    Parameters
+    ----------
+    time : array_like
+        UTC timestamps (see julian_day).
+    latitude : int, float or array_like
+        Latitude in [DEG] (positive to the north).
+    longitude : int, float or array_like
+        Longitude in [DEG] (positive to the east).
+    refraction : bool, optional
+        Correct the zenith angle for the atmospheric refraction (apparent instead of geometric position).
+        Default is False.
+
+    Returns
+    -------
+    Result : dict (with dot access)
+        * zenith : Solar zenith angle in [DEG].
+        * azimuth : Solar azimuth angle in [DEG] clockwise from north.
+        * declination : Solar declination in [DEG].
+        * equation_of_time : Equation of time in [MIN].
+
+    """
+    time = np.asarray(time, dtype='datetime64[ns]')
+    time, latitude, longitude = np.broadcast_arrays(time, np.asarray(latitude, dtype=np.float64),
+                                                    np.asarray(longitude, dtype=np.float64))
+
+    jc = (julian_day(time) - 2451545.) / 36525.
+    minutes = (time - time.astype('datetime64[D]')) / np.timedelta64(1, 'm')
+
+    # Mean longitude, mean anomaly and eccentricity of the orbit
+    l0 = np.mod(280.46646 + jc * (36000.76983 + jc * 0.0003032), 360.)
+    m = 357.52911 + jc * (35999.05029 - 0.0001537 * jc)
+    e = 0.016708634 - jc * (0.000042037 + 0.0000001267 * jc)
+
+    # Equation of center, apparent longitude and obliquity of the ecliptic
+    c = np.sin(np.radians(m)) * (1.914602 - jc * (0.004817 + 0.000014 * jc)) + \
+        np.sin(np.radians(2. * m)) * (0.019993 - 0.000101 * jc) + np.sin(np.radians(3. * m)) * 0.000289
+    omega = np.radians(125.04 - 1934.136 * jc)
+    apparent_longitude = np.radians(l0 + c - 0.00569 - 0.00478 * np.sin(omega))
+
+    obliquity = 23. + (26. + (21.448 - jc * (46.815 + jc * (0.00059 - jc * 0.001813))) / 60.) / 60.
+    obliquity = np.radians(obliquity + 0.00256 * np.cos(omega))
+
+    declination = np.arcsin(np.sin(obliquity) * np.sin(apparent_longitude))
+
+    y = np.tan(obliquity / 2.) ** 2.
+    l0, m = np.radians(l0), np.radians(m)
+    equation_of_time = 4. * np.degrees(y * np.sin(2. * l0) - 2. * e * np.sin(m) +
+                                       4. * e * y * np.sin(m) * np.cos(2. * l0) -
+                                       0.5 * y ** 2. * np.sin(4. * l0) - 1.25 * e ** 2. * np.sin(2. * m))
+
+    # Hour angle from the true solar time
+    true_solar_time = np.mod(minutes + equation_of_time + 4. * longitude, 1440.)
+    hour_angle = np.radians(true_solar_time / 4. - 180.)
+
+    phi = np.radians(latitude)
+    cos_zenith = np.sin(phi) * np.sin(declination) + np.cos(phi) * np.cos(declination) * np.cos(hour_angle)
+    zenith = np.arccos(np.clip(cos_zenith, -1., 1.))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cos_azimuth = (np.sin(phi) * np.cos(zenith) - np.sin(declination)) / (np.cos(phi) * np.sin(zenith))
+
+    azimuth = np.degrees(np.arccos(np.clip(np.nan_to_num(cos_azimuth), -1., 1.)))
+    azimuth = np.where(hour_angle > 0, np.mod(azimuth + 180., 360.), np.mod(540. - azimuth, 360.))
+
+    zenith = np.degrees(zenith)
+
+    if refraction:
+        zenith = zenith - _refraction(90. - zenith)
+
+    return Memorize(zenith=zenith, azimuth=azimuth, declination=np.degrees(declination),
+                    equation_of_time=equation_of_time)
+
+
+def _refraction(elevation):
+    """
+    Atmospheric refraction in [DEG] for a solar elevation in [DEG] (NOAA solar calculator).
+    """
+    te = np.tan(np.radians(np.where(np.abs(elevation) < 89., elevation, 45.)))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correction = np.where(elevation > 5., 58.1 / te - 0.07 / te ** 3. + 0.000086 / te ** 5.,
+                              np.where(elevation > -0.575,
+                                       1735. + elevation * (-518.2 + elevation * (103.4 + elevation *
+                                                                                   (-12.79 + elevation * 0.711))),
+                                       -20.772 / te))
+
+    return np.where(elevation > 85., 0., correction / 3600.)
+
+
+def sun_sensor_geometry(time, latitude, longitude, vza=0., vaa=0., refraction=False):
+    """
+    Sun and view geometry in the convention of pyrism.core.Kernel for timestamps, pixels and sensor view angles.
+    The results can be passed directly to the Kernel based models, e.g. SAIL, VolScatt or I2EM.
+
+    Parameters
+    ----------
+    time : array_like
+        UTC timestamps (see julian_day).
+    latitude, longitude : int, float or array_like
+        Latitude and longitude in [DEG].
+    vza : int, float or array_like, optional
+        View zenith angle of the sensor in [DEG]. Default is 0 (nadir).
+    vaa : int, float or array_like, optional
+        View azimuth angle in [DEG] clockwise from north, i.e. the direction from the pixel to the sensor.
+        Default is 0.
+    refraction : bool, optional
+        Correct the solar zenith angle for the atmospheric refraction. Default is False.
+
+    Returns
+    -------
+    Result : dict (with dot access)
+        * iza : Solar zenith angle in [DEG].
+        * vza : View zenith angle in [DEG].
+        * raa : Relative azimuth angle between sun and sensor in [DEG] between 0 and 180. raa = 0 means that the
+          sun and the sensor are on the same side of the pixel (backscattering, hotspot if iza == vza).
+        * saa : Solar azimuth angle in [DEG] clockwise from north.
+
+        All arrays have the broadcast shape of the parameters.
+
+    Examples
+    --------
+    >>> times = np.arange('2018-06-21T06', '2018-06-21T18', np.timedelta64(1, 'h'), dtype='datetime64[m]')
+    >>> geometry = sun_sensor_geometry(times, latitude=48.2, longitude=16.4, vza=10, vaa=100)
+    >>> sail = SAIL(iza=geometry.iza, vza=geometry.vza, raa=geometry.raa, ...)
+
+    """
+    sun = solar_position(time, latitude, longitude, refraction=refraction)
+    vza, vaa = np.asarray(vza, dtype=np.float64), np.asarray(vaa, dtype=np.float64)
+
+    iza, vza, saa, vaa = np.broadcast_arrays(sun.zenith, vza, sun.azimuth, vaa)
+    raa = np.abs(np.mod(saa - vaa + 180., 360.) - 180.)
+
+    return Memorize(iza=np.array(iza), vza=np.array(vza), raa=raa, saa=np.array(saa))
@@ -1,6 +1,10 @@
 from .library import get_data_one, get_data_two
 from .models import (VolScatt, LIDF, PROSPECT, Rayleigh, Mie, DielConstant, CorrFunc, exponential, gaussian, xpower,
-                     I2EM, LSM, SAIL)
+                     I2EM, LSM, SAIL, SAILPlan, CanopyGeometry, PROSAIL)
+from .inversion import PROSPECTInversion
+from .lut import LUT
+from .angular import AngularGrid
+from .parallel import parallel_map
 
 try:
     lib = get_data_two()
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+import json
+import os
+
+import numpy as np
+
+from .models import PROSPECT, LSM, SAIL, CanopyGeometry, OUTPUTS, _library
+from .lut import PROSAIL_PARAMS, CAN_D
+from ..core.auxiliary import Memorize
+
+# Canopy parameters of an angular grid (PROSAIL without the angles).
+GRID_PARAMS = Memorize((name, value) for name, value in PROSAIL_PARAMS.items() if name not in ('iza', 'vza', 'raa'))
+
+
+class AngularGrid(object):
+    """
+    Spectra of PROSAIL for one canopy at the nodes of an angular grid (iza, vza, raa), stored in a memory mapped
+    .npy file.
+
+    An AngularGrid consists of two files with the same base path:
+        * <path>.npy : Spectra with shape (n_iza, n_vza, n_raa, n_wavelengths).
+        * <path>.json : Metadata with the nodes of the axes, the canopy parameters, the product and the wavelength
+          grid.
+
+    Use AngularGrid.build to create a grid. AngularGrid(path) opens an existing grid without loading the data into
+    memory, so a grid can be reused for many scenes with the same canopy.
+
+    Parameters
+    ----------
+    path : str
+        Base path of the grid (without extension).
+
+    Returns
+    -------
+    All returns are attributes!
+    spectra : numpy.memmap
+        Read only spectra with shape (n_iza, n_vza, n_raa, n_wavelengths).
+    iza, vza, raa : ndarray
+        Ascending nodes of the axes in [DEG].
+    params : dict
+        Canopy parameters.
+    product : str
+        Stored product of SAIL (e.g. 'BRF').
+    l : ndarray
+        Wavelengths in [nm].
+    version, lidf_type : str
+        PROSPECT version and LIDF of SAIL.
+
+    See Also
+    --------
+    AngularGrid.build
+    AngularGrid.query
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path + '.json', 'r') as f:
+            meta = json.load(f)
+
+        self.iza = np.asarray(meta['iza'])
+        self.vza = np.asarray(meta['vza'])
+        self.raa = np.asarray(meta['raa'])
+        self.params = meta['params']
+        self.product = meta['product']
+        self.version = meta['version']
+        self.lidf_type = meta['lidf_type']
+        self.l = np.asarray(meta['wavelengths'])
+
+        self.spectra = np.load(path + '.npy', mmap_mode='r')
+
+    @classmethod
+    def build(cls, path, iza, vza, raa, params=None, product='BRF', version='5', wavelengths=None,
+              lidf_type='campbell', chunk_size=256, dtype=np.float32):
+        """
+        Run PROSAIL at all nodes of the grid and write the spectra chunk by chunk into a memory mapped .npy file.
+
+        Parameters
+        ----------
+        path : str
+            Base path of the grid (without extension).
+        iza, vza, raa : array_like
+            Strictly ascending nodes of the axes in [DEG]. raa must be between 0 and 180 degrees, because SAIL is
+            symmetric to the principal plane.
+        params : dict, optional
+            Canopy parameters. Missing parameters are taken from GRID_PARAMS (Can is CAN_D for version 'D').
+        product : {'BRF', 'BRDF', 'BHR', 'DHR', 'HDR'}, optional
+            Product of SAIL that is stored. Default is 'BRF'.
+        version : {'5', 'D'}
+            PROSPECT version. Default is '5'.
+        wavelengths : array_like, optional
+            Wavelengths in [nm]. The default (None) is the continuous range from 400 until 2500 nm.
+        lidf_type : {'verhoef', 'campbell'}, optional
+            LIDF of SAIL. Default is 'campbell'.
+        chunk_size : int, optional
+            Number of nodes that are evaluated with one SAIL run. Default is 256.
+        dtype : numpy.dtype, optional
+            Data type of the stored spectra. Default is float32.
+
+        Returns
+        -------
+        AngularGrid instance
+
+        """
+        params = {} if params is None else dict(params)
+
+        for name in params:
+            if name not in GRID_PARAMS:
+                raise ValueError("Unknown parameter {0}. Possible parameters are: {1}".format(
+                    str(name), ', '.join(GRID_PARAMS)))
+
+        if product not in OUTPUTS or product == 'canopy':
+            raise ValueError("product must be one of 'BRF', 'BRDF', 'BHR', 'DHR' or 'HDR'. The actual product is: "
+                             "{}".format(str(product)))
+
+        axes = [np.asarray(item, dtype=np.float64).flatten() for item in (iza, vza, raa)]
+
+        for name, item in zip(('iza', 'vza', 'raa'), axes):
+            if len(item) > 1 and np.any(np.diff(item) <= 0):
+                raise ValueError("The nodes of {0} must be strictly ascending.".format(name))
+
+        if np.any(axes[2] < 0) or np.any(axes[2] > 180):
+            raise ValueError("The nodes of raa must be between 0 and 180 degrees.")
+
+        defaults = Memorize(GRID_PARAMS, Can=CAN_D) if version == 'D' else GRID_PARAMS
+        values = Memorize((name, float(params.get(name, default))) for name, default in defaults.items())
+        l = _library(wavelengths)[0]
+
+        meta = dict(iza=axes[0].tolist(), vza=axes[1].tolist(), raa=axes[2].tolist(), params=dict(values),
+                    product=product, version=version, lidf_type=lidf_type, wavelengths=[int(item) for item in l])
+
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        shape = tuple(len(item) for item in axes)
+        spectra = np.lib.format.open_memmap(path + '.npy', mode='w+', dtype=dtype, shape=shape + (len(l),))
+        flat = spectra.reshape((-1, len(l)))
+
+        nodes = [item.flatten() for item in np.meshgrid(*axes, indexing='ij')]
+
+        prospect = PROSPECT(N=values.N, Cab=values.Cab, Cxc=values.Cxc, Cbr=values.Cbr, Cw=values.Cw, Cm=values.Cm,
+                            Can=values.Can, version=version, wavelengths=wavelengths)
+        soil = LSM(reflectance=values.reflectance, moisture=values.moisture, wavelengths=wavelengths)
+
+        for start in range(0, len(flat), chunk_size):
+            stop = min(start + chunk_size, len(flat))
+
+            geometry = CanopyGeometry(nodes[0][start:stop], nodes[1][start:stop], nodes[2][start:stop],
+                                      lidf_type=lidf_type, a=values.a, b=values.b, multiangle=True)
+            sail = SAIL.from_geometry(geometry, ks=prospect.ks, kt=prospect.kt, lai=values.lai,
+                                      hotspot=values.hotspot, rho_surface=soil.ref, wavelengths=wavelengths,
+                                      outputs=product)
+
+            flat[start:stop] = getattr(sail, product).ref
+
+        spectra.flush()
+        del spectra, flat
+
+        with open(path + '.json', 'w') as f:
+            json.dump(meta, f, indent=2)
+
+        return cls(path)
+
+    def query(self, iza, vza, raa, method='linear'):
+        """
+        Interpolate the spectra at arbitrary angles.
+
+        Parameters
+        ----------
+        iza, vza, raa : array_like
+            Angles in [DEG] with the same shape (N,) or scalars. The relative azimuth is mapped into the range from
+            0 until 180 degrees.
+        method : {'linear', 'cubic'}, optional
+            * 'linear': Multilinear interpolation between the 8 neighbouring nodes (default).
+            * 'cubic': Catmull-Rom interpolation with the 4 x 4 x 4 neighbouring nodes. Every axis must have at
+              least 4 equally spaced nodes.
+
+        Returns
+        -------
+        Result : dict (with dot access)
+            * ref : Interpolated spectra with shape (N, n_wavelengths) or (n_wavelengths,) for scalar angles.
+            * error : Estimated interpolation error with the same shape as ref. It is the absolute difference
+              between the linear and the cubic interpolation (or the difference between the linear interpolation
+              and the nearest node if the cubic interpolation is not possible). Features that are narrower than the spacing
+              of the nodes (e.g. a small hotspot parameter) are not resolved by the grid and the error is
+              underestimated there.
+
+        """
+        if method not in ('linear', 'cubic'):
+            raise ValueError("method must be 'linear' or 'cubic'. The actual method is: {}".format(str(method)))
+
+        single = np.ndim(iza) == 0 and np.ndim(vza) == 0 and np.ndim(raa) == 0
+        iza, vza, raa = [np.asarray(item, dtype=np.float64).flatten() for item in np.broadcast_arrays(iza, vza, raa)]
+        raa = np.abs((raa + 180.) % 360. - 180.)
+
+        axes = (self.iza, self.vza, self.raa)
+        points = (iza, vza, raa)
+
+        for name, item, nodes in zip(('iza', 'vza', 'raa'), points, axes):
+            if np.any(item < nodes[0]) or np.any(item > nodes[-1]):
+                raise ValueError("{0} must be between {1} and {2} degrees.".format(name, str(nodes[0]),
+                                                                                 str(nodes[-1])))
+
+        cubic = all(len(nodes) >= 4 and np.allclose(np.diff(nodes), nodes[1] - nodes[0]) for nodes in axes)
+
+        if method == 'cubic' and not cubic:
+            raise ValueError("The cubic interpolation needs at least 4 equally spaced nodes on every axis.")
+
+        linear = self.__interpolate(points, 'linear')
+
+        if cubic:
+            other = self.__interpolate(points, 'cubic')
+        else:
+            other = self.__interpolate(points, 'nearest')
+
+        ref = other if method == 'cubic' else linear
+        error = np.abs(other - linear)
+
+        if single:
+            return Memorize(ref=ref[0], error=error[0])
+        else:
+            return Memorize(ref=ref, error=error)
+
+    def __interpolate(self, points, method):
+        """
+        Sum of the weighted neighbouring nodes. Every axis contributes the indices and weights with shape
+        (n_neighbours, N).
+        """
+        stencils = [self.__stencil(item, nodes, method) for item, nodes in zip(points, (self.iza, self.vza,
+                                                                                       self.raa))]
+        result = np.zeros((len(points[0]), self.spectra.shape[-1]))
+
+        for i, wi in zip(*stencils[0]):
+            for j, wj in zip(*stencils[1]):
+                for k, wk in zip(*stencils[2]):
+                    result += (wi * wj * wk)[:, np.newaxis] * self.spectra[i, j, k]
+
+        return result
+
+    @staticmethod
+    def __stencil(x, nodes, method):
+        """
+        Indices and weights of the neighbouring nodes of x on one axis.
+        """
+        n = len(nodes)
+
+        if n == 1:
+            return np.zeros((1, len(x)), dtype=int), np.ones((1, len(x)))
+
+        i = np.clip(np.searchsorted(nodes, x, side='right') - 1, 0, n - 2)
+        t = (x - nodes[i]) / (nodes[i + 1] - nodes[i])
+
+        if method == 'nearest':
+            return np.where(t < 0.5, i, i + 1)[np.newaxis], np.ones((1, len(x)))
+
+        elif method == 'linear':
+            return np.stack((i, i + 1)), np.stack((1. - t, t))
+
+        else:
+            if not np.allclose(np.diff(nodes), nodes[1] - nodes[0]):
+                raise ValueError("The cubic interpolation needs equally spaced nodes.")
+
+            # Catmull-Rom weights of the nodes i - 1, i, i + 1 and i + 2. Nodes outside of the axis are clamped.
+            weights = np.stack((((-t + 2.) * t - 1.) * t / 2.,
+                                ((3. * t - 5.) * t * t + 2.) / 2.,
+                                ((-3. * t + 4.) * t + 1.) * t / 2.,
+                                (t - 1.) * t * t / 2.))
+            index = np.clip(i + np.arange(-1, 3)[:, np.newaxis], 0, n - 1)
+
+            return index, weights
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+import numpy as np
+
+from .models import PROSPECT
+from ..core.auxiliary import Memorize
+
+# Default start values and bounds of the PROSPECT parameters.
+DEFAULT_INITIAL = dict(N=1.5, Cab=40., Cxc=10., Cbr=0.01, Cw=0.01, Cm=0.005, Can=1.)
+DEFAULT_BOUNDS = dict(N=(1., 4.), Cab=(0., 150.), Cxc=(0., 40.), Cbr=(0., 1.), Cw=(1e-5, 0.1), Cm=(1e-5, 0.05),
+                      Can=(1e-3, 40.))
+
+
+class PROSPECTInversion(object):
+    """
+    Invert PROSPECT for many measured leaf spectra at once with a batched Levenberg-Marquardt solver.
+
+    Parameters
+    ----------
+    ks : array_like
+        Measured leaf reflectance with shape (M, n_wavelengths) or (n_wavelengths,).
+    kt : array_like, optional
+        Measured leaf transmittance with the same shape as ks. If None (default) only the reflectance is fitted.
+    initial : dict, optional
+        Start values of the parameters (scalars or arrays of length M). Missing parameters are taken from
+        DEFAULT_INITIAL.
+    bounds : dict, optional
+        Lower and upper bound (lower, upper) of the parameters. Missing parameters are taken from DEFAULT_BOUNDS.
+    fixed : dict, optional
+        Parameters that are not fitted with their values (scalars or arrays of length M), e.g. dict(Cbr=0).
+    alpha : int
+        Mean leaf angle (degrees). Default is 40.
+    version : {'5', 'D'}
+        PROSPECT version. Default is '5'. Can is only fitted for PROSPECT D.
+    wavelengths : array_like, optional
+        Wavelengths in [nm] of the measured spectra. The default (None) is the continuous range from 400 until
+        2500 nm.
+    max_iter : int, optional
+        Maximum number of iterations. Default is 100.
+    tol : float, optional
+        A spectrum is converged if an accepted step reduces the cost by less than tol (relative). Default is 1e-8.
+
+    Returns
+    -------
+    All returns are attributes!
+    names : tuple
+        Names of the fitted parameters.
+    params : dict (with dot access)
+        Fitted parameters (fitted and fixed) with shape (M,).
+    std : dict (with dot access)
+        Standard deviation of the fitted parameters with shape (M,), estimated from the Jacobian and the residual
+        variance at the solution.
+    converged : ndarray
+        Convergence mask with shape (M,).
+    stalled : ndarray
+        Mask with shape (M,) of the spectra for which the solver stopped without convergence, because the damping
+        blew up and no step reduced the cost any more. These spectra are not converged.
+    n_iter : ndarray
+        Number of iterations per spectrum.
+    cost : ndarray
+        Sum of squared residuals per spectrum.
+    ks, kt : ndarray
+        Modelled leaf reflectance and transmittance at the solution with shape (M, n_wavelengths).
+
+    Note
+    ----
+    Every iteration evaluates one PROSPECT.batch for all spectra that are not yet converged. The damping
+    parameter is controlled per spectrum and the parameters are projected onto the bounds after every step.
+
+    See Also
+    --------
+    PROSPECT.batch
+    PROSPECT.jacobian
+
+    """
+
+    def __init__(self, ks, kt=None, initial=None, bounds=None, fixed=None, alpha=40, version='5', wavelengths=None,
+                 max_iter=100, tol=1e-8):
+
+        self.ks_obs = np.atleast_2d(np.asarray(ks, dtype=np.float64))
+        self.kt_obs = None if kt is None else np.atleast_2d(np.asarray(kt, dtype=np.float64))
+
+        if self.kt_obs is not None and self.kt_obs.shape != self.ks_obs.shape:
+            raise AssertionError("ks and kt must have the same shape. The actual shapes are "
+                                 "ks: {0} and kt: {1}".format(str(self.ks_obs.shape), str(self.kt_obs.shape)))
+
+        self.alpha = alpha
+        self.ver = version
+        self.wavelengths = wavelengths
+        self.max_iter = max_iter
+        self.tol = tol
+
+        self.__set_params(initial, bounds, fixed)
+        self.__calc()
+        self.__store()
+
+    def __set_params(self, initial, bounds, fixed):
+        initial = {} if initial is None else initial
+        bounds = {} if bounds is None else bounds
+        self.fixed = {} if fixed is None else dict(fixed)
+
+        all_names = ('N', 'Cab', 'Cxc', 'Cbr', 'Cw', 'Cm', 'Can')
+        if self.ver == '5':
+            self.fixed.setdefault('Can', 0)
+
+        self.names = tuple(name for name in all_names if name not in self.fixed)
+        self.columns = [all_names.index(name) for name in self.names]
+
+        M = len(self.ks_obs)
+        self.x = np.empty((M, len(self.names)))
+        self.lower = np.empty(len(self.names))
+        self.upper = np.empty(len(self.names))
+
+        for i, name in enumerate(self.names):
+            self.lower[i], self.upper[i] = bounds.get(name, DEFAULT_BOUNDS[name])
+            self.x[:, i] = initial.get(name, DEFAULT_INITIAL[name])
+
+        self.x = np.clip(self.x, self.lower, self.upper)
+
+    def __forward(self, x, rows):
+        params = dict((name, np.broadcast_to(value, (len(self.ks_obs),))[rows]) for name, value in
+                      self.fixed.items())
+        params.update((name, x[:, i]) for i, name in enumerate(self.names))
+
+        model = PROSPECT.batch(alpha=self.alpha, version=self.ver, wavelengths=self.wavelengths, **params)
+        jacobian = model.jacobian()
+
+        residual = self.ks_obs[rows] - model.ks
+        J = jacobian.ks[..., self.columns]
+
+        if self.kt_obs is not None:
+            residual = np.concatenate((residual, self.kt_obs[rows] - model.kt), axis=1)
+            J = np.concatenate((J, jacobian.kt[..., self.columns]), axis=1)
+
+        cost = np.sum(residual ** 2, axis=1)
+
+        return model, residual, J, cost
+
+    def __calc(self):
+        M = len(self.x)
+        rows = np.arange(M)
+
+        model, residual, self.J, self.cost = self.__forward(self.x, rows)
+        self.ks, self.kt = np.array(model.ks), np.array(model.kt)
+
+        lam = np.ones(M) * 1e-3
+        self.converged = np.zeros(M, dtype=bool)
+        self.stalled = np.zeros(M, dtype=bool)
+        self.n_iter = np.zeros(M, dtype=int)
+
+        for _ in range(self.max_iter):
+            active = np.where(~self.converged & ~self.stalled)[0]
+            if len(active) == 0:
+                break
+
+            J = self.J[active]
+            JTJ = np.einsum('mnp,mnq->mpq', J, J)
+            gradient = np.einsum('mnp,mn->mp', J, residual[active])
+
+            diagonal = np.einsum('mpp->mp', JTJ)
+            diagonal = np.maximum(diagonal, 1e-12 * np.max(diagonal, axis=1, keepdims=True) + 1e-30)
+            A = JTJ + lam[active, None, None] * diagonal[:, :, None] * np.eye(len(self.names))
+
+            step = np.linalg.solve(A, gradient[..., np.newaxis])[..., 0]
+            # Components of parameters that are held at a bound and point outward do not belong to the projected
+            # step.
+            held = ((self.x[active] <= self.lower) & (step < 0)) | ((self.x[active] >= self.upper) & (step > 0))
+            projected = np.where(held, 0., step)
+            small = np.all(np.abs(projected) <= 1e-12 * (1 + np.abs(self.x[active])), axis=1)
+
+            x = np.clip(self.x[active] + step, self.lower, self.upper)
+
+            model_new, residual_new, J_new, cost_new = self.__forward(x, active)
+
+            accept = cost_new < self.cost[active]
+            improvement = (self.cost[active] - cost_new) / np.maximum(self.cost[active], 1e-30)
+            accepted = active[accept]
+
+            self.x[accepted] = x[accept]
+            self.J[accepted] = J_new[accept]
+            residual[accepted] = residual_new[accept]
+            self.cost[accepted] = cost_new[accept]
+            self.ks[accepted] = model_new.ks[accept]
+            self.kt[accepted] = model_new.kt[accept]
+
+            lam[active] = np.where(accept, lam[active] * 0.1, lam[active] * 10.)
+            self.n_iter[active] += 1
+
+            # A spectrum is converged if an accepted step hardly reduces the cost or if the projected step
+            # vanishes (e.g. the optimum is on a bound). If the damping blows up no step reduces the cost any more
+            # and the spectrum is stalled.
+            self.converged[active] = (accept & (improvement < self.tol)) | small
+            self.stalled[active] = ~self.converged[active] & (lam[active] > 1e10)
+
+    def __store(self):
+        M, P = self.x.shape
+        n_obs = self.J.shape[1]
+
+        JTJ = np.einsum('mnp,mnq->mpq', self.J, self.J)
+        variance = self.cost / max(n_obs - P, 1)
+        covariance = np.linalg.pinv(JTJ) * variance[:, None, None]
+        std = np.sqrt(np.abs(np.einsum('mpp->mp', covariance)))
+
+        self.params = dict((name, np.broadcast_to(value, (M,)).astype(np.float64)) for name, value in
+                           self.fixed.items())
+        self.params.update((name, self.x[:, i]) for i, name in enumerate(self.names))
+        self.params = Memorize(self.params)
+        self.std = Memorize((name, std[:, i]) for i, name in enumerate(self.names))
+
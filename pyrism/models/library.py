@@ -7,6 +7,8 @@ from collections import namedtuple
 import numpy as np
 import pkg_resources
 
+from ..core.sensors import wavelength_index
+
 path = 'pyrism/models'  # os.path.split(__file__)
 
 # Create a header
@@ -116,3 +118,23 @@ def get_data_two():
     spectra = Spectra(p5s, pds, soils, lights)
 
     return spectra
+
+
+def subset(spectra, index):
+    """
+    Select wavelengths of all spectra in the spectral library.
+
+    Parameters
+    ----------
+    spectra : namedtuple
+        Spectral library from get_data_one or get_data_two.
+    index : array_like
+        Index of the wavelengths (see pyrism.core.sensors.wavelength_index).
+
+    Returns
+    -------
+    spectral : namedtuple
+        Named tuple with the same structure as spectra.
+
+    """
+    return type(spectra)(*[type(group)(*[item[index] for item in group]) for group in spectra])
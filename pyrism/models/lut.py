@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+import json
+import os
+from functools import partial
+
+import numpy as np
+
+from .models import PROSPECT, PROSAIL, CanopyGeometry, _library
+from .parallel import parallel_map
+from ..core.auxiliary import Memorize
+
+# Parameters and default values of the models that can be stored in a LUT.
+PROSPECT_PARAMS = Memorize(N=1.5, Cab=40., Cxc=8., Cbr=0., Cw=0.01, Cm=0.009, Can=0.)
+PROSAIL_PARAMS = Memorize(N=1.5, Cab=40., Cxc=8., Cbr=0., Cw=0.01, Cm=0.009, Can=0., reflectance=1., moisture=1.,
+                          lai=3., hotspot=0.01, a=57., b=0., iza=30., vza=10., raa=0.)
+
+# Default anthocyanin content of PROSPECT D, which needs Can != 0.
+CAN_D = 1.
+
+# Quantities of the models that are stored in a LUT.
+QUANTITIES = dict(prospect=('ks', 'kt'), prosail=('BRF',))
+
+
+def evaluate(model, params, fixed=None, version='5', wavelengths=None, lidf_type='campbell'):
+    """
+    Evaluate PROSPECT or PROSAIL for a table of parameters.
+
+    Parameters
+    ----------
+    model : {'prospect', 'prosail'}
+        Model to evaluate.
+    params : dict
+        Parameter arrays of length M (at least one). Missing parameters are taken from fixed or from the defaults
+        (PROSPECT_PARAMS, PROSAIL_PARAMS, CAN_D for version 'D').
+    fixed : dict, optional
+        Scalar parameters.
+    version : {'5', 'D'}
+        PROSPECT version. Default is '5'.
+    wavelengths : array_like, optional
+        Wavelengths in [nm]. The default (None) is the continuous range from 400 until 2500 nm.
+    lidf_type : {'verhoef', 'campbell'}, optional
+        LIDF of SAIL. Default is 'campbell'.
+
+    Returns
+    -------
+    spectra : ndarray
+        Array with shape (M, n_quantities, n_wavelengths). The quantities are QUANTITIES[model].
+
+    """
+    defaults = _defaults(model, version)
+    fixed = {} if fixed is None else fixed
+
+    if len(params) == 0:
+        raise ValueError("params must contain at least one parameter array.")
+
+    M = len(next(iter(params.values())))
+    values = Memorize((name, np.broadcast_to(params.get(name, fixed.get(name, default)), (M,)))
+                      for name, default in defaults.items())
+
+    if model == 'prospect':
+        prospect = PROSPECT.batch(N=values.N, Cab=values.Cab, Cxc=values.Cxc, Cbr=values.Cbr, Cw=values.Cw,
+                                  Cm=values.Cm, Can=values.Can, version=version, wavelengths=wavelengths)
+
+        return np.stack((prospect.ks, prospect.kt), axis=1)
+
+    # The geometry and the LIDF are computed once if they are not sampled
+    angles = dict((name, values[name] if name in params else values[name][0]) for name in ('iza', 'vza', 'raa',
+                                                                                           'a', 'b'))
+    geometry = CanopyGeometry(lidf_type=lidf_type, **angles)
+
+    prosail = PROSAIL(None, None, None, N=values.N, Cab=values.Cab, Cxc=values.Cxc, Cbr=values.Cbr, Cw=values.Cw,
+                      Cm=values.Cm, Can=values.Can, lai=values.lai, hotspot=values.hotspot,
+                      reflectance=values.reflectance, moisture=values.moisture, outputs='BRF', version=version,
+                      wavelengths=wavelengths, geometry=geometry)
+
+    return prosail.BRF[:, np.newaxis]
+
+
+def _defaults(model, version='5'):
+    if model == 'prospect':
+        defaults = PROSPECT_PARAMS
+    elif model == 'prosail':
+        defaults = PROSAIL_PARAMS
+    else:
+        raise ValueError("model must be 'prospect' or 'prosail'. The actual model is: {}".format(str(model)))
+
+    if version == 'D':
+        return Memorize(defaults, Can=CAN_D)
+    else:
+        return defaults
+
+
+class LUT(object):
+    """
+    Look up table (LUT) of PROSPECT or PROSAIL spectra stored in memory mapped .npy files.
+
+    A LUT consists of three files with the same base path:
+        * <path>.npy : Spectra with shape (n_samples, n_quantities, n_wavelengths).
+        * <path>_params.npy : Sampled parameters with shape (n_samples, n_params).
+        * <path>.json : Metadata with the model, PROSPECT version, parameter names and ranges, fixed parameters,
+          quantities and the wavelength grid.
+
+    Use LUT.build to create a LUT. LUT(path) opens an existing LUT without loading the data into memory.
+
+    Parameters
+    ----------
+    path : str
+        Base path of the LUT (without extension).
+
+    Returns
+    -------
+    All returns are attributes!
+    spectra : numpy.memmap
+        Read only spectra with shape (n_samples, n_quantities, n_wavelengths).
+    params : numpy.memmap
+        Read only parameters with shape (n_samples, n_params).
+    names : list
+        Names of the sampled parameters (columns of params).
+    ranges : dict
+        Sampled parameter ranges.
+    fixed : dict
+        Fixed parameters.
+    quantities : list
+        Names of the stored quantities.
+    l : ndarray
+        Wavelengths in [nm].
+    model, version : str
+        Model and PROSPECT version.
+
+    See Also
+    --------
+    LUT.build
+    LUT.query
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path + '.json', 'r') as f:
+            meta = json.load(f)
+
+        self.model = meta['model']
+        self.version = meta['version']
+        self.names = meta['names']
+        self.ranges = meta['ranges']
+        self.fixed = meta['fixed']
+        self.quantities = meta['quantities']
+        self.lidf_type = meta['lidf_type']
+        self.l = np.asarray(meta['wavelengths'])
+
+        self.spectra = np.load(path + '.npy', mmap_mode='r')
+        self.params = np.load(path + '_params.npy', mmap_mode='r')
+
+    def __len__(self):
+        return len(self.params)
+
+    @classmethod
+    def build(cls, path, ranges, n_samples, model='prospect', fixed=None, version='5', wavelengths=None,
+              lidf_type='campbell', chunk_size=1000, seed=None, dtype=np.float32, workers=1):
+        """
+        Sample a parameter space uniformly and write the simulated spectra chunk by chunk into a memory mapped
+        .npy file. The peak memory depends on chunk_size and not on n_samples.
+
+        With workers > 1 the chunks are evaluated in a process pool and every worker writes its spectra directly
+        into the file (see pyrism.models.parallel.parallel_map).
+
+        Parameters
+        ----------
+        path : str
+            Base path of the LUT (without extension).
+        ranges : dict
+            Lower and upper bound (lower, upper) of the sampled parameters, e.g. dict(N=(1, 3), Cab=(0, 80)).
+        n_samples : int
+            Number of samples.
+        model : {'prospect', 'prosail'}
+            Model to evaluate. Default is 'prospect'.
+        fixed : dict, optional
+            Values of the parameters that are not sampled. Missing parameters are taken from the defaults
+            (PROSPECT_PARAMS, PROSAIL_PARAMS). For version 'D' the default of Can is CAN_D.
+        version : {'5', 'D'}
+            PROSPECT version. Default is '5'.
+        wavelengths : array_like, optional
+            Wavelengths in [nm]. The default (None) is the continuous range from 400 until 2500 nm.
+        lidf_type : {'verhoef', 'campbell'}, optional
+            LIDF of SAIL. Default is 'campbell'.
+        chunk_size : int, optional
+            Number of samples that are evaluated at once. Default is 1000.
+        seed : int, optional
+            Seed of the random number generator. The samples do not depend on chunk_size.
+        dtype : numpy.dtype, optional
+            Data type of the stored spectra. Default is float32.
+        workers : int, optional
+            Number of worker processes. Default is 1 (no process pool). None is the number of CPUs. The LUT does
+            not depend on the number of workers.
+
+        Returns
+        -------
+        LUT instance
+
+        """
+        defaults = _defaults(model, version)
+        fixed = {} if fixed is None else dict(fixed)
+
+        for name in list(ranges) + list(fixed):
+            if name not in defaults:
+                raise ValueError("Unknown parameter {0} for model {1}. Possible parameters are: {2}".format(
+                    str(name), str(model), ', '.join(defaults)))
+
+        names = [name for name in defaults if name in ranges]
+
+        if len(names) == 0:
+            raise ValueError("ranges must contain at least one parameter to sample.")
+
+        lower = np.asarray([ranges[name][0] for name in names], dtype=np.float64)
+        upper = np.asarray([ranges[name][1] for name in names], dtype=np.float64)
+
+        quantities = QUANTITIES[model]
+        l = _library(wavelengths)[0]
+
+        meta = dict(model=model, version=version, names=names,
+                    ranges=dict((name, [float(ranges[name][0]), float(ranges[name][1])]) for name in names),
+                    fixed=dict((name, float(value)) for name, value in fixed.items()),
+                    quantities=list(quantities), lidf_type=lidf_type, wavelengths=[int(item) for item in l],
+                    n_samples=int(n_samples))
+
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        params = np.lib.format.open_memmap(path + '_params.npy', mode='w+', dtype=np.float64,
+                                           shape=(n_samples, len(names)))
+
+        rs = np.random.RandomState(seed)
+
+        for start in range(0, n_samples, chunk_size):
+            stop = min(start + chunk_size, n_samples)
+            params[start:stop] = lower + (upper - lower) * rs.uniform(size=(stop - start, len(names)))
+
+        params.flush()
+
+        parallel_map(partial(evaluate, model), dict((name, params[:, i]) for i, name in enumerate(names)), path,
+                     chunk_size=chunk_size, workers=workers, shape=(len(quantities), len(l)), dtype=dtype,
+                     kwargs=dict(fixed=fixed, version=version, wavelengths=wavelengths, lidf_type=lidf_type))
+
+        del params
+
+        with open(path + '.json', 'w') as f:
+            json.dump(meta, f, indent=2)
+
+        return cls(path)
+
+    def query(self, spectrum, quantity=None, k=1, chunk_size=10000):
+        """
+        Find the k samples of the LUT with the smallest root mean square error to a spectrum.
+
+        Parameters
+        ----------
+        spectrum : array_like
+            Spectrum at the wavelengths of the LUT.
+        quantity : str, optional
+            Stored quantity to compare with (see LUT.quantities). Default is the first quantity.
+        k : int, optional
+            Number of samples. Default is 1.
+        chunk_size : int, optional
+            Number of samples that are compared at once. Default is 10000.
+
+        Returns
+        -------
+        Result : dict (with dot access)
+            * index : Index of the samples sorted by the error.
+            * rmse : Root mean square error of the samples.
+            * params : dict (with dot access) with the parameters of the samples.
+
+        """
+        quantity = self.quantities[0] if quantity is None else quantity
+        q = self.quantities.index(quantity)
+        spectrum = np.asarray(spectrum, dtype=np.float64)
+
+        index = np.zeros(0, dtype=int)
+        rmse = np.zeros(0)
+
+        for start in range(0, len(self), chunk_size):
+            chunk = np.asarray(self.spectra[start:start + chunk_size, q], dtype=np.float64)
+            error = np.sqrt(np.mean((chunk - spectrum) ** 2, axis=1))
+
+            index = np.concatenate((index, np.arange(start, start + len(chunk))))
+            rmse = np.concatenate((rmse, error))
+
+            if len(rmse) > k:
+                best = np.argpartition(rmse, k)[:k]
+                index, rmse = index[best], rmse[best]
+
+        order = np.argsort(rmse)
+        index, rmse = index[order], rmse[order]
+
+        return Memorize(index=index, rmse=rmse,
+                        params=Memorize((name, np.asarray(self.params[index, i])) for i, name in enumerate(self.names)))
@@ -3,14 +3,16 @@ from __future__ import division
 
 import sys
 import warnings
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
+from functools import partial
 
 import numpy as np
 from scipy.integrate import (quad, dblquad)
 from scipy.special import factorial, expi
 
-from .library import get_data_one, get_data_two
-from ..core import (Kernel, Scattering, ReflectanceResult, EmissivityResult, SailResult, cot, rad, dB, BRDF, BRF)
+from .library import get_data_one, get_data_two, wavelength_index, subset
+from ..core import (Kernel, Scattering, ReflectanceResult, EmissivityResult, SailResult, cot, rad, dB, BRDF, BRF,
+                    align_all, asarrays, exp1_approx, lazy_property, SENSORS, VegetationIndices)
 
 try:
     lib = get_data_two()
@@ -23,6 +25,51 @@ if sys.version_info < (3, 0):
 else:
     srange = range
 
+# Interface coefficients (talf, ralf, t12, r12, t21, r21) of PROSPECT. They only depend on the refractive index of the
+# spectral library and the leaf angle, so they are shared by all instances. The keys are (version, alpha).
+_interface_cache = {}
+
+# Spectral library subsets for the wavelengths option of PROSPECT and LSM. The keys are the wavelengths as tuple.
+_library_cache = {}
+
+
+def _library(wavelengths=None):
+    """
+    Wavelengths, library index and spectral library for a wavelength grid. None is the continuous
+    400 - 2500 nm grid.
+    """
+    if wavelengths is None:
+        return np.arange(400, 2501), None, lib
+
+    key = tuple(np.asarray(wavelengths).flatten().tolist())
+
+    try:
+        return _library_cache[key]
+    except KeyError:
+        index = wavelength_index(wavelengths)
+        _library_cache[key] = (index + 400, index, subset(lib, index))
+
+        return _library_cache[key]
+
+
+# Result types of the band values.
+ASTER = namedtuple('ASTER', 'B1 B2 B3 B4 B5 B6 B7 B8 B9')
+L8 = namedtuple('L8', 'B2 B3 B4 B5 B6 B7')
+LeafBand = namedtuple('LeafBand', 'ks kt ka ke omega')
+
+
+def _bands(l, value, sensor, result_type, item_type=None):
+    """
+    Band values of value with shape (..., n_wavelengths) at the wavelengths l for a sensor of the registry
+    pyrism.core.SENSORS. If item_type is given, the first axis of value is unpacked into item_type.
+    """
+    bands = np.moveaxis(SENSORS[sensor](value, l), -1, 0)
+
+    if item_type is None:
+        return result_type(*bands)
+    else:
+        return result_type(*[item_type(*item) for item in bands])
+
 
 # ---- Scattering Coefficients ----
 class VolScatt(Kernel):
@@ -78,7 +125,7 @@ class VolScatt(Kernel):
 
         super(VolScatt, self).__init__(iza, vza, raa, normalize=False, nbar=0.0, angle_unit=angle_unit, align=True)
 
-    def coef(self, lidf_type='verhoef', n_elements=18, **kwargs):
+    def coef(self, lidf_type='verhoef', n_elements=18, outer=False, **kwargs):
         """
         Calculate the extinction and volume scattering coefficients (:cite:`Campbell.1986`,
         :cite:`Campbell.1990`, :cite:`Verhoef.1998`).
@@ -89,6 +136,9 @@ class VolScatt(Kernel):
             Define with which method the LIDF is calculated
         n_elements : int, optional
             Total number of equally spaced inclination angles. Default is 18.
+        outer : bool, optional
+            If True and the LIDF parameters are arrays with shape (M,), every LIDF is combined with every geometry
+            and ks, ko, Fs, Ft and Fst have the shape (M, n_geometries). Default is False.
         kwargs : dict
             Possible **kwargs from campbell method:
                 * a : Mean leaf angle (degrees) use 57 for a spherical LIDF.
@@ -98,6 +148,9 @@ class VolScatt(Kernel):
                 * b : Parameter b influences the shape of the distribution (bimodality), but has no effect on the
                       average leaf inclination.
 
+            The parameters can be arrays with shape (M,). In this case the LIDF has the shape (M, n_elements) and
+            M must be equal to the number of geometries or one of both must be 1.
+
         Returns
         -------
         All returns are attributes!
@@ -111,6 +164,16 @@ class VolScatt(Kernel):
             Function to be multiplied by leaf transmittance to obtain the volume scattering.
         self.Fst : int, float or array_like
             Sum of Fs and Ft.
+        self.bf : float
+            LIDF weighted squared cosine of the leaf inclination angles.
+        self.chi_s, self.chi_o, self.frho, self.ftau : ndarray
+            Output of VolScatt.volume for all geometries and leaf inclination angles.
+
+        Note
+        ----
+        All geometries (iza, vza, raa) and all leaf inclination angles are evaluated in one array expression.
+        ks, ko, Fs, Ft and Fst have the shape (n_geometries,) and chi_s, chi_o, frho and ftau have the shape
+        (n_geometries, n_elements).
 
         See Also
         --------
@@ -129,49 +192,42 @@ class VolScatt(Kernel):
             if a is None or b is None:
                 raise ValueError("for the verhoef function the parameter a and b must defined.")
             else:
-                lidf = LIDF.verhoef(a, b, n_elements)
+                lidf = LIDF.get('verhoef', a, b, n_elements)
 
         elif lidf_type == 'campbell':
             if a is None:
                 raise ValueError("for the campbell function the parameter alpha must defined.")
             else:
-                lidf = LIDF.campbell(a, n_elements)
+                lidf = LIDF.get('campbell', a, 0, n_elements)
 
         else:
             raise AttributeError("lad_method must be verhoef, nilson or campbell")
 
-        self.ks = 0.
-        self.ko = 0.
-        self.bf = 0.
-        self.Fs = 0.
-        self.Ft = 0.
+        lidf = np.asarray(lidf)
 
-        n_angles = len(lidf)
+        n_angles = lidf.shape[-1]
         angle_step = float(90.0 / n_angles)
         litab = np.arange(n_angles) * angle_step + (angle_step * 0.5)
 
-        for i, ili in enumerate(litab):
-            ttl = 1. * ili
-            cttl = np.cos(np.radians(ttl))
-            # SAIL volume scattering phase function gives interception and portions to be multiplied by rho
-            # and tau
-            self.chi_s, self.chi_o, self.frho, self.ftau = self.volume(ttl)
-
-            # Extinction coefficients
-            ksli = self.chi_s / np.cos(self.iza)
-            koli = self.chi_o / np.cos(self.vza)
-
-            # Area scattering coefficient fractions
-            sobli = self.frho * np.pi / (np.cos(self.iza) * np.cos(self.vza))
-            sofli = self.ftau * np.pi / (np.cos(self.iza) * np.cos(self.vza))
-            bfli = cttl ** 2.
-            self.ks += ksli * float(lidf[i])
-            self.ko += koli * float(lidf[i])
-            self.bf += bfli * float(lidf[i])
-            self.Fs += sobli * float(lidf[i])
-            self.Ft += sofli * float(lidf[i])
-
-            self.Fst = self.Fs + self.Ft
+        # SAIL volume scattering phase function gives interception and portions to be multiplied by rho and tau for
+        # all geometries (rows) and leaf inclination angles (columns).
+        self.chi_s, self.chi_o, self.frho, self.ftau = self.volume(litab)
+
+        cts = np.cos(self.iza)[..., np.newaxis]
+        cto = np.cos(self.vza)[..., np.newaxis]
+
+        self.bf = np.sum(np.cos(np.radians(litab)) ** 2. * lidf, axis=-1)
+
+        if outer and lidf.ndim == 2:
+            lidf = lidf[:, np.newaxis]
+
+        # Extinction coefficients and area scattering coefficient fractions weighted with the LIDF
+        self.ks = np.sum(self.chi_s / cts * lidf, axis=-1)
+        self.ko = np.sum(self.chi_o / cto * lidf, axis=-1)
+        self.Fs = np.sum(self.frho * np.pi / (cts * cto) * lidf, axis=-1)
+        self.Ft = np.sum(self.ftau * np.pi / (cts * cto) * lidf, axis=-1)
+
+        self.Fst = self.Fs + self.Ft
 
     def volume(self, lza):
         """
@@ -179,85 +235,87 @@ class VolScatt(Kernel):
         for given solar zenith, viewing zenith, azimuth and leaf inclination angle (:cite:`Verhoef.1998`,
         :cite:`Campbell.1990`).
 
+        Parameters
+        ----------
+        lza : int, float or array_like
+            Leaf inclination angle(s) in [DEG].
+
         Returns
         -------
         All returns are attributes!
-        chi_s : float
+        chi_s : ndarray
             Interception function  in the solar path.
-        chi_o : float
+        chi_o : ndarray
             Interception function  in the view path.
-        frho : float
+        frho : ndarray
             Function to be multiplied by leaf reflectance to obtain the volume scattering.
-        ftau : float
+        ftau : ndarray
             Function to be multiplied by leaf transmittance to obtain the volume scattering.
 
+        Note
+        ----
+        All returns have the shape (n_geometries, n_leaf_angles). If lza is a scalar the shape is (n_geometries,).
+
         """
-        cts = np.cos(self.iza)
-        cto = np.cos(self.vza)
-        sts = np.sin(self.iza)
-        sto = np.sin(self.vza)
-        cospsi = np.cos(self.raa)
-        psir = self.raa
-        clza = np.cos(np.radians(lza))
-        slza = np.sin(np.radians(lza))
+        lza = np.asarray(lza, dtype=np.float64)
+
+        cts = np.cos(self.iza)[..., np.newaxis]
+        cto = np.cos(self.vza)[..., np.newaxis]
+        sts = np.sin(self.iza)[..., np.newaxis]
+        sto = np.sin(self.vza)[..., np.newaxis]
+        cospsi = np.cos(self.raa)[..., np.newaxis]
+        psir = np.asarray(self.raa)[..., np.newaxis]
+        front = np.asarray(self.vza)[..., np.newaxis] < rad(90.)
+
+        clza = np.cos(np.radians(np.atleast_1d(lza)))
+        slza = np.sin(np.radians(np.atleast_1d(lza)))
         cs = clza * cts
         co = clza * cto
         ss = slza * sts
         so = slza * sto
-        cosbts = 5.
-        if np.abs(ss) > 1e-6:
-            cosbts = -cs / ss
-        cosbto = 5.
-        if np.abs(so) > 1e-6:
-            cosbto = -co / so
-        if np.abs(cosbts) < 1.0:
-            bts = np.arccos(cosbts)
-            ds = ss
-        else:
-            bts = np.pi
-            ds = cs
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cosbts = np.where(np.abs(ss) > 1e-6, -cs / ss, 5.)
+            cosbto = np.where(np.abs(so) > 1e-6, -co / so, 5.)
+
+        inside_s = np.abs(cosbts) < 1.0
+        bts = np.where(inside_s, np.arccos(np.clip(cosbts, -1., 1.)), np.pi)
+        ds = np.where(inside_s, ss, cs)
         chi_s = 2. / np.pi * ((bts - np.pi * 0.5) * cs + np.sin(bts) * ss)
-        if abs(cosbto) < 1.0:
-            bto = np.arccos(cosbto)
-            do_ = so
-        else:
-            if self.vza < rad(90.):
-                bto = np.pi
-                do_ = co
-            else:
-                bto = 0.0
-                do_ = -co
+
+        inside_o = np.abs(cosbto) < 1.0
+        bto = np.where(inside_o, np.arccos(np.clip(cosbto, -1., 1.)), np.where(front, np.pi, 0.0))
+        do_ = np.where(inside_o, so, np.where(front, co, -co))
         chi_o = 2.0 / np.pi * ((bto - np.pi * 0.5) * co + np.sin(bto) * so)
+
         btran1 = np.abs(bts - bto)
         btran2 = np.pi - np.abs(bts + bto - np.pi)
-        if psir <= btran1:
-            bt1 = psir
-            bt2 = btran1
-            bt3 = btran2
-        else:
-            bt1 = btran1
-            if psir <= btran2:
-                bt2 = psir
-                bt3 = btran2
-            else:
-                bt2 = btran2
-                bt3 = psir
+
+        first = psir <= btran1
+        second = ~first & (psir <= btran2)
+        bt1 = np.where(first, psir, btran1)
+        bt2 = np.where(first, btran1, np.where(second, psir, btran2))
+        bt3 = np.where(first | second, btran2, psir)
+
         t1 = 2. * cs * co + ss * so * cospsi
-        t2 = 0.
-        if bt2 > 0.:
-            t2 = np.sin(bt2) * (2. * ds * do_ + ss * so * np.cos(bt1) * np.cos(bt3))
+        t2 = np.where(bt2 > 0., np.sin(bt2) * (2. * ds * do_ + ss * so * np.cos(bt1) * np.cos(bt3)), 0.)
+
         denom = 2. * np.pi ** 2
-        frho = ((np.pi - bt2) * t1 + t2) / denom
-        ftau = (-bt2 * t1 + t2) / denom
-        if frho < 0.:
-            frho = 0.
-        if ftau < 0.:
-            ftau = 0.
+        frho = np.maximum(((np.pi - bt2) * t1 + t2) / denom, 0.)
+        ftau = np.maximum((-bt2 * t1 + t2) / denom, 0.)
 
-        return chi_s, chi_o, frho, ftau
+        if lza.ndim == 0:
+            return chi_s[..., 0], chi_o[..., 0], frho[..., 0], ftau[..., 0]
+        else:
+            return chi_s, chi_o, frho, ftau
 
 
 # ---- LAD and LIDF Models ----
+# LRU cache of LIDF.get. The keys are (lidf_type, a, b, n_elements).
+_lidf_cache = OrderedDict()
+_LIDF_CACHE_SIZE = 256
+
+
 class LIDF:
     """
     Calculate several leaf area inclination density function  based on
@@ -278,6 +336,64 @@ class LIDF:
     def __init__(self):
         pass
 
+    @staticmethod
+    def get(lidf_type, a, b=0, n_elements=18):
+        """
+        Leaf Inclination Distribution Function with memoization. Scalar parameters are looked up in a LRU cache
+        keyed on (lidf_type, a, b, n_elements). Arrays of parameters are evaluated in one vectorized pass for all
+        unique (a, b) combinations.
+
+        Parameters
+        ----------
+        lidf_type : {'verhoef', 'campbell'}
+            Define with which method the LIDF is calculated.
+        a, b : float or array_like
+            Parameters of the LIDF (see LIDF.verhoef and LIDF.campbell). b is ignored for 'campbell'.
+        n_elements : int
+            Total number of equally spaced inclination angles. Default is 18.
+
+        Returns
+        -------
+        lidf : ndarray
+            Read only LIDF with shape (n_elements,) or (M, n_elements) if a or b are arrays with shape (M,).
+
+        """
+        if lidf_type == 'verhoef':
+            function = LIDF.verhoef
+        elif lidf_type == 'campbell':
+            function = LIDF.campbell
+            b = 0
+        else:
+            raise AttributeError("lidf_type must be verhoef or campbell")
+
+        if np.ndim(a) == 0 and np.ndim(b) == 0:
+            key = (lidf_type, float(a), float(b), int(n_elements))
+
+            try:
+                lidf = _lidf_cache.pop(key)
+            except KeyError:
+                lidf = function(a, b, n_elements) if lidf_type == 'verhoef' else function(a, n_elements)
+                lidf.flags.writeable = False
+
+                if len(_lidf_cache) >= _LIDF_CACHE_SIZE:
+                    _lidf_cache.popitem(last=False)
+
+            _lidf_cache[key] = lidf
+            return lidf
+
+        params = np.column_stack(np.broadcast_arrays(np.ravel(a), np.ravel(b))).astype(np.float64)
+        unique, inverse = np.unique(params, axis=0, return_inverse=True)
+
+        if lidf_type == 'verhoef':
+            lidf = function(unique[:, 0], unique[:, 1], n_elements)
+        else:
+            lidf = function(unique[:, 0], n_elements)
+
+        lidf = np.atleast_2d(lidf)[np.ravel(inverse)]
+        lidf.flags.writeable = False
+
+        return lidf
+
     @staticmethod
     def campbell(a, n_elements=18):
         """
@@ -285,50 +401,49 @@ class LIDF:
         mean angle of ellipsoidal LIDF distribution.
         Parameters
         ----------
-        a : float
+        a : float or array_like
             Mean leaf angle (degrees) use 57 for a spherical LIDF.
         n_elements : int
             Total number of equally spaced inclination angles .
 
         Returns
         -------
-        lidf : list
-            Leaf Inclination Distribution Function for 18 equally spaced angles.
+        lidf : ndarray
+            Leaf Inclination Distribution Function for 18 equally spaced angles. If a is an array with shape (M,)
+            the shape is (M, n_elements).
 
         """
-        alpha = float(a)
+        alpha = np.asarray(a, dtype=np.float64)[..., np.newaxis]
         excent = np.exp(-1.6184e-5 * alpha ** 3. + 2.1145e-3 * alpha ** 2. - 1.2390e-1 * alpha + 3.2491)
-        sum0 = 0.
-        freq = np.zeros(n_elements)
-        step = 90.0 / n_elements
-        for i in srange(n_elements):
-            tl1 = rad(i * step)
-            tl2 = rad((i + 1.) * step)
-            x1 = excent / (np.sqrt(1. + excent ** 2. * np.tan(tl1) ** 2.))
-            x2 = excent / (np.sqrt(1. + excent ** 2. * np.tan(tl2) ** 2.))
-            if excent == 1.:
-                freq[i] = abs(np.cos(tl1) - np.cos(tl2))
-            else:
-                alph = excent / np.sqrt(abs(1. - excent ** 2.))
-                alph2 = alph ** 2.
-                x12 = x1 ** 2.
-                x22 = x2 ** 2.
-                if excent > 1.:
-                    alpx1 = np.sqrt(alph2 + x12)
-                    alpx2 = np.sqrt(alph2 + x22)
-                    dum = x1 * alpx1 + alph2 * np.log(x1 + alpx1)
-                    freq[i] = abs(dum - (x2 * alpx2 + alph2 * np.log(x2 + alpx2)))
-                else:
-                    almx1 = np.sqrt(alph2 - x12)
-                    almx2 = np.sqrt(alph2 - x22)
-                    dum = x1 * almx1 + alph2 * np.arcsin(x1 / alph)
-                    freq[i] = abs(dum - (x2 * almx2 + alph2 * np.arcsin(x2 / alph)))
-        sum0 = np.sum(freq)
-        lidf = np.zeros(n_elements)
-        for i in srange(n_elements):
-            lidf[i] = freq[i] / sum0
 
-        return lidf
+        step = 90.0 / n_elements
+        tl1 = rad(np.arange(n_elements) * step)
+        tl2 = rad((np.arange(n_elements) + 1.) * step)
+        x1 = excent / (np.sqrt(1. + excent ** 2. * np.tan(tl1) ** 2.))
+        x2 = excent / (np.sqrt(1. + excent ** 2. * np.tan(tl2) ** 2.))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            alph = excent / np.sqrt(np.abs(1. - excent ** 2.))
+            alph2 = alph ** 2.
+            x12 = x1 ** 2.
+            x22 = x2 ** 2.
+
+            # excent > 1
+            alpx1 = np.sqrt(alph2 + x12)
+            alpx2 = np.sqrt(alph2 + x22)
+            dum = x1 * alpx1 + alph2 * np.log(x1 + alpx1)
+            freq_prolate = np.abs(dum - (x2 * alpx2 + alph2 * np.log(x2 + alpx2)))
+
+            # excent < 1
+            almx1 = np.sqrt(alph2 - x12)
+            almx2 = np.sqrt(alph2 - x22)
+            dum = x1 * almx1 + alph2 * np.arcsin(x1 / alph)
+            freq_oblate = np.abs(dum - (x2 * almx2 + alph2 * np.arcsin(x2 / alph)))
+
+        freq = np.where(excent == 1., np.abs(np.cos(tl1) - np.cos(tl2)),
+                        np.where(excent > 1., freq_prolate, freq_oblate))
+
+        return freq / np.sum(freq, axis=-1, keepdims=True)
 
     @staticmethod
     def verhoef(a, b, n_elements=18):
@@ -338,7 +453,7 @@ class LIDF:
 
         Parameters
         ----------
-        a, b : float
+        a, b : float or array_like
             Parameter a controls the average leaf inclination. Parameter b influences the shape of the distribution
             (bimodality), but has no effect on the average leaf inclination.
         n_elements : int
@@ -346,8 +461,9 @@ class LIDF:
 
         Returns
         -------
-        LAD : list
-            Leaf Inclination Distribution Function at equally spaced angles.
+        LAD : ndarray
+            Leaf Inclination Distribution Function at equally spaced angles. If a or b are arrays with shape (M,)
+            the shape is (M, n_elements).
 
         Note
         ----
@@ -360,35 +476,36 @@ class LIDF:
             * Spherical: [-0.35,-0.15].
             * Uniform: [0,0].
 
+        The cumulative distribution is solved with a Newton iteration for all bins (and parameters) at once. A bin
+        stops as soon as its step is below 1e-8.
+
         """
+        a = np.asarray(a, dtype=np.float64)[..., np.newaxis]
+        b = np.asarray(b, dtype=np.float64)[..., np.newaxis]
 
-        freq = 1.0
         step = 90.0 / n_elements
-        lidf = np.zeros(n_elements) * 1.
-        angles = (np.arange(n_elements) * step)[::-1]
-        i = 0
-        for angle in angles:
-            tl1 = np.radians(angle)
-            if a > 1.0:
-                f = 1.0 - np.cos(tl1)
-            else:
-                eps = 1e-8
-                delx = 1.0
-                x = 2.0 * tl1
-                p = float(x)
-                while delx >= eps:
-                    y = a * np.sin(x) + .5 * b * np.sin(2. * x)
-                    dx = .5 * (y - x + p)
-                    x = x + dx
-                    delx = abs(dx)
-                f = (2. * y + p) / np.pi
-            freq = freq - f
-            lidf[i] = freq
-            freq = float(f)
-            i += 1
-        lidf = lidf[::-1]
+        tl1 = np.radians(np.arange(n_elements) * step)
 
-        return lidf
+        eps = 1e-8
+        x = np.broadcast_to(2.0 * tl1, np.broadcast(a, b, tl1).shape).copy()
+        p = x.copy()
+        y = np.zeros_like(x)
+        active = np.broadcast_to(a <= 1.0, x.shape).copy()
+
+        for _ in srange(1000):
+            if not np.any(active):
+                break
+
+            y = np.where(active, a * np.sin(x) + .5 * b * np.sin(2. * x), y)
+            dx = .5 * (y - x + p)
+            x = np.where(active, x + dx, x)
+            active &= np.abs(dx) >= eps
+
+        # Cumulative distribution at the lower bound of the bins
+        f = np.where(a > 1.0, 1.0 - np.cos(tl1), (2. * y + p) / np.pi)
+        f = np.concatenate((f, np.ones(f.shape[:-1] + (1,))), axis=-1)
+
+        return np.diff(f, axis=-1)
 
     @staticmethod
     def nilson(self, lza, mla=None, eccentricity=0.5, scaling_factor=0.5, distribution='random'):
@@ -470,6 +587,440 @@ class LIDF:
                 return np.asarray(lad_list)
 
 
+class CanopyGeometry(VolScatt):
+    """
+    Precomputed acquisition geometry and leaf angle distribution of a canopy for SAIL.
+
+    The extinction and volume scattering coefficients (ks, ko, bf, Fs, Ft) and the hotspot distance (dso) only
+    depend on the geometry (iza, vza, raa) and the LIDF, but not on the leaf and soil spectra. A CanopyGeometry
+    computes them once and can be passed to many SAIL runs with the parameter `geometry`.
+
+    Parameters
+    ----------
+    iza, vza, raa : int, float or ndarray
+        Incidence (iza) and scattering (vza) zenith angle, as well as relative azimuth (raa) angle.
+    lidf_type : {'verhoef', 'campbell'}, optional
+        Define with which method the LIDF is calculated. Default is 'campbell'
+    a, b : float or array_like, optional
+        Parameter of the LIDF (see SAIL). Scalars or arrays with shape (M,).
+    n_elements : int, optional
+        Total number of equally spaced inclination angles. Default is 18.
+    angle_unit : {'DEG', 'RAD'}, optional
+        * 'DEG': All input angles (iza, vza, raa) are in [DEG] (default).
+        * 'RAD': All input angles (iza, vza, raa) are in [RAD].
+    multiangle : bool, optional
+        If True the geometries are an own axis: every canopy is evaluated for every geometry (see SAIL).
+        Default is False.
+
+    Returns
+    -------
+    All returns are attributes!
+    ks, ko, bf, Fs, Ft, Fst : ndarray
+        Output of VolScatt.coef. If multiangle is True and a or b are arrays, ks, ko, Fs, Ft and Fst have the
+        shape (M, n_geometries).
+    dso : ndarray
+        Distance between the sun and the view direction in the hotspot correction with shape (n_geometries,).
+    lidf_type, a, b : str, float or ndarray
+        LIDF parameters.
+
+    See Also
+    --------
+    VolScatt
+    SAIL
+
+    Examples
+    --------
+    >>> geometry = CanopyGeometry(30, 10, 0, lidf_type='campbell', a=57)
+    >>> results = [SAIL.from_geometry(geometry, ks, kt, lai=3, hotspot=0.01, rho_surface=soil) for ks, kt in leaves]
+
+    """
+
+    def __init__(self, iza, vza, raa, lidf_type='campbell', a=57, b=0, n_elements=18, angle_unit='DEG',
+                 multiangle=False):
+
+        super(CanopyGeometry, self).__init__(iza, vza, raa, angle_unit)
+
+        self.lidf_type = lidf_type
+        self.a = a
+        self.b = b
+        self.multiangle = multiangle
+
+        if lidf_type == 'verhoef':
+            self.coef(a=a, b=b, lidf_type='verhoef', n_elements=n_elements, outer=multiangle)
+        elif lidf_type == 'campbell':
+            self.coef(a=a, lidf_type='campbell', n_elements=n_elements, outer=multiangle)
+        else:
+            raise AssertionError("The lidf_type must be 'verhoef' or 'campbell'")
+
+        self.dso = self.__define_geometric_constants(self.izaDeg, self.vzaDeg, self.raaDeg)[-1]
+
+    def __define_geometric_constants(self, tts, tto, psi):
+        cts = np.cos(np.radians(tts))
+        cto = np.cos(np.radians(tto))
+        ctscto = cts * cto
+        tants = np.tan(np.radians(tts))
+        tanto = np.tan(np.radians(tto))
+        cospsi = np.cos(np.radians(psi))
+        dso = np.sqrt(tants ** 2. + tanto ** 2. - 2. * tants * tanto * cospsi)
+        return cts, cto, ctscto, tants, tanto, cospsi, dso
+
+
+# Products of SAIL (see the outputs parameter of SAIL).
+OUTPUTS = ('BRF', 'BRDF', 'BHR', 'DHR', 'HDR', 'canopy')
+
+# Quadrature of the hemisphere for SAIL.hemisphere. The keys are (n_zenith, n_azimuth).
+_hemisphere_cache = {}
+
+
+def _hemisphere(n_zenith, n_azimuth):
+    """
+    Quadrature nodes and weights of the upper hemisphere. The zenith angles are Gauss-Legendre nodes in cos(zenith)
+    and the relative azimuth angles are the midpoints of n_azimuth intervals between 0 and 180 degrees (SAIL is
+    symmetric in the azimuth). Returns the zenith angles (n_zenith,) in [DEG] with the weights (n_zenith,) of
+    2 * cos(zenith) * d(cos(zenith)) and the directions (vza, raa) in [DEG] with the weights of
+    cos(vza) * dOmega / pi (n_zenith * n_azimuth,). Both weights sum up to one.
+    """
+    key = (int(n_zenith), int(n_azimuth))
+
+    try:
+        return _hemisphere_cache[key]
+    except KeyError:
+        x, w = np.polynomial.legendre.leggauss(key[0])
+        mu, w = (x + 1.) / 2., w / 2.
+        zenith = np.degrees(np.arccos(mu))
+        zenith_weights = 2. * mu * w
+
+        azimuth = (np.arange(key[1]) + 0.5) * 180. / key[1]
+        vza = np.repeat(zenith, key[1])
+        raa = np.tile(azimuth, key[0])
+        weights = np.repeat(zenith_weights, key[1]) / key[1]
+
+        for item in (zenith, zenith_weights, vza, raa, weights):
+            item.flags.writeable = False
+
+        _hemisphere_cache[key] = (zenith, zenith_weights, vza, raa, weights)
+        return _hemisphere_cache[key]
+
+
+class SAILPlan(object):
+    """
+    Precomputed part of SAIL that does not depend on the leaf and soil spectra (see SAIL.prepare).
+
+    The plan contains the geometry and LIDF coefficients (CanopyGeometry), the scattering and extinction
+    coefficients sdb, sdf, dob, dof, ddb and ddf, the direct transmittances tss and too and the hotspot integral.
+    Calling the plan with leaf reflectance, leaf transmittance and soil reflectance only evaluates the spectral
+    part of SAIL.
+
+    Parameters
+    ----------
+    iza, vza, raa : int, float or ndarray
+        Incidence (iza) and scattering (vza) zenith angle, as well as relative azimuth (raa) angle.
+    lai : float or array_like
+        Leaf area index. Scalar or array with shape (M,).
+    hotspot : float or array_like
+        The hotspot parameter. Scalar or array with shape (M,).
+    lidf_type : {'verhoef', 'campbell'}, optional
+        Define with which method the LIDF is calculated. Default is 'campbell'
+    a, b : float or array_like, optional
+        Parameter of the LIDF (see SAIL). Scalars or arrays with shape (M,).
+    angle_unit : {'DEG', 'RAD'}, optional
+        * 'DEG': All input angles (iza, vza, raa) are in [DEG] (default).
+        * 'RAD': All input angles (iza, vza, raa) are in [RAD].
+    hotspot_steps : int, optional
+        Number of steps of the exponential Simpson integration of the hotspot effect. Default is 20.
+    geometry : CanopyGeometry, optional
+        Precomputed geometry and LIDF coefficients. If given, iza, vza, raa, lidf_type, a, b, angle_unit and
+        multiangle are ignored.
+    multiangle : bool, optional
+        If True the geometries are an own axis (see SAIL). Default is False.
+
+    Returns
+    -------
+    All returns are attributes!
+    geometry : CanopyGeometry
+        Geometry and LIDF coefficients.
+    n_rows : int
+        Number of rows (geometries or canopies) of the plan. If multiangle is True the number of canopies.
+    n_geometries : int
+        Number of geometries.
+    ks, ko, bf, Fs, Ft : ndarray
+        Coefficients of the geometry as columns with shape (rows, 1) or (canopies, n_geometries, 1) if multiangle
+        is True.
+    tss, too, tsstoo, sumint : ndarray
+        Direct transmittance in the sun and view path, bidirectional gap fraction and hotspot integral with the
+        same shape as ks.
+
+    See Also
+    --------
+    SAIL.prepare
+    CanopyGeometry
+
+    """
+
+    def __init__(self, iza, vza, raa, lai, hotspot, lidf_type='campbell', a=57, b=0, angle_unit='DEG',
+                 hotspot_steps=20, geometry=None, multiangle=False):
+
+        if int(hotspot_steps) != hotspot_steps or hotspot_steps < 1:
+            raise ValueError("hotspot_steps must be a positive integer. The actual value is: {}".format(
+                str(hotspot_steps)))
+
+        if geometry is None:
+            geometry = CanopyGeometry(iza, vza, raa, lidf_type=lidf_type, a=a, b=b, angle_unit=angle_unit,
+                                      multiangle=multiangle)
+
+        self.geometry = geometry
+        self.multiangle = geometry.multiangle
+        self.n_geometries = len(geometry.iza)
+        self.hotspot_steps = int(hotspot_steps)
+        self.single = np.ndim(lai) == 0 and np.ndim(hotspot) == 0 and np.ndim(geometry.a) == 0 and \
+                      np.ndim(geometry.b) == 0
+
+        # Shape of the canopy parameters (rows, 1) and of the angular terms (rows, 1). If multiangle is True the
+        # shapes are (canopies, 1, 1) and (canopies, n_geometries, 1).
+        if self.multiangle:
+            self.canopy_shape, self.angular_shape = (-1, 1, 1), (-1, self.n_geometries, 1)
+        else:
+            self.canopy_shape, self.angular_shape = (-1, 1), (-1, 1)
+
+        self.lai = np.reshape(np.asarray(lai, dtype=np.float64), self.canopy_shape)
+        self.hotspot = np.reshape(np.asarray(hotspot, dtype=np.float64), self.canopy_shape)
+
+        self.__calc()
+
+    def __calc(self):
+        geometry = self.geometry
+
+        ks, ko, Fs, Ft = [np.reshape(item, self.angular_shape) for item in (geometry.ks, geometry.ko, geometry.Fs,
+                                                                           geometry.Ft)]
+        bf = np.reshape(geometry.bf, self.canopy_shape)
+
+        rows = [len(ks), len(bf), len(self.lai), len(self.hotspot)]
+        self.n_rows = max(rows)
+
+        if any(item != 1 and item != self.n_rows for item in rows):
+            raise AssertionError("The number of geometries and canopy parameters (lai, hotspot, a, b) must agree or "
+                                 "be 1. The actual numbers are: {0}".format(str(rows)))
+
+        self.ks, self.ko, self.bf, self.Fs, self.Ft = ks, ko, bf, Fs, Ft
+
+        self.sdb = 0.5 * (ks + bf)
+        self.sdf = 0.5 * (ks - bf)
+        self.dob = 0.5 * (ko + bf)
+        self.dof = 0.5 * (ko - bf)
+        self.ddb = 0.5 * (1.0 + bf)
+        self.ddf = 0.5 * (1.0 - bf)
+
+        # Rows without canopy are calculated with a dummy LAI and replaced at the end
+        self.bare = self.lai <= 0
+        self.lai_calc = lai = np.where(self.bare, 1., self.lai)
+
+        self.tss = tss = np.exp(-ks * lai)
+        self.too = np.exp(-ko * lai)
+
+        # J2 function of ks and ko
+        self.z = (1. - np.exp(-(ks + ko) * lai)) / (ks + ko)
+
+        # Treatment of the hotspot-effect
+        # Apply correction 2/(K+k) suggested by F.-M. Breon
+        dso = np.reshape(geometry.dso, self.angular_shape)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            alf = np.where(self.hotspot > 0., (dso / self.hotspot) * 2. / (ks + ko), 1e36)
+
+        # The pure hotspot (alf == 0) and outside the hotspot
+        pure = alf == 0.
+        tsstoo, sumint = self.__hotspot_calculations(np.where(pure, 1., alf), lai, ko, ks)
+        self.tsstoo = np.where(pure, tss, tsstoo)
+        self.sumint = np.where(pure, (1. - tss) / (ks * lai), sumint)
+
+    def __hotspot_calculations(self, alf, lai, ko, ks):
+        """
+        Integrate by exponential Simpson method in hotspot_steps steps. The steps are arranged according to equal
+        partitioning of the slope of the joint probability function. All steps of all rows are evaluated as one
+        array with shape (hotspot_steps + 1, rows, 1). Rows with an undefined integral (NaN) are set to zero.
+        """
+        n_steps = self.hotspot_steps
+        shape = np.broadcast(alf, lai, ko, ks).shape
+        alf = np.broadcast_to(alf, shape)
+
+        fhot = lai * np.sqrt(ko * ks)
+        fint = (1. - np.exp(-alf)) / n_steps
+        istep = np.arange(1, n_steps).reshape((-1,) + (1,) * len(shape))
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            x = np.empty((n_steps + 1,) + shape)
+            x[0] = 0.
+            x[1:-1] = -np.log(1. - istep * fint) / alf
+            x[-1] = 1.
+
+            y = -(ko + ks) * lai * x + fhot * (1. - np.exp(-alf * x)) / alf
+            f = np.exp(y)
+
+            sumint = np.sum((f[1:] - f[:-1]) * (x[1:] - x[:-1]) / (y[1:] - y[:-1]), axis=0)
+
+        tsstoo = f[-1]
+        sumint = np.where(np.isnan(sumint), 0., sumint)
+        return tsstoo, sumint
+
+    def __call__(self, ks, kt, rho_surface, **kwargs):
+        """
+        Run SAIL with the precomputed plan.
+
+        Parameters
+        ----------
+        ks, kt : array_like
+            Leaf reflectance and transmittance with shape (n_wavelengths,) or (M, n_wavelengths).
+        rho_surface : array_like
+            Surface reflectance with shape (n_wavelengths,) or (M, n_wavelengths).
+        kwargs : dict
+            Further parameters of SAIL (normalize, nbar, wavelengths, outputs).
+
+        Returns
+        -------
+        SAIL instance
+
+        """
+        return SAIL(None, None, None, ks, kt, self.lai, self.hotspot, rho_surface, plan=self, **kwargs)
+
+
+def _canopy_terms(plan, rho_leaf, tau_leaf, outputs):
+    """
+    Canopy part of SAIL for a plan (see SAILPlan) and the leaf reflectance and transmittance. Only the terms that
+    the requested outputs depend on are evaluated. The results are a dict with the canopy terms (see SAIL.canopy),
+    the direct transmittances tss, too and tsstoo and the extinction coefficient m of the diffuse flux. Rows
+    without canopy are set to the values of a bare soil, so _couple needs no special treatment.
+    """
+    ks, ko, Fs, Ft = plan.ks, plan.ko, plan.Fs, plan.Ft
+    sdb, sdf, dob, dof, ddb, ddf = plan.sdb, plan.sdf, plan.dob, plan.dof, plan.ddb, plan.ddf
+    bare, lai, tss, too = plan.bare, plan.lai_calc, plan.tss, plan.too
+
+    need_brf = 'BRF' in outputs or 'BRDF' in outputs or 'canopy' in outputs
+    need_sd = need_brf or 'DHR' in outputs
+    need_do = need_brf or 'HDR' in outputs
+
+    sigb = ddb * rho_leaf + ddf * tau_leaf
+    sigf = ddf * rho_leaf + ddb * tau_leaf
+
+    sigf = np.where(sigf == 0.0, 1.e-36, sigf)
+    sigb = np.where(sigb == 0.0, 1.e-36, sigb)
+
+    att = 1. - sigf
+    m = np.sqrt(att ** 2. - sigb ** 2.)
+
+    e1 = np.exp(-m * lai)
+    e2 = e1 ** 2.
+    rinf = (att - m) / sigb
+    rinf2 = rinf ** 2.
+    re = rinf * e1
+    denom = 1. - rinf2 * e2
+
+    result = dict(tdd=(1. - rinf2) * e1 / denom, rdd=rinf * (1. - e2) / denom)
+    tdd, rdd = result['tdd'], result['rdd']
+
+    if need_sd:
+        sb = sdb * rho_leaf + sdf * tau_leaf
+        sf = sdf * rho_leaf + sdb * tau_leaf
+
+        J1ks = _jfunc1(ks, m, lai)
+        J2ks = _jfunc2(ks, m, lai)
+
+        Pss = (sf + sb * rinf) * J1ks
+        Qss = (sf * rinf + sb) * J2ks
+
+        result['tsd'] = tsd = (Pss - re * Qss) / denom
+        result['rsd'] = rsd = (Qss - re * Pss) / denom
+
+    if need_do:
+        vb = dob * rho_leaf + dof * tau_leaf
+        vf = dof * rho_leaf + dob * tau_leaf
+
+        J1ko = _jfunc1(ko, m, lai)
+        J2ko = _jfunc2(ko, m, lai)
+
+        Pv = (vf + vb * rinf) * J1ko
+        Qv = (vf * rinf + vb) * J2ko
+
+        result['tdo'] = tdo = (Pv - re * Qv) / denom
+        result['rdo'] = rdo = (Qv - re * Pv) / denom
+
+    if need_brf:
+        w = Fs * rho_leaf + Ft * tau_leaf
+        z = plan.z
+
+        g1 = (z - J1ks * too) / (ko + m)
+        g2 = (z - J1ko * tss) / (ks + m)
+
+        Tv1 = (vf * rinf + vb) * g1
+        Tv2 = (vf + vb * rinf) * g2
+        T1 = Tv1 * (sf + sb * rinf)
+        T2 = Tv2 * (sf * rinf + sb)
+        T3 = (rdo * Qss + tdo * Pss) * rinf
+
+        # Multiple scattering contribution to bidirectional canopy reflectance
+        rsod = (T1 + T2 - T3) / (1. - rinf2)
+
+        # Bidirectional reflectance
+        # Single scattering contribution (hotspot-effect, see SAILPlan)
+        rsos = w * lai * plan.sumint
+
+        # Total canopy contribution
+        result['rso'] = rso = rsos + rsod
+
+    result.update(tss=tss, too=too, tsstoo=plan.tsstoo)
+
+    if np.any(bare):
+        # No canopy...
+        no_canopy = dict(rdd=0, tdd=1, rsd=0, tsd=0, rdo=0, tdo=0, rso=0, tss=1, too=1, tsstoo=1)
+        result = dict((key, np.where(bare, no_canopy[key], item)) for key, item in result.items())
+
+    result['m'] = m
+
+    return result
+
+
+def _couple(terms, rho, outputs):
+    """
+    Interaction of the canopy terms (see _canopy_terms) with the soil reflectance rho. Returns rddt (BHR), rsdt
+    (DHR), rdot (HDR) and rsot (BRF) as far as they are needed for the outputs.
+    """
+    rdd, tdd, tss, too = terms['rdd'], terms['tdd'], terms['tss'], terms['too']
+    result = {}
+
+    dn = np.maximum(1. - rho * rdd, 1e-36)
+
+    if 'BHR' in outputs:
+        result['rddt'] = rdd + tdd * rho * tdd / dn
+
+    if 'DHR' in outputs:
+        result['rsdt'] = terms['rsd'] + (terms['tsd'] + tss) * rho * tdd / dn
+
+    if 'HDR' in outputs:
+        result['rdot'] = terms['rdo'] + tdd * rho * (terms['tdo'] + too) / dn
+
+    if 'BRF' in outputs or 'BRDF' in outputs:
+        tsd, tdo = terms['tsd'], terms['tdo']
+
+        rsodt = ((tss + tsd) * tdo + (tsd + tss * rho * rdd) * too) * rho / dn
+        rsost = terms['rso'] + terms['tsstoo'] * rho
+        result['rsot'] = rsost + rsodt
+
+    return result
+
+
+def _jfunc1(k, l, t):
+    """J1 function with avoidance of singularity problem."""
+    del_ = (k - l) * t
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(np.abs(del_) > 1e-3, (np.exp(-l * t) - np.exp(-k * t)) / (k - l),
+                        0.5 * t * (np.exp(-k * t) + np.exp(-l * t)) * (1. - (del_ ** 2.) / 12.))
+
+
+def _jfunc2(k, l, t):
+    """J2 function."""
+    return (1. - np.exp(-(k + l) * t)) / (k + l)
+
+
 class SAIL(Kernel):
     """
     Run the SAIL radiative transfer model (See Note) (:cite:`GomezDans.2018`).
@@ -479,24 +1030,27 @@ class SAIL(Kernel):
     iza, vza, raa : int, float or ndarray
         Incidence (iza) and scattering (vza) zenith angle, as well as relative azimuth (raa) angle.
     ks, kt : array_like
-        Continuous leaf reflection (ks) and leaf transmission (kt) values from from 400 until 2500 nm. One can use the
-        output from PROSPECT class instance.
-    lai : float
-        Leaf area index.
-    hotspot : float
-        The hotspot parameter.
+        Continuous leaf reflection (ks) and leaf transmission (kt) values from from 400 until 2500 nm or at the
+        wavelengths given by the parameter `wavelengths`. One can use the output from PROSPECT class instance.
+        Use arrays with shape (M, n_wavelengths) for M canopies (e.g. the output of PROSPECT.batch).
+    lai : float or array_like
+        Leaf area index. Scalar or array with shape (M,).
+    hotspot : float or array_like
+        The hotspot parameter. Scalar or array with shape (M,).
     rho_surface : array_like
-        Continuous surface reflectance values from from 400 until 2500 nm. One can use the
-        output from LSM class instance.
+        Continuous surface reflectance values from from 400 until 2500 nm or at the wavelengths given by the
+        parameter `wavelengths`. One can use the output from LSM class instance. Array with shape (n_wavelengths,)
+        or (M, n_wavelengths).
     lidf_type : {'verhoef', 'campbell'}, optional
         Define with which method the LIDF is calculated. Default is 'campbell'
-    a, b : float, optional
+    a, b : float or array_like, optional
         Parameter a and b depends on which lidf_type is applied:
             * If lidf_type is 'verhoef': Parameter a controls the average leaf inclination. Parameter b influences
               the shape of the distribution (bimodality), but has no effect on the average leaf inclination.
               The default values are for a uniform leaf distribution a = 0, b = 0.
             * If lidf_type is 'campbell': Parameter a is the mean leaf angle (degrees) use 57 for a spherical LIDF.
               The default value represents a spherical leaf distribution a = 57.
+        Scalars or arrays with shape (M,).
 
     normalize : boolean, optional
         Set to 'True' to make kernels 0 at nadir view illumination. Since all implemented kernels are normalized
@@ -507,6 +1061,25 @@ class SAIL(Kernel):
     angle_unit : {'DEG', 'RAD'}, optional
         * 'DEG': All input angles (iza, vza, raa) are in [DEG] (default).
         * 'RAD': All input angles (iza, vza, raa) are in [RAD].
+    wavelengths : array_like, optional
+        Wavelengths in [nm] of ks, kt and rho_surface. The default (None) is the continuous range from 400 until
+        2500 nm. Use the same wavelengths as in PROSPECT and LSM.
+    hotspot_steps : int, optional
+        Number of steps of the exponential Simpson integration of the hotspot effect. Default is 20. Fewer steps
+        are faster but less accurate (e.g. for coarse LUTs).
+    geometry : CanopyGeometry, optional
+        Precomputed geometry and LIDF coefficients. If given, iza, vza, raa, lidf_type, a, b and angle_unit are
+        taken from the geometry and the passed values are ignored (see SAIL.from_geometry).
+    plan : SAILPlan, optional
+        Precomputed canopy structure (see SAIL.prepare). If given, only ks, kt, rho_surface and the wavelengths are
+        used and all other parameters are taken from the plan.
+    outputs : str or tuple of str, optional
+        Products to compute. Possible products are 'BRF', 'BRDF', 'BHR', 'DHR', 'HDR' and 'canopy'. Only the
+        requested products and the terms they depend on are evaluated and only these attributes are set. The
+        default (None) are all products. kt, kt_iza and kt_vza are always available.
+    multiangle : bool, optional
+        If True the geometries are an own axis of the results and every canopy is evaluated for every geometry
+        (see Note). Default is False.
 
     Returns
     -------
@@ -522,332 +1095,366 @@ class SAIL(Kernel):
     If the input parameter for ks and kt are the output from the class PROSPECT, SAIL will calculate the
     PROSAIL model.
 
-    """
+    SAIL runs for many canopies at once if the geometries (iza, vza, raa), the canopy parameters (lai, hotspot,
+    a, b) or the spectra (ks, kt, rho_surface) are arrays. Every array must have the same number of rows M or a
+    single row, which is then used for all rows. The spectral results have the shape (M, n_wavelengths) and the
+    results that do not depend on the wavelength (e.g. kt_iza) have the shape (M,). If all inputs describe a single
+    canopy the spectral results have the shape (n_wavelengths,).
+
+    With multiangle=True the geometries (iza, vza, raa) with G elements are not rows but an own axis. The canopy
+    parameters and spectra with M rows are evaluated for all geometries and the spectral results have the shape
+    (M, G, n_wavelengths) or (G, n_wavelengths) for a single canopy. The terms that do not depend on the geometry
+    (e.g. the diffuse reflectance and transmittance of the canopy) are computed once per canopy and broadcast
+    against the geometries, e.g. for multi-angular acquisitions.
+
+    """
+
+    def __init__(self, iza, vza, raa, ks, kt, lai, hotspot, rho_surface,
+                 lidf_type='campbell', a=57, b=0, normalize=False, nbar=0.0, angle_unit='DEG', wavelengths=None,
+                 hotspot_steps=20, geometry=None, plan=None, outputs=None, multiangle=False):
+
+        if plan is None:
+            plan = SAILPlan(iza, vza, raa, lai, hotspot, lidf_type=lidf_type, a=a, b=b, angle_unit=angle_unit,
+                            hotspot_steps=hotspot_steps, geometry=geometry, multiangle=multiangle)
+
+        self.plan = plan
+        geometry = plan.geometry
+
+        super(SAIL, self).__init__(iza=geometry.izaDeg, vza=geometry.vzaDeg, raa=geometry.raaDeg,
+                                   normalize=normalize, nbar=nbar, angle_unit='DEG', align=True)
 
-    def __init__(self, iza, vza, raa, ks, kt, lai, hotspot, rho_surface,
-                 lidf_type='campbell', a=57, b=0, normalize=False, nbar=0.0, angle_unit='DEG'):
+        if wavelengths is None:
+            self.l = np.arange(400, 2501)
+        else:
+            self.l = np.asarray(wavelengths).flatten()
 
-        super(SAIL, self).__init__(iza=iza, vza=vza, raa=raa, normalize=normalize, nbar=nbar, angle_unit=angle_unit,
-                                   align=True)
+        n_l = len(self.l)
 
-        if len(ks) != 2101:
+        if np.shape(ks)[-1] != n_l:
             raise AssertionError(
-                "ks must contain continuous leaf reflectance values from from 400 until 2500 nm with a length of 2101. The actual length of ks is {0}".format(
-                    str(len(ks))))
+                "ks must contain leaf reflectance values at the {0} wavelengths of the parameter wavelengths "
+                "(default: continuous from 400 until 2500 nm). The actual length of ks is {1}".format(
+                    str(n_l), str(np.shape(ks)[-1])))
 
-        elif len(kt) != 2101:
+        elif np.shape(kt)[-1] != n_l:
             raise AssertionError(
-                "kt must contain continuous leaf transmitance values from from 400 until 2500 nm with a length of 2101. The actual length of kt is {0}".format(
-                    str(len(kt))))
+                "kt must contain leaf transmitance values at the {0} wavelengths of the parameter wavelengths "
+                "(default: continuous from 400 until 2500 nm). The actual length of kt is {1}".format(
+                    str(n_l), str(np.shape(kt)[-1])))
 
-        elif len(rho_surface) != 2101:
+        elif np.shape(rho_surface)[-1] != n_l:
             raise AssertionError(
-                "rho_surface must contain continuous surface reflectance values from from 400 until 2500 nm with a length of 2101. The actual length of rho_surface is {0}".format(
-                    str(len(rho_surface))))
+                "rho_surface must contain surface reflectance values at the {0} wavelengths of the parameter "
+                "wavelengths (default: continuous from 400 until 2500 nm). The actual length of rho_surface "
+                "is {1}".format(str(n_l), str(np.shape(rho_surface)[-1])))
 
         else:
             pass
 
-        self.ks = ks
-        self.kt = kt
-        self.lai = lai
-        self.hotspot = hotspot
+        self.hotspot_steps = plan.hotspot_steps
 
-        self.rho_surface = rho_surface
-        self.VollScat = VolScatt(iza, vza, raa, angle_unit)
+        # Canopy parameters are columns (rows, 1) and spectra are arrays (rows, n_wavelengths). If multiangle is
+        # True the spectra have the shape (canopies, 1, n_wavelengths).
+        self.ks, self.kt, self.rho_surface = [np.reshape(np.atleast_2d(item), plan.canopy_shape[:-1] + (n_l,))
+                                              for item in (ks, kt, rho_surface)]
+        self.lai = plan.lai
+        self.hotspot = plan.hotspot
+        self.VollScat = geometry
 
-        if lidf_type is 'verhoef':
-            self.VollScat.coef(a=a, b=b, lidf_type='verhoef')
-        elif lidf_type is 'campbell':
-            self.VollScat.coef(a=a, lidf_type='campbell')
+        if outputs is None:
+            self.outputs = OUTPUTS
         else:
-            raise AssertionError("The lidf_type must be 'verhoef' or 'campbell'")
+            self.outputs = (outputs,) if isinstance(outputs, str) else tuple(outputs)
 
-        tss, too, tsstoo, rdd, tdd, rsd, tsd, rdo, tdo, rso, rsos, rsod, rddt, rsdt, rdot, rsodt, rsost, rsot, gammasdf, gammasdb, gammaso = self.__calc()
+            for item in self.outputs:
+                if item not in OUTPUTS:
+                    raise ValueError("Unknown output {0}. Possible outputs are: {1}".format(str(item),
+                                                                                       ', '.join(OUTPUTS)))
 
-        self.kt = tsstoo
-        self.kt_iza = tss
-        self.kt_vza = too
-        self.canopy = SailResult(BHR=rdd, BHT=tdd, DHR=rsd, DHT=tsd, HDR=rdo, HDT=tdo, BRF=rso)
-        self.l = np.arange(400, 2501)
+        self.__set_rows(plan.single and np.ndim(ks) == 1 and np.ndim(kt) == 1 and np.ndim(rho_surface) == 1)
 
-        self.BRF = SailResult(ref=rsot, refdB=dB(rsot), L8=self.__store_L8(rsot), ASTER=self.__store_aster(rsot))
-        self.BRDF = SailResult(ref=rsot / np.pi, refdB=dB(rsot / np.pi), L8=self.__store_L8(rsot / np.pi),
-                               ASTER=self.__store_aster(rsot / np.pi))
-        self.BHR = SailResult(ref=rddt, refdB=dB(rddt), L8=self.__store_L8(rddt), ASTER=self.__store_aster(rddt))
-        self.DHR = SailResult(ref=rsdt, refdB=dB(rsdt), L8=self.__store_L8(rsdt), ASTER=self.__store_aster(rsdt))
-        self.HDR = SailResult(ref=rdot, refdB=dB(rdot), L8=self.__store_L8(rdot), ASTER=self.__store_aster(rdot))
+        self.__terms = self.__calc()
+        terms = self.__terms
 
-    def __calc(self):
-        sdb = 0.5 * (self.VollScat.ks + self.VollScat.bf)
-        sdf = 0.5 * (self.VollScat.ks - self.VollScat.bf)
-        dob = 0.5 * (self.VollScat.ko + self.VollScat.bf)
-        dof = 0.5 * (self.VollScat.ko - self.VollScat.bf)
-        ddb = 0.5 * (1.0 + self.VollScat.bf)
-        ddf = 0.5 * (1.0 - self.VollScat.bf)
+        self.kt = self.__angular(terms['tsstoo'])
+        self.kt_iza = self.__angular(terms['tss'])
+        self.kt_vza = self.__angular(terms['too'])
 
-        sigb = ddb * self.ks + ddf * self.kt
-        sigf = ddf * self.ks + ddb * self.kt
+        if 'canopy' in self.outputs:
+            self.canopy = SailResult(BHR=self.__spectral(terms['rdd']), BHT=self.__spectral(terms['tdd']),
+                                     DHR=self.__spectral(terms['rsd']), DHT=self.__spectral(terms['tsd']),
+                                     HDR=self.__spectral(terms['rdo']), HDT=self.__spectral(terms['tdo']),
+                                     BRF=self.__spectral(terms['rso']))
 
-        try:
-            sigf[sigf == 0.0] = 1.e-36
-            sigb[sigb == 0.0] = 1.0e-36
-        except TypeError:
-            sigf = max(1e-36, sigf)
-            sigb = max(1e-36, sigb)
-
-        att = 1. - sigf
-        m = np.sqrt(att ** 2. - sigb ** 2.)
-        self.ke = m
-        sb = sdb * self.ks + sdf * self.kt
-        sf = sdf * self.ks + sdb * self.kt
-        vb = dob * self.ks + dof * self.kt
-        vf = dof * self.ks + dob * self.kt
-        w = self.VollScat.Fs * self.ks + self.VollScat.Ft * self.kt
-
-        if np.all(self.lai <= 0):
-            # No canopy...
-            tss = 1
-            too = 1
-            tsstoo = 1
-            rdd = 0
-            tdd = 1
-            rsd = 0
-            tsd = 0
-            rdo = 0
-            tdo = 0
-            rso = 0
-            rsos = 0
-            rsod = 0
-            rddt = self.rho_surface
-            rsdt = self.rho_surface
-            rdot = self.rho_surface
-            rsodt = 0
-            rsost = self.rho_surface
-            rsot = self.rho_surface
-            gammasdf = 0
-            gammaso = 0
-            gammasdb = 0
-
-            return [tss, too, tsstoo, rdd, tdd, rsd, tsd, rdo, tdo,
-                    rso, rsos, rsod, rddt, rsdt, rdot, rsodt, rsost, rsot, gammasdf, gammasdb, gammaso]
+        products = self.__products(_couple(terms, self.rho_surface, self.outputs), self.outputs,
+                                   self.__spectral)
 
-        else:
-            e1 = np.exp(-m * self.lai)
-            e2 = e1 ** 2.
-            rinf = (att - m) / sigb
-            rinf2 = rinf ** 2.
-            re = rinf * e1
-            denom = 1. - rinf2 * e2
-
-            J1ks = self.__Jfunc1(self.VollScat.ks, m, self.lai)
-            J2ks = self.__Jfunc2(self.VollScat.ks, m, self.lai)
-            J1ko = self.__Jfunc1(self.VollScat.ko, m, self.lai)
-            J2ko = self.__Jfunc2(self.VollScat.ko, m, self.lai)
-
-            Pss = (sf + sb * rinf) * J1ks
-            Qss = (sf * rinf + sb) * J2ks
-            Pv = (vf + vb * rinf) * J1ko
-            Qv = (vf * rinf + vb) * J2ko
-
-            tdd = (1. - rinf2) * e1 / denom
-            rdd = rinf * (1. - e2) / denom
-            tsd = (Pss - re * Qss) / denom
-            rsd = (Qss - re * Pss) / denom
-            tdo = (Pv - re * Qv) / denom
-            rdo = (Qv - re * Pv) / denom
-
-            gammasdf = (1. + rinf) * (J1ks - re * J2ks) / denom
-            gammasdb = (1. + rinf) * (-re * J1ks + J2ks) / denom
-
-            tss = np.exp(-self.VollScat.ks * self.lai)
-            too = np.exp(-self.VollScat.ko * self.lai)
-            z = self.__Jfunc2(self.VollScat.ks, self.VollScat.ko, self.lai)
-
-            g1 = (z - J1ks * too) / (self.VollScat.ko + m)
-            g2 = (z - J1ko * tss) / (self.VollScat.ks + m)
-
-            Tv1 = (vf * rinf + vb) * g1
-            Tv2 = (vf + vb * rinf) * g2
-            T1 = Tv1 * (sf + sb * rinf)
-            T2 = Tv2 * (sf * rinf + sb)
-            T3 = (rdo * Qss + tdo * Pss) * rinf
-
-            # Multiple scattering contribution to bidirectional canopy reflectance
-            rsod = (T1 + T2 - T3) / (1. - rinf2)
-
-            # Thermal "sod" quantity
-            T4 = Tv1 * (1. + rinf)
-            T5 = Tv2 * (1. + rinf)
-            T6 = (rdo * J2ks + tdo * J1ks) * (1. + rinf) * rinf
-            gammasod = (T4 + T5 - T6) / (1. - rinf2)
-
-            # Treatment of the hotspot-effect
-            alf = 1e36
-
-            # Apply correction 2/(K+k) suggested by F.-M. Breon
-            cts, cto, ctscto, tants, tanto, cospsi, dso = self.__define_geometric_constants(self.izaDeg, self.vzaDeg,
-                                                                                            self.raaDeg)
-
-            if self.hotspot > 0.:
-                alf = (dso / self.hotspot) * 2. / (self.VollScat.ks + self.VollScat.ko)
-
-            if alf == 0.:
-                # The pure hotspot
-                tsstoo = tss
-                sumint = (1. - tss) / (self.VollScat.ks * self.lai)
-            else:
-                # Outside the hotspot
-                tsstoo, sumint = self.__hotspot_calculations(alf, self.lai, self.VollScat.ko, self.VollScat.ks)
+        for key, value in products.items():
+            setattr(self, key, value)
 
-            # Bidirectional reflectance
-            # Single scattering contribution
-            rsos = w * self.lai * sumint
-            gammasos = self.VollScat.ko * self.lai * sumint
+    def couple(self, rho_surface, outputs=None):
+        """
+        Couple the canopy of this run with other soil spectra. The canopy terms are not computed again, so a
+        sweep over many soils costs only a few array operations per soil.
 
-            # Total canopy contribution
-            rso = rsos + rsod
-            gammaso = gammasos + gammasod
+        Parameters
+        ----------
+        rho_surface : array_like
+            Surface reflectance with shape (n_wavelengths,) or a stack of S soils with shape (S, n_wavelengths),
+            e.g. the output of LSM with arrays of reflectance and moisture.
+        outputs : str or tuple of str, optional
+            Products to compute ('BRF', 'BRDF', 'BHR', 'DHR', 'HDR'). The products must be computable from the
+            outputs of this run. Default (None) are the products of this run.
 
-            # Interaction with the soil
-            dn = 1. - self.rho_surface * rdd
+        Returns
+        -------
+        Result : SailResult
+            Products with the same structure as the attributes of SAIL. For a single soil the shape is the same as
+            for SAIL. For a stack of soils every soil is coupled with every canopy row and the shape is
+            (S, rows, n_wavelengths) or (S, n_wavelengths) for a single canopy.
 
-            try:
-                dn[dn < 1e-36] = 1e-36
-            except TypeError:
-                dn = max(1e-36, dn)
+        Examples
+        --------
+        >>> sail = SAIL(iza=30, vza=10, raa=0, ks=prospect.ks, kt=prospect.kt, lai=3, hotspot=0.01,
+        ...             rho_surface=soil.ref, outputs='BRF')
+        >>> soils = LSM(reflectance=np.linspace(0.5, 1.5, 50), moisture=0.3)
+        >>> brf = sail.couple(soils.ref).BRF.ref  # shape (50, 2101)
 
-            rddt = rdd + tdd * self.rho_surface * tdd / dn
-            rsdt = rsd + (tsd + tss) * self.rho_surface * tdd / dn
-            rdot = rdo + tdd * self.rho_surface * (tdo + too) / dn
-            rsodt = ((tss + tsd) * tdo + (tsd + tss * self.rho_surface * rdd) * too) * self.rho_surface / dn
-            rsost = rso + tsstoo * self.rho_surface
-            rsot = rsost + rsodt
+        """
+        if outputs is None:
+            outputs = tuple(item for item in self.outputs if item != 'canopy')
+        else:
+            outputs = (outputs,) if isinstance(outputs, str) else tuple(outputs)
 
-            return [tss, too, tsstoo, rdd, tdd, rsd, tsd, rdo, tdo,
-                    rso, rsos, rsod, rddt, rsdt, rdot, rsodt, rsost, rsot, gammasdf, gammasdb, gammaso]
+        needed = dict(BHR=(), DHR=('rsd',), HDR=('rdo',), BRF=('rso',), BRDF=('rso',))
 
-    def __define_geometric_constants(self, tts, tto, psi):
-        cts = np.cos(np.radians(tts))
-        cto = np.cos(np.radians(tto))
-        ctscto = cts * cto
-        tants = np.tan(np.radians(tts))
-        tanto = np.tan(np.radians(tto))
-        cospsi = np.cos(np.radians(psi))
-        dso = np.sqrt(tants ** 2. + tanto ** 2. - 2. * tants * tanto * cospsi)
-        return cts, cto, ctscto, tants, tanto, cospsi, dso
+        for item in outputs:
+            if item not in needed:
+                raise ValueError("Unknown output {0}. Possible outputs are: {1}".format(str(item),
+                                                                                   ', '.join(sorted(needed))))
+            if any(key not in self.__terms for key in needed[item]):
+                raise ValueError("The output {0} can not be computed from this run. The outputs of the run "
+                                 "are: {1}".format(str(item), ', '.join(self.outputs)))
 
-    def __hotspot_calculations(self, alf, lai, ko, ks):
-        fhot = lai * np.sqrt(ko * ks)
-        # Integrate by exponential Simpson method in 20 steps the steps are arranged according to equal partitioning of the slope of the joint probability function
-        x1 = 0.
-        y1 = 0.
-        f1 = 1.
-        fint = (1. - np.exp(-alf)) * .05
-        sumint = 0.
-        for istep in srange(1, 21):
-            if istep < 20:
-                x2 = -np.log(1. - istep * fint) / alf
-            else:
-                x2 = 1.
-            y2 = -(ko + ks) * lai * x2 + fhot * (1. - np.exp(-alf * x2)) / alf
-            f2 = np.exp(y2)
-            sumint = sumint + (f2 - f1) * (x2 - x1) / (y2 - y1)
-            x1 = x2
-            y1 = y2
-            f1 = f2
-        tsstoo = f1
-        if np.isnan(sumint):
-            sumint = 0.
-        return tsstoo, sumint
+        rho_surface = np.asarray(rho_surface, dtype=np.float64)
 
-    def __Jfunc1(self, k, l, t):
-        """J1 function with avoidance of singularity problem."""
+        if rho_surface.shape[-1] != len(self.l):
+            raise AssertionError(
+                "rho_surface must contain surface reflectance values at the {0} wavelengths of the parameter "
+                "wavelengths. The actual length of rho_surface is {1}".format(str(len(self.l)),
+                                                                             str(rho_surface.shape[-1])))
 
-        try:
-            nb = len(l)
-        except TypeError:
-            nb = 1
-        del_ = (k - l) * t
-        if nb > 1:
-            result = np.zeros(nb)
-            result[np.abs(del_) > 1e-3] = (np.exp(-l[np.abs(del_) > 1e-3] * t) -
-                                           np.exp(-k * t)) / (k - l[np.abs(del_) > 1e-3])
-            result[np.abs(del_) <= 1e-3] = 0.5 * t * (np.exp(-k * t) +
-                                                      np.exp(-l[np.abs(del_) <= 1e-3] * t)) * \
-                                           (1. - (del_[np.abs(del_) <= 1e-3] ** 2.) / 12.)
+        if rho_surface.ndim == 1:
+            rho, spectral = rho_surface, self.__spectral
         else:
-            if np.abs(del_) > 1e-3:
-                result = (np.exp(-l * t) - np.exp(-k * t)) / (k - l)
-            else:
-                result = 0.5 * t * (np.exp(-k * t) + np.exp(-l * t)) * (1. - (del_ ** 2.) / 12.)
-        return result
+            rho = rho_surface.reshape((-1,) + (1,) * (len(self.shape) - 1) + (len(self.l),))
+            shape = (len(rho),) + self.shape
+
+            def spectral(value):
+                value = np.broadcast_to(value, shape)
+                return value[:, 0].copy() if self.single else np.array(value)
+
+        return SailResult(self.__products(_couple(self.__terms, rho, outputs), outputs, spectral))
+
+    def __products(self, coupled, outputs, spectral):
+        """
+        Stored reflectance products of the coupled terms (see _couple).
+        """
+        products = {}
+
+        if 'BRF' in outputs or 'BRDF' in outputs:
+            rsot = spectral(coupled['rsot'])
+
+            if 'BRF' in outputs:
+                products['BRF'] = self.__store(rsot)
+            if 'BRDF' in outputs:
+                products['BRDF'] = self.__store(rsot / np.pi)
+
+        if 'BHR' in outputs:
+            products['BHR'] = self.__store(spectral(coupled['rddt']))
+        if 'DHR' in outputs:
+            products['DHR'] = self.__store(spectral(coupled['rsdt']))
+        if 'HDR' in outputs:
+            products['HDR'] = self.__store(spectral(coupled['rdot']))
+
+        return products
+
+    @staticmethod
+    def prepare(iza, vza, raa, lai, hotspot, lidf_type='campbell', a=57, b=0, angle_unit='DEG', hotspot_steps=20,
+                geometry=None, multiangle=False):
+        """
+        Precompute everything of SAIL that does not depend on the leaf and soil spectra. The returned plan is
+        called with ks, kt and rho_surface and only evaluates the spectral part, e.g. for inversions that only
+        vary the PROSPECT parameters.
+
+        Parameters
+        ----------
+        iza, vza, raa, lai, hotspot, lidf_type, a, b, angle_unit, hotspot_steps, geometry, multiangle
+            See SAIL.
+
+        Returns
+        -------
+        plan : SAILPlan
+
+        Examples
+        --------
+        >>> plan = SAIL.prepare(iza=30, vza=10, raa=0, lai=3, hotspot=0.01)
+        >>> sail = plan(ks=prospect.ks, kt=prospect.kt, rho_surface=soil.ref)
+
+        """
+        return SAILPlan(iza, vza, raa, lai, hotspot, lidf_type=lidf_type, a=a, b=b, angle_unit=angle_unit,
+                        hotspot_steps=hotspot_steps, geometry=geometry, multiangle=multiangle)
+
+    @staticmethod
+    def hemisphere(iza, ks, kt, lai, hotspot, rho_surface, lidf_type='campbell', a=57, b=0, n_zenith=8,
+                   n_azimuth=12, angle_unit='DEG', wavelengths=None, hotspot_steps=20):
+        """
+        BRDF of the whole viewing hemisphere and the spectral albedos.
+
+        The view directions are a quadrature grid of the upper hemisphere (Gauss-Legendre nodes in cos(vza) and
+        equally spaced relative azimuth angles between 0 and 180 degrees) and are evaluated with one SAIL run
+        (multiangle=True). The quadrature weights are cached per grid resolution.
+
+        Parameters
+        ----------
+        iza : int or float
+            Sun or incidence zenith angle.
+        ks, kt, lai, hotspot, rho_surface, lidf_type, a, b, angle_unit, wavelengths, hotspot_steps
+            See SAIL.
+        n_zenith : int, optional
+            Number of view zenith angles. Default is 8.
+        n_azimuth : int, optional
+            Number of relative azimuth angles. Default is 12.
 
-    def __Jfunc2(self, k, l, t):
-        """J2 function."""
-        return (1. - np.exp(-(k + l) * t)) / (k + l)
+        Returns
+        -------
+        Result : SailResult
+            * vza, raa : View zenith and relative azimuth angles in [DEG] of the directions with shape
+              (n_directions,) with n_directions = n_zenith * n_azimuth.
+            * weights : Quadrature weights of the directions (cos(vza) * dOmega / pi) with shape (n_directions,).
+            * BRDF : BRDF cube with shape (n_directions, n_wavelengths) or (M, n_directions, n_wavelengths) for M
+              canopies.
+            * black_sky : Black-sky albedo (directional hemispherical reflectance at iza), integrated from the
+              BRDF cube, with shape (n_wavelengths,) or (M, n_wavelengths).
+            * white_sky : White-sky albedo (bihemispherical reflectance), integrated from the directional
+              hemispherical reflectance of SAIL at n_zenith sun zenith angles, with shape (n_wavelengths,) or
+              (M, n_wavelengths).
+
+        Note
+        ----
+        The azimuth interval is 180 degrees, because the BRDF of SAIL is symmetric to the principal plane.
+
+        For a bare soil the albedos are equal to DHR and BHR of SAIL. With a canopy they differ by a few percent,
+        because SAIL computes the hemispherical fluxes with the diffuse four-stream approximation and without the
+        hotspot effect.
 
-    def __store_aster(self, value):
         """
-        Store the leaf reflectance for ASTER bands B1 - B9.
+        if np.ndim(iza) != 0:
+            raise ValueError("iza must be a scalar. The actual shape of iza is: {}".format(str(np.shape(iza))))
+
+        if n_zenith < 1 or n_azimuth < 1:
+            raise ValueError("n_zenith and n_azimuth must be positive. The actual values are n_zenith: {0} and "
+                             "n_azimuth: {1}".format(str(n_zenith), str(n_azimuth)))
+
+        if angle_unit == 'RAD':
+            iza = np.degrees(iza)
+
+        zenith, zenith_weights, vza, raa, weights = _hemisphere(n_zenith, n_azimuth)
+        kwargs = dict(ks=ks, kt=kt, lai=lai, hotspot=hotspot, rho_surface=rho_surface, lidf_type=lidf_type, a=a,
+                      b=b, wavelengths=wavelengths, hotspot_steps=hotspot_steps, multiangle=True)
+
+        view = SAIL(iza=iza, vza=vza, raa=raa, outputs='BRF', **kwargs)
+        sun = SAIL(iza=zenith, vza=0, raa=0, outputs='DHR', **kwargs)
+
+        BRF = view.BRF.ref
+
+        return SailResult(vza=vza, raa=raa, weights=weights, BRDF=BRF / np.pi,
+                          black_sky=np.einsum('...dl,d->...l', BRF, weights),
+                          white_sky=np.einsum('...dl,d->...l', sun.DHR.ref, zenith_weights))
+
+    @classmethod
+    def from_geometry(cls, geometry, ks, kt, lai, hotspot, rho_surface, **kwargs):
         """
+        Run SAIL with a precomputed CanopyGeometry. The angular coefficients of the geometry are reused and not
+        computed again.
+
+        Parameters
+        ----------
+        geometry : CanopyGeometry
+            Precomputed geometry and LIDF coefficients.
+        ks, kt, lai, hotspot, rho_surface : array_like
+            See SAIL.
+        kwargs : dict
+            Further parameters of SAIL (normalize, nbar, wavelengths, hotspot_steps, outputs).
+
+        Returns
+        -------
+        SAIL instance
 
-        value = np.array([self.l, value])
-        value = value.transpose()
+        """
+        return cls(None, None, None, ks, kt, lai, hotspot, rho_surface, geometry=geometry, **kwargs)
 
-        ASTER = namedtuple('ASTER', 'B1 B2 B3 B4 B5 B6 B7 B8 B9')
+    def __set_rows(self, single):
+        """
+        Number of rows (geometries or canopies) of the results.
+        """
+        rows = [self.plan.n_rows, len(self.ks), len(self.kt), len(self.rho_surface)]
+        self.n_rows = max(rows)
 
-        b1 = (520, 600)
-        b2 = (630, 690)
-        b3 = (760, 860)
-        b4 = (1600, 1700)
-        b5 = (2145, 2185)
-        b6 = (2185, 2225)
-        b7 = (2235, 2285)
-        b8 = (2295, 2365)
-        b9 = (2360, 2430)
+        if any(item != 1 and item != self.n_rows for item in rows):
+            raise AssertionError("The number of rows of the canopy structure (geometries, lai, hotspot, a, b) and "
+                                 "of the spectra (ks, kt, rho_surface) must agree or be 1. The actual numbers are: "
+                                 "{0}".format(str(rows)))
 
-        ARefB1 = value[(value[:, 0] >= b1[0]) & (value[:, 0] <= b1[1])]
-        ARefB2 = value[(value[:, 0] >= b2[0]) & (value[:, 0] <= b2[1])]
-        ARefB3 = value[(value[:, 0] >= b3[0]) & (value[:, 0] <= b3[1])]
-        ARefB4 = value[(value[:, 0] >= b4[0]) & (value[:, 0] <= b4[1])]
-        ARefB5 = value[(value[:, 0] >= b5[0]) & (value[:, 0] <= b5[1])]
-        ARefB6 = value[(value[:, 0] >= b6[0]) & (value[:, 0] <= b6[1])]
-        ARefB7 = value[(value[:, 0] >= b7[0]) & (value[:, 0] <= b7[1])]
-        ARefB8 = value[(value[:, 0] >= b8[0]) & (value[:, 0] <= b8[1])]
-        ARefB9 = value[(value[:, 0] >= b9[0]) & (value[:, 0] <= b9[1])]
+        self.single = single and self.n_rows == 1
 
-        return ASTER(ARefB1[:, 1].mean(), ARefB2[:, 1].mean(), ARefB3[:, 1].mean(), ARefB4[:, 1].mean(),
-                     ARefB5[:, 1].mean(), ARefB6[:, 1].mean(), ARefB7[:, 1].mean(), ARefB8[:, 1].mean(),
-                     ARefB9[:, 1].mean())
+        if self.plan.multiangle:
+            self.shape = (self.n_rows, self.plan.n_geometries, len(self.l))
+        else:
+            self.shape = (self.n_rows, len(self.l))
 
-    def __store_L8(self, value):
+    def __angular(self, value):
         """
-        Store the leaf reflectance for LANDSAT8 bands
-        B2 - B7.
+        Results that do not depend on the wavelength with shape (rows,). If multiangle is True the shape is
+        (canopies, n_geometries) or (n_geometries,) for a single canopy.
         """
+        value = np.broadcast_to(value, self.shape[:-1] + (1,))[..., 0]
 
-        value = np.array([self.l, value])
-        value = value.transpose()
+        if self.single and self.plan.multiangle:
+            return value[0].copy()
+        else:
+            return value.copy()
+
+    def __spectral(self, value):
+        """
+        Spectral results with shape (rows, n_wavelengths) or (n_wavelengths,) for a single canopy. If multiangle is
+        True the shape is (canopies, n_geometries, n_wavelengths) or (n_geometries, n_wavelengths).
+        """
+        value = np.broadcast_to(value, self.shape)
 
-        L8 = namedtuple('L8', 'B2 B3 B4 B5 B6 B7')
+        if self.single:
+            return value[0].copy()
+        else:
+            return np.array(value)
 
-        b2 = (452, 452 + 60)
-        b3 = (533, 533 + 57)
-        b4 = (636, 636 + 37)
-        b5 = (851, 851 + 28)
-        b6 = (1566, 1566 + 85)
-        b7 = (2107, 2107 + 187)
+    def __calc(self):
+        """
+        Canopy part of SAIL (see _canopy_terms). The extinction coefficient of the diffuse flux is stored as ke.
+        """
+        terms = _canopy_terms(self.plan, self.ks, self.kt, self.outputs)
+        self.ke = terms.pop('m')
 
-        LRefB2 = value[(value[:, 0] >= b2[0]) & (value[:, 0] <= b2[1])]
-        LRefB3 = value[(value[:, 0] >= b3[0]) & (value[:, 0] <= b3[1])]
-        LRefB4 = value[(value[:, 0] >= b4[0]) & (value[:, 0] <= b4[1])]
-        LRefB5 = value[(value[:, 0] >= b5[0]) & (value[:, 0] <= b5[1])]
-        LRefB6 = value[(value[:, 0] >= b6[0]) & (value[:, 0] <= b6[1])]
-        LRefB7 = value[(value[:, 0] >= b7[0]) & (value[:, 0] <= b7[1])]
+        return terms
 
-        return L8(LRefB2[:, 1].mean(), LRefB3[:, 1].mean(), LRefB4[:, 1].mean(), LRefB5[:, 1].mean(),
-                  LRefB6[:, 1].mean(), LRefB7[:, 1].mean())
+    def __store(self, value):
+        """
+        Store a reflectance product. The values in dB and the LANDSAT8 (B2 - B7) and ASTER (B1 - B9) band values are
+        computed on first access.
+        """
+        return SailResult(ref=value).defer(
+            refdB=partial(dB, value),
+            L8=partial(_bands, self.l, value, 'L8', L8),
+            ASTER=partial(_bands, self.l, value, 'ASTER', ASTER))
 
 
 class PROSPECT:
@@ -873,14 +1480,22 @@ class PROSPECT:
         Mean leaf angle (degrees) use 57 for a spherical LIDF. Default is 40.
     version : {'5', 'D'}
         PROSPECT version. Default is '5'.
+    tau_method : {'exact', 'fast'}, optional
+        Evaluation of the exponential integral in the layer transmission. 'exact' uses scipy.special.expi
+        (default), 'fast' uses the rational approximation pyrism.core.exp1_approx which is several times faster
+        with a maximum error below 1e-7 in the layer transmission.
+    wavelengths : array_like, optional
+        Wavelengths in [nm] (integers between 400 and 2500) at which the model is evaluated. The default (None) is
+        the continuous range from 400 until 2500 nm. Band values (L8, ASTER) are only as good as the
+        wavelengths that fall into the band.
 
     Returns
     -------
     All returns are attributes!
     L8.Bx.kx : namedtuple (with dot access)
-        Landsat 8 average kx (ks, kt, ke) values for Bx band (B2 until B7):
+        Landsat 8 average kx (ks, kt, ke) values for Bx band (B2 until B7). Computed on first access.
     ASTER.Bx.kx : namedtuple (with dot access)
-        ASTER average kx (ks, kt, ke) values for Bx band (B1 until B9):
+        ASTER average kx (ks, kt, ke) values for Bx band (B1 until B9). Computed on first access.
     l : array_like
         Continuous Wavelength from 400 until 2500 nm.
     kt : array_like
@@ -893,10 +1508,18 @@ class PROSPECT:
         Continuous Absorption from 400 until 2500 nm.
     om : array_like
         Continuous Omega value in terms of Radar from 400 until 2500 nm.
+    array : array_like
+        ks, kt, ka, ke and om as one contiguous array with shape (5, n_wavelengths). The attributes ks, kt, ka, ke
+        and om are views into this array.
+
+    See Also
+    --------
+    PROSPECT.batch
 
     """
 
-    def __init__(self, N, Cab, Cxc, Cbr, Cw, Cm, Can=0, alpha=40, version='5'):
+    def __init__(self, N, Cab, Cxc, Cbr, Cw, Cm, Can=0, alpha=40, version='5', tau_method='exact',
+                 wavelengths=None):
 
         self.N = N
         self.Cab = Cab
@@ -905,42 +1528,93 @@ class PROSPECT:
         self.Cw = Cw
         self.Cm = Cm
         self.Can = Can
+
+        self.__set_options(alpha, version, tau_method, wavelengths)
+        self.__set_coef()
+        self.__pre_process()
+        self.__calc()
+
+    @classmethod
+    def batch(cls, N, Cab, Cxc, Cbr, Cw, Cm, Can=0, alpha=40, version='5', tau_method='exact', wavelengths=None):
+        """
+        Run PROSPECT for M leaves in one vectorized pass.
+
+        Parameters
+        ----------
+        N, Cab, Cxc, Cbr, Cw, Cm, Can : int, float or array_like
+            Leaf parameters (see PROSPECT). Arrays must have the same length M. Shorter inputs (e.g. scalars) are
+            expanded with their last value.
+        alpha : int
+            Mean leaf angle (degrees). Default is 40.
+        version : {'5', 'D'}
+            PROSPECT version. Default is '5'.
+        tau_method : {'exact', 'fast'}, optional
+            Evaluation of the exponential integral in the layer transmission (see PROSPECT).
+        wavelengths : array_like, optional
+            Wavelengths in [nm] at which the model is evaluated (see PROSPECT).
+
+        Returns
+        -------
+        PROSPECT instance
+            The attributes ks, kt, ka, ke and om are arrays with shape (M, n_wavelengths). The band products
+            (L8, ASTER) are computed on first access and have the shape (M,).
+
+        Note
+        ----
+        The batch runs through the same computation as the scalar model, so row i is equal to
+        PROSPECT(N[i], Cab[i], ...) within float tolerance.
+
+        """
+        params = align_all(asarrays((N, Cab, Cxc, Cbr, Cw, Cm, Can)))
+
+        self = cls.__new__(cls)
+        self.N, self.Cab, self.Cxc, self.Cbr, self.Cw, self.Cm, self.Can = [item[:, np.newaxis] for item in params]
+
+        self.__set_options(alpha, version, tau_method, wavelengths)
+        self.__set_coef()
+        self.__pre_process()
+        self.__calc()
+
+        return self
+
+    def __set_options(self, alpha, version, tau_method, wavelengths):
         self.alpha = alpha
         self.ver = version
-
-        self.l = np.arange(400, 2501)
-        self.n_l = len(self.l)
+        self.tau_method = tau_method
 
         if self.ver != '5' and self.ver != 'D':
             raise ValueError("version must be '5' for PROSPECT 5 or 'D' for PROSPECT D. "
                              "The actual version is: {}".format(str(self.ver)))
-        self.__set_coef()
-        self.__pre_process()
-        self.__calc()
-        self.__store()
+        if self.tau_method != 'exact' and self.tau_method != 'fast':
+            raise ValueError("tau_method must be 'exact' or 'fast'. "
+                             "The actual tau_method is: {}".format(str(self.tau_method)))
+
+        self.l, self.index, self.lib = _library(wavelengths)
+        self.n_l = len(self.l)
+        self.__sorted = bool(np.all(np.diff(self.l) > 0))
 
     def __set_coef(self):
 
-        if self.ver == 'D' and self.Can == 0:
+        if self.ver == 'D' and np.any(np.asarray(self.Can) == 0):
             raise AssertionError("For PROSPECT version D is the Anthocyanins value mandatory (!=0)")
 
         if self.ver == '5':
-            self.KN = lib.p5.KN
-            self.Kab = lib.p5.Kab
-            self.Kxc = lib.p5.Kxc
-            self.Kbr = lib.p5.Kbr
-            self.Kw = lib.p5.Kw
-            self.Km = lib.p5.Km
+            self.KN = self.lib.p5.KN
+            self.Kab = self.lib.p5.Kab
+            self.Kxc = self.lib.p5.Kxc
+            self.Kbr = self.lib.p5.Kbr
+            self.Kw = self.lib.p5.Kw
+            self.Km = self.lib.p5.Km
             self.Kan = np.zeros_like(self.Km)
 
         if self.ver == 'D':
-            self.KN = lib.pd.KN
-            self.Kab = lib.pd.Kab
-            self.Kxc = lib.pd.Kxc
-            self.Kbr = lib.pd.Kbr
-            self.Kw = lib.pd.Kw
-            self.Km = lib.pd.Km
-            self.Kan = lib.pd.Kan
+            self.KN = self.lib.pd.KN
+            self.Kab = self.lib.pd.Kab
+            self.Kxc = self.lib.pd.Kxc
+            self.Kbr = self.lib.pd.Kbr
+            self.Kw = self.lib.pd.Kw
+            self.Km = self.lib.pd.Km
+            self.Kan = self.lib.pd.Kan
 
         self.n_elems_list = [len(spectrum) for spectrum in
                              [self.KN, self.Kab, self.Kxc, self.Kbr, self.Kw, self.Km, self.Kan]]
@@ -950,11 +1624,18 @@ class PROSPECT:
                 + self.Cw * self.Kw + self.Cm * self.Km) / self.N
 
         j = kall > 0
-        t1 = (1 - kall) * np.exp(-kall)
-        t2 = kall ** 2 * (-expi(-kall))
-        tau = np.ones_like(t1)
-        tau[j] = t1[j] + t2[j]
+        tau = np.ones_like(kall)
+
+        if self.tau_method == 'fast':
+            k = kall[j]
+            tau[j] = (1 - k) * np.exp(-k) + k ** 2 * exp1_approx(k)
+        else:
+            t1 = (1 - kall) * np.exp(-kall)
+            t2 = kall ** 2 * (-expi(-kall))
+            tau[j] = t1[j] + t2[j]
 
+        self.kall = kall
+        self.tau = tau
         self.r, self.t, self.Ra, self.Ta, self.denom = self.__refl_trans_one_layer(self.alpha, self.KN, tau)
 
     def __calctav(self, alpha, KN):
@@ -996,6 +1677,36 @@ class PROSPECT:
 
         return tav
 
+    def __interface(self, alpha):
+        """
+        Transmissivities and reflectivities of the leaf interfaces. The values are computed once per
+        (version, alpha) on the continuous wavelength grid and taken from the module cache afterwards.
+        """
+        key = (self.ver, float(alpha))
+
+        try:
+            coef = _interface_cache[key]
+        except KeyError:
+            KN = lib.p5.KN if self.ver == '5' else lib.pd.KN
+
+            talf = self.__calctav(alpha, KN)
+            ralf = 1.0 - talf
+            t12 = self.__calctav(90, KN)
+            r12 = 1. - t12
+            t21 = t12 / (KN * KN)
+            r21 = 1 - t21
+
+            coef = (talf, ralf, t12, r12, t21, r21)
+            for item in coef:
+                item.flags.writeable = False
+
+            _interface_cache[key] = coef
+
+        if self.index is None:
+            return coef
+        else:
+            return [item[self.index] for item in coef]
+
     def __refl_trans_one_layer(self, alpha, KN, tau):
         # <Help and Info Section> -----------------------------------------
         """
@@ -1007,12 +1718,7 @@ class PROSPECT:
         Interaction of isotropic ligth with a compact plant leaf, J. Opt.
         Soc. Am., 59(10):1376-1379.
         """
-        talf = self.__calctav(self.alpha, KN)
-        ralf = 1.0 - talf
-        t12 = self.__calctav(90, KN)
-        r12 = 1. - t12
-        t21 = t12 / (KN * KN)
-        r21 = 1 - t21
+        talf, ralf, t12, r12, t21, r21 = self.__interface(alpha)
 
         # top surface side
         denom = 1. - r21 * r21 * tau * tau
@@ -1054,144 +1760,148 @@ class PROSPECT:
 
         # Case of zero absorption
         j = self.r + self.t >= 1.
-        Tsub[j] = self.t[j] / (self.t[j] + (1 - self.t[j]) * (self.N - 1))
+        N = np.broadcast_to(self.N, j.shape)[j]
+        Tsub[j] = self.t[j] / (self.t[j] + (1 - self.t[j]) * (N - 1))
         Rsub[j] = 1 - Tsub[j]
 
         # Reflectance and transmittance of the leaf: combine top layer with next N-1 layers
         denom = 1 - Rsub * self.r
 
-        self.kt = self.Ta * Tsub / denom
-        self.ks = self.Ra + self.Ta * Rsub * self.t / denom
-        self.ka = 1 - self.ks - self.kt
-        self.ke = self.ks + self.ka
-        self.om = self.ks / self.ke
+        # The coefficients are stored in one contiguous block. ks, kt, ka, ke and om are views into it.
+        self.array = np.empty((5,) + denom.shape, dtype=np.result_type(self.Ra, self.Ta, Rsub, Tsub))
+        self.ks, self.kt, self.ka, self.ke, self.om = self.array
 
-        self.int = [self.l, self.ks, self.kt, self.ka, self.ke, self.om]
-        RT = np.asarray(self.int, dtype=np.float32)
-        self.int = RT.transpose()
+        np.divide(self.Ta * Tsub, denom, out=self.kt)
+        np.divide(self.Ta * Rsub * self.t, denom, out=self.ks)
+        self.ks += self.Ra
+        np.subtract(1, self.ks, out=self.ka)
+        self.ka -= self.kt
+        np.add(self.ks, self.ka, out=self.ke)
+        np.divide(self.ks, self.ke, out=self.om)
 
-    def __store(self):
+    def __range(self, mins, maxs):
+        """
+        Index range (slice) of the wavelengths between mins and maxs. For an unsorted wavelength grid this is a
+        boolean mask.
+        """
+        mins = self.l[0] if mins is None else mins
+        maxs = self.l[-1] if maxs is None else maxs
+
+        if self.__sorted:
+            return slice(np.searchsorted(self.l, mins, side='left'), np.searchsorted(self.l, maxs, side='right'))
+        else:
+            return (self.l >= mins) & (self.l <= maxs)
+
+    @lazy_property
+    def int(self):
+        """
+        Leaf coefficients as float32 array with the columns l, ks, kt, ka, ke and omega. Computed on first access.
+        """
+        return np.asarray([self.l, self.ks, self.kt, self.ka, self.ke, self.om], dtype=np.float32).transpose()
+
+    @lazy_property
+    def ASTER(self):
+        """
+        Average ks, kt, ka, ke and omega values for the ASTER bands B1 - B9. Computed on first access.
+        """
+        return _bands(self.l, self.array, 'ASTER', ASTER, LeafBand)
+
+    @lazy_property
+    def L8(self):
+        """
+        Average ks, kt, ka, ke and omega values for the LANDSAT8 bands B2 - B7. Computed on first access.
+        """
+        return _bands(self.l, self.array, 'L8', L8, LeafBand)
+
+    def jacobian(self):
         """
-        Store the leaf reflectance for ASTER bands B1 - B9 or LANDSAT8 bands
-        B2 - B7.
-        """
-
-        ASTER = namedtuple('ASTER', 'B1 B2 B3 B4 B5 B6 B7 B8 B9')
-        B1 = namedtuple('B1', 'ks kt ka ke omega')
-        B2 = namedtuple('B2', 'ks kt ka ke omega')
-        B3 = namedtuple('B3', 'ks kt ka ke omega')
-        B4 = namedtuple('B4', 'ks kt ka ke omega')
-        B5 = namedtuple('B5', 'ks kt ka ke omega')
-        B6 = namedtuple('B6', 'ks kt ka ke omega')
-        B7 = namedtuple('B7', 'ks kt ka ke omega')
-        B8 = namedtuple('B8', 'ks kt ka ke omega')
-        B9 = namedtuple('B9', 'ks kt ka ke omega')
-
-        b1 = (520, 600)
-        b2 = (630, 690)
-        b3 = (760, 860)
-        b4 = (1600, 1700)
-        b5 = (2145, 2185)
-        b6 = (2185, 2225)
-        b7 = (2235, 2285)
-        b8 = (2295, 2365)
-        b9 = (2360, 2430)
-
-        ARefB1 = self.int[(self.int[:, 0] >= b1[0]) & (self.int[:, 0] <= b1[1])]
-        ARefB1 = [ARefB1[:, 1].mean(), ARefB1[:, 2].mean(), ARefB1[:, 3].mean(), ARefB1[:, 4].mean(),
-                  ARefB1[:, 5].mean()]
-
-        ARefB2 = self.int[(self.int[:, 0] >= b2[0]) & (self.int[:, 0] <= b2[1])]
-        ARefB2 = [ARefB2[:, 1].mean(), ARefB2[:, 2].mean(), ARefB2[:, 3].mean(), ARefB2[:, 4].mean(),
-                  ARefB2[:, 5].mean()]
-
-        ARefB3 = self.int[(self.int[:, 0] >= b3[0]) & (self.int[:, 0] <= b3[1])]
-        ARefB3 = [ARefB3[:, 1].mean(), ARefB3[:, 2].mean(), ARefB3[:, 3].mean(), ARefB3[:, 4].mean(),
-                  ARefB3[:, 5].mean()]
-
-        ARefB4 = self.int[(self.int[:, 0] >= b4[0]) & (self.int[:, 0] <= b4[1])]
-        ARefB4 = [ARefB4[:, 1].mean(), ARefB4[:, 2].mean(), ARefB4[:, 3].mean(), ARefB4[:, 4].mean(),
-                  ARefB4[:, 5].mean()]
-
-        ARefB5 = self.int[(self.int[:, 0] >= b5[0]) & (self.int[:, 0] <= b5[1])]
-        ARefB5 = [ARefB5[:, 1].mean(), ARefB5[:, 2].mean(), ARefB5[:, 3].mean(), ARefB5[:, 4].mean(),
-                  ARefB5[:, 5].mean()]
-
-        ARefB6 = self.int[(self.int[:, 0] >= b6[0]) & (self.int[:, 0] <= b6[1])]
-        ARefB6 = [ARefB6[:, 1].mean(), ARefB6[:, 2].mean(), ARefB6[:, 3].mean(), ARefB6[:, 4].mean(),
-                  ARefB6[:, 5].mean()]
-
-        ARefB7 = self.int[(self.int[:, 0] >= b7[0]) & (self.int[:, 0] <= b7[1])]
-        ARefB7 = [ARefB7[:, 1].mean(), ARefB7[:, 2].mean(), ARefB7[:, 3].mean(), ARefB7[:, 4].mean(),
-                  ARefB7[:, 5].mean()]
-
-        ARefB8 = self.int[(self.int[:, 0] >= b8[0]) & (self.int[:, 0] <= b8[1])]
-        ARefB8 = [ARefB8[:, 1].mean(), ARefB8[:, 2].mean(), ARefB8[:, 3].mean(), ARefB8[:, 4].mean(),
-                  ARefB8[:, 5].mean()]
-
-        ARefB9 = self.int[(self.int[:, 0] >= b9[0]) & (self.int[:, 0] <= b9[1])]
-        ARefB9 = [ARefB9[:, 1].mean(), ARefB9[:, 2].mean(), ARefB9[:, 3].mean(), ARefB9[:, 4].mean(),
-                  ARefB9[:, 5].mean()]
-
-        B1 = B1(ARefB1[0], ARefB1[1], ARefB1[2], ARefB1[3], ARefB1[4])
-        B2 = B2(ARefB2[0], ARefB2[1], ARefB2[2], ARefB2[3], ARefB2[4])
-        B3 = B3(ARefB3[0], ARefB3[1], ARefB3[2], ARefB3[3], ARefB3[4])
-        B4 = B4(ARefB4[0], ARefB4[1], ARefB4[2], ARefB4[3], ARefB4[4])
-        B5 = B5(ARefB5[0], ARefB5[1], ARefB5[2], ARefB5[3], ARefB5[4])
-        B6 = B6(ARefB6[0], ARefB6[1], ARefB6[2], ARefB6[3], ARefB6[4])
-        B7 = B7(ARefB7[0], ARefB7[1], ARefB7[2], ARefB7[3], ARefB7[4])
-        B8 = B8(ARefB8[0], ARefB8[1], ARefB8[2], ARefB8[3], ARefB8[4])
-        B9 = B9(ARefB9[0], ARefB9[1], ARefB9[2], ARefB9[3], ARefB9[4])
-
-        self.ASTER = ASTER(B1, B2, B3, B4, B5, B6, B7, B8, B9)
-
-        L8 = namedtuple('L8', 'B2 B3 B4 B5 B6 B7')
-        B2 = namedtuple('B2', 'ks kt ka ke omega')
-        B3 = namedtuple('B3', 'ks kt ka ke omega')
-        B4 = namedtuple('B4', 'ks kt ka ke omega')
-        B5 = namedtuple('B5', 'ks kt ka ke omega')
-        B6 = namedtuple('B6', 'ks kt ka ke omega')
-        B7 = namedtuple('B7', 'ks kt ka ke omega')
-
-        b2 = (452, 452 + 60)
-        b3 = (533, 533 + 57)
-        b4 = (636, 636 + 37)
-        b5 = (851, 851 + 28)
-        b6 = (1566, 1566 + 85)
-        b7 = (2107, 2107 + 187)
-
-        LRefB2 = self.int[(self.int[:, 0] >= b2[0]) & (self.int[:, 0] <= b2[1])]
-        LRefB2 = [LRefB2[:, 1].mean(), LRefB2[:, 2].mean(), LRefB2[:, 3].mean(), LRefB2[:, 4].mean(),
-                  LRefB2[:, 5].mean()]
-
-        LRefB3 = self.int[(self.int[:, 0] >= b3[0]) & (self.int[:, 0] <= b3[1])]
-        LRefB3 = [LRefB3[:, 1].mean(), LRefB3[:, 2].mean(), LRefB3[:, 3].mean(), LRefB3[:, 4].mean(),
-                  LRefB3[:, 5].mean()]
-
-        LRefB4 = self.int[(self.int[:, 0] >= b4[0]) & (self.int[:, 0] <= b4[1])]
-        LRefB4 = [LRefB4[:, 1].mean(), LRefB4[:, 2].mean(), LRefB4[:, 3].mean(), LRefB4[:, 4].mean(),
-                  LRefB4[:, 5].mean()]
-
-        LRefB5 = self.int[(self.int[:, 0] >= b5[0]) & (self.int[:, 0] <= b5[1])]
-        LRefB5 = [LRefB5[:, 1].mean(), LRefB5[:, 2].mean(), LRefB5[:, 3].mean(), LRefB5[:, 4].mean(),
-                  LRefB5[:, 5].mean()]
-
-        LRefB6 = self.int[(self.int[:, 0] >= b6[0]) & (self.int[:, 0] <= b6[1])]
-        LRefB6 = [LRefB6[:, 1].mean(), LRefB6[:, 2].mean(), LRefB6[:, 3].mean(), LRefB6[:, 4].mean(),
-                  LRefB6[:, 5].mean()]
-
-        LRefB7 = self.int[(self.int[:, 0] >= b7[0]) & (self.int[:, 0] <= b7[1])]
-        LRefB7 = [LRefB7[:, 1].mean(), LRefB7[:, 2].mean(), LRefB7[:, 3].mean(), LRefB7[:, 4].mean(),
-                  LRefB7[:, 5].mean()]
-
-        B2 = B2(LRefB2[0], LRefB2[1], LRefB2[2], LRefB2[3], LRefB2[4])
-        B3 = B3(LRefB3[0], LRefB3[1], LRefB3[2], LRefB3[3], LRefB3[4])
-        B4 = B4(LRefB4[0], LRefB4[1], LRefB4[2], LRefB4[3], LRefB4[4])
-        B5 = B5(LRefB5[0], LRefB5[1], LRefB5[2], LRefB5[3], LRefB5[4])
-        B6 = B6(LRefB6[0], LRefB6[1], LRefB6[2], LRefB6[3], LRefB6[4])
-        B7 = B7(LRefB7[0], LRefB7[1], LRefB7[2], LRefB7[3], LRefB7[4])
-
-        self.L8 = L8(B2, B3, B4, B5, B6, B7)
+        Analytic Jacobian of the leaf reflectance (ks) and transmittance (kt) with respect to the leaf parameters
+        N, Cab, Cxc, Cbr, Cw, Cm and Can.
+
+        Returns
+        -------
+        Jacobian : ReflectanceResult (dict with dot access)
+            * ks, kt : Derivatives with shape (n_wavelengths, 7) for scalar and (M, n_wavelengths, 7) for batched
+              instances. The last axis follows the order of `names`.
+            * names : Names of the parameters.
+
+        Note
+        ----
+        The derivatives are propagated through the absorption coefficient kall, the layer transmission tau,
+        the Allen equations of one layer and the Stokes equations of N layers. The derivative with respect to
+        Can is zero for PROSPECT 5.
+
+        """
+        talf, ralf, t12, r12, t21, r21 = self.__interface(self.alpha)
+        r, t, Ra, Ta, N, k, tau = self.r, self.t, self.Ra, self.Ta, self.N, self.kall, self.tau
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Derivatives of kall. The first axis are the parameters.
+            dk = np.asarray([np.broadcast_to(item, k.shape) for item in
+                             [-k / N, self.Kab / N, self.Kxc / N, self.Kbr / N, self.Kw / N, self.Km / N,
+                              self.Kan / N]])
+            dN = np.zeros((7,) + (1,) * k.ndim)
+            dN[0] = 1
+
+            # Layer transmission: d tau / d kall = 2 (kall E1(kall) - exp(-kall))
+            j = k > 0
+            dtau_dk = np.zeros_like(k) - 2.
+            if self.tau_method == 'fast':
+                e1 = exp1_approx(k[j])
+            else:
+                e1 = -expi(-k[j])
+            dtau_dk[j] = 2 * (k[j] * e1 - np.exp(-k[j]))
+            dtau = dtau_dk * dk
+
+            # Reflectance and transmittance of one layer
+            g = (1 + r21 * r21 * tau * tau) / self.denom ** 2
+            dt = t12 * t21 * g * dtau
+            dTa = talf * t21 * g * dtau
+            dr = r21 * (dtau * t + tau * dt)
+            dRa = r21 * (dtau * Ta + tau * dTa)
+
+            # Reflectance and transmittance of N layers
+            P = (1 + r) ** 2 - t ** 2
+            Q = (1 - r) ** 2 - t ** 2
+            D = np.sqrt(P * Q)
+            dD = ((2 * (1 + r) * dr - 2 * t * dt) * Q + P * (-2 * (1 - r) * dr - 2 * t * dt)) / (2 * D)
+
+            a = (1 + r * r - t * t + D) / (2 * r)
+            b = (1 - r * r + t * t + D) / (2 * t)
+            da = (2 * r * dr - 2 * t * dt + dD) / (2 * r) - a * dr / r
+            db = (-2 * r * dr + 2 * t * dt + dD) / (2 * t) - b * dt / t
+
+            bNm1 = np.power(b, N - 1)
+            dbNm1 = bNm1 * ((N - 1) * db / b + np.log(b) * dN)
+            bN2 = bNm1 * bNm1
+            dbN2 = 2 * bNm1 * dbNm1
+            a2 = a * a
+            denom = a2 * bN2 - 1
+            ddenom = 2 * a * da * bN2 + a2 * dbN2
+
+            Rsub = a * (bN2 - 1) / denom
+            Tsub = bNm1 * (a2 - 1) / denom
+            dRsub = (da * (bN2 - 1) + a * dbN2 - Rsub * ddenom) / denom
+            dTsub = (dbNm1 * (a2 - 1) + 2 * bNm1 * a * da - Tsub * ddenom) / denom
+
+            # Case of zero absorption
+            j = r + t >= 1.
+            g = t + (1 - t) * (N - 1)
+            Tsub = np.where(j, t / g, Tsub)
+            Rsub = np.where(j, 1 - Tsub, Rsub)
+            dTsub = np.where(j, (dt * (N - 1) - t * (1 - t) * dN) / g ** 2, dTsub)
+            dRsub = np.where(j, -dTsub, dRsub)
+
+            # Combine top layer with next N-1 layers
+            denom = 1 - Rsub * r
+            ddenom = -(dRsub * r + Rsub * dr)
+
+            dkt = (dTa * Tsub + Ta * dTsub) / denom - Ta * Tsub * ddenom / denom ** 2
+            dks = dRa + (dTa * Rsub * t + Ta * dRsub * t + Ta * Rsub * dt) / denom - \
+                  Ta * Rsub * t * ddenom / denom ** 2
+
+        return ReflectanceResult(ks=np.moveaxis(dks, 0, -1), kt=np.moveaxis(dkt, 0, -1),
+                                 names=('N', 'Cab', 'Cxc', 'Cbr', 'Cw', 'Cm', 'Can'))
 
     def select(self, mins=None, maxs=None, function='mean'):
         """
@@ -1199,10 +1909,10 @@ class PROSPECT:
 
         Parameters
         ----------
-        mins : int
-            Lower bound of the wavelength (400 - 2500)
-        maxs : int
-            Upper bound of the wavelength (400 - 2500)
+        mins : int, optional
+            Lower bound of the wavelength (400 - 2500). Default is the first wavelength.
+        maxs : int, optional
+            Upper bound of the wavelength (400 - 2500). Default is the last wavelength.
 
         function : {'mean'}, optional
             Specify  how the bands are calculated.
@@ -1210,24 +1920,36 @@ class PROSPECT:
         Returns
         -------
         Band : array_like
-            Reflectance in the selected range.
+            Mean ks, kt, ka, ke and om in the selected range with shape (5,) or (5, M) for batched instances.
         """
         if function == 'mean':
-            ranges = self.int[(self.int[:, 0] >= mins) & (self.int[:, 0] <= maxs)]
-            ks = ranges[:, 1].mean()
-            kt = ranges[:, 2].mean()
-            ka = ranges[:, 3].mean()
-            ke = ranges[:, 4].mean()
-            om = ranges[:, 5].mean()
+            return np.asarray(self.array[..., self.__range(mins, maxs)].mean(axis=-1), dtype=np.float32)
+
+    def indices(self, names='NDVI'):
+        """
+        Vegetation indices of the leaf reflectance.
+
+        Parameters
+        ----------
+        names : str or tuple of str, optional
+            Names of the indices in pyrism.core.INDICES. Default is 'NDVI'.
+
+        Returns
+        -------
+        indices : array_like
+            Indices with shape (n_indices,) or (M, n_indices) for batched instances. If names is a single string the
+            last axis is removed. The NDVI is also stored as attribute ndvi.
 
-            ranges = [ks, kt, ka, ke, om]
-            return np.asarray(ranges, dtype=np.float32)
+        See Also
+        --------
+        pyrism.core.VegetationIndices
+        """
+        values = VegetationIndices.get(names, self.l)(self.ks)
 
-    def indices(self):
-        self.ndvi = (self.select(851, 879)[0] - self.select(636, 673)[0]) / (
-                self.select(851, 879)[0] + self.select(636, 673)[0])
+        if names == 'NDVI':
+            self.ndvi = values
 
-        return self.ndvi
+        return values
 
     def cleanup(self, name):
         """Do cleanup for an attribute"""
@@ -1884,18 +2606,22 @@ class LSM:
 
     Parameters
     ----------
-    reflectance : int or float
+    reflectance : int, float or array_like
         Surface (Lambertian) reflectance in optical wavelength.
-    moisture : int or float
-        Surface moisture content between 0 and 1.
+    moisture : int, float or array_like
+        Surface moisture content between 0 and 1. If reflectance or moisture are arrays with shape (M,) the
+        reflectance has the shape (M, n_wavelengths).
+    wavelengths : array_like, optional
+        Wavelengths in [nm] (integers between 400 and 2500) at which the model is evaluated. The default (None) is
+        the continuous range from 400 until 2500 nm.
 
     Returns
     -------
     All returns are attributes!
     self.L8 : namedtuple (with dot access)
-        Landsat 8 average kx (ks, kt, ke) values for Bx band (B2 until B7)
+        Landsat 8 average kx (ks, kt, ke) values for Bx band (B2 until B7). Computed on first access.
     self.ASTER : namedtuple (with dot access)
-        ASTER average kx (ks, kt, ke) values for Bx band (B1 until B9)
+        ASTER average kx (ks, kt, ke) values for Bx band (B1 until B9). Computed on first access.
     self.ref : dict (with dot access)
         Continuous surface reflectance values from 400 until 2500 nm
     self.l : dict (with dot access)
@@ -1904,137 +2630,221 @@ class LSM:
 
     """
 
-    def __init__(self, reflectance, moisture):
+    def __init__(self, reflectance, moisture, wavelengths=None):
 
-        self.l = np.arange(400, 2501)
+        self.l, _, self.lib = _library(wavelengths)
         self.sRef = reflectance
         self.moisture = moisture
         self.__calc()
-        self.__store()
 
     def __calc(self):
-        self.ref = self.sRef * (self.moisture * lib.soil.rsoil1 + (1 - self.moisture) * lib.soil.rsoil2)
-        self.int = [self.l, self.ref]
-        self.int = np.asarray(self.int, dtype=np.float32)
-        self.int = self.int.transpose()
+        if np.ndim(self.sRef) > 0 or np.ndim(self.moisture) > 0:
+            sRef = np.reshape(self.sRef, (-1, 1))
+            moisture = np.reshape(self.moisture, (-1, 1))
+        else:
+            sRef, moisture = self.sRef, self.moisture
+
+        self.ref = sRef * (moisture * self.lib.soil.rsoil1 + (1 - moisture) * self.lib.soil.rsoil2)
 
     #        self.surface = ReflectanceResult(ref=self.ref,
     #       l=self.l)
 
-    def __store(self):
+    @lazy_property
+    def int(self):
+        """
+        Surface reflectance as float32 array with the columns l and ref. Computed on first access.
+        """
+        return np.asarray([self.l, self.ref], dtype=np.float32).transpose()
+
+    @lazy_property
+    def ASTER(self):
+        """
+        Soil reflectance for the ASTER bands B1 - B9. Computed on first access.
+        """
+        return _bands(self.l, self.ref, 'ASTER', ASTER)
+
+    @lazy_property
+    def L8(self):
+        """
+        Soil reflectance for the LANDSAT8 bands B2 - B7. Computed on first access.
+        """
+        return _bands(self.l, self.ref, 'L8', L8)
+
+    def select(self, mins, maxs, function='mean'):
         # <Help and Info Section> -----------------------------------------
         """
-        Store the surface reflectance for ASTER bands B1 - B9 or LANDSAT8 bands
-        B2 - B7.
+        Returns the means of the coefficients in range between min and max.
+
+        Args:
+            :min:   (int)
+                                Lower bound of the wavelength (400 - 2500)
+
+            :max:   (int)
+                                Upper bound of the wavelength (400 - 2500)
 
-        Access:
-            :self.ASTER.Bx:     (array_like)
-                                Soil reflectance for ASTER Band x.
-            :self.L8.Bx:        (array_like)
-                                Soil reflectance for LANDSAT 8 Band x.
         """
+        if function == 'mean':
+            return self.ref[..., (self.l >= mins) & (self.l <= maxs)].mean(axis=-1)
+
+    def cleanup(self, name):
+        """Do cleanup for an attribute"""
+        try:
+            delattr(self, name)
+        except TypeError:
+            for item in name:
+                delattr(self, item)
+
 
-        ASTER = namedtuple('ASTER', 'B1 B2 B3 B4 B5 B6 B7 B8 B9')
+class PROSAIL(object):
+    """
+    Fused PROSAIL model (PROSPECT, LSM and SAIL) that returns only the requested reflectance products.
 
-        b1 = (520, 600)
-        b2 = (630, 690)
-        b3 = (760, 860)
-        b4 = (1600, 1700)
-        b5 = (2145, 2185)
-        b6 = (2185, 2225)
-        b7 = (2235, 2285)
-        b8 = (2295, 2365)
-        b9 = (2360, 2430)
+    The leaf spectra of PROSPECT are passed to SAIL as views into the coefficient block of PROSPECT, the soil
+    reflectance is computed directly from the spectral library and the canopy terms and the coupling of SAIL are
+    evaluated without a SAIL instance. No intermediate results (band values, dB values, canopy terms) are stored,
+    so PROSAIL is the fastest way to simulate many canopies, e.g. for LUTs or inversions.
 
-        B1 = self.int[(self.int[:, 0] >= b1[0]) & (self.int[:, 0] <= b1[1])]
-        B1 = B1[:, 1].mean()
+    Parameters
+    ----------
+    iza, vza, raa : int, float or ndarray
+        Incidence (iza) and scattering (vza) zenith angle, as well as relative azimuth (raa) angle.
+    N, Cab, Cxc, Cbr, Cw, Cm, Can : int, float or array_like
+        Leaf parameters (see PROSPECT). If one of the parameters is an array with shape (M,) the leaves are
+        computed with PROSPECT.batch.
+    lai, hotspot : float or array_like
+        Leaf area index and hotspot parameter (see SAIL).
+    reflectance, moisture : int, float or array_like, optional
+        Soil brightness and soil moisture (see LSM). Default is a dry soil with reflectance = 1 and moisture = 1.
+    lidf_type : {'verhoef', 'campbell'}, optional
+        Define with which method the LIDF is calculated. Default is 'campbell'
+    a, b : float or array_like, optional
+        Parameter of the LIDF (see SAIL).
+    outputs : str or tuple of str, optional
+        Products to compute ('BRF', 'BRDF', 'BHR', 'DHR', 'HDR'). Default is 'BRF'.
+    alpha : int
+        Mean leaf angle of PROSPECT (degrees). Default is 40.
+    version : {'5', 'D'}
+        PROSPECT version. Default is '5'.
+    tau_method : {'exact', 'fast'}, optional
+        Evaluation of the exponential integral in PROSPECT. Default is 'exact'.
+    wavelengths : array_like, optional
+        Wavelengths in [nm] at which the model is evaluated. The default (None) is the continuous range from 400
+        until 2500 nm.
+    angle_unit : {'DEG', 'RAD'}, optional
+        * 'DEG': All input angles (iza, vza, raa) are in [DEG] (default).
+        * 'RAD': All input angles (iza, vza, raa) are in [RAD].
+    hotspot_steps : int, optional
+        Number of steps of the hotspot integration (see SAIL). Default is 20.
+    geometry : CanopyGeometry, optional
+        Precomputed geometry and LIDF coefficients. If given, iza, vza, raa, lidf_type, a, b, angle_unit and
+        multiangle are ignored.
+    multiangle : bool, optional
+        If True the geometries are an own axis of the results (see SAIL). Default is False.
 
-        B2 = self.int[(self.int[:, 0] >= b2[0]) & (self.int[:, 0] <= b2[1])]
-        B2 = B2[:, 1].mean()
+    Returns
+    -------
+    All returns are attributes!
+    BRF, BRDF, BHR, DHR, HDR : ndarray
+        The requested products with shape (M, n_wavelengths), (M, n_geometries, n_wavelengths) if multiangle is
+        True or without the first axis if all inputs describe a single canopy. Only the requested products are set.
+    l : ndarray
+        Wavelengths in [nm].
+    outputs : tuple
+        Computed products.
 
-        B3 = self.int[(self.int[:, 0] >= b3[0]) & (self.int[:, 0] <= b3[1])]
-        B3 = B3[:, 1].mean()
+    See Also
+    --------
+    PROSPECT
+    LSM
+    SAIL
 
-        B4 = self.int[(self.int[:, 0] >= b4[0]) & (self.int[:, 0] <= b4[1])]
-        B4 = B4[:, 1].mean()
+    Note
+    ----
+    The results are equal to SAIL(ks=PROSPECT(...).ks, kt=PROSPECT(...).kt, rho_surface=LSM(...).ref, ...)
+    within float tolerance. Use the single models if the band values, the canopy terms or the leaf properties
+    are needed.
 
-        B5 = self.int[(self.int[:, 0] >= b5[0]) & (self.int[:, 0] <= b5[1])]
-        B5 = B5[:, 1].mean()
+    Examples
+    --------
+    >>> prosail = PROSAIL(iza=30, vza=10, raa=0, N=1.5, Cab=np.linspace(10, 80, 100), Cxc=8, Cbr=0, Cw=0.01,
+    ...                   Cm=0.009, lai=3, hotspot=0.01, outputs=('BRF', 'DHR'))
+    >>> prosail.BRF.shape
+    (100, 2101)
 
-        B6 = self.int[(self.int[:, 0] >= b6[0]) & (self.int[:, 0] <= b6[1])]
-        B6 = B6[:, 1].mean()
+    """
 
-        B7 = self.int[(self.int[:, 0] >= b7[0]) & (self.int[:, 0] <= b7[1])]
-        B7 = B7[:, 1].mean()
+    def __init__(self, iza, vza, raa, N, Cab, Cxc, Cbr, Cw, Cm, lai, hotspot, Can=0, reflectance=1., moisture=1.,
+                 lidf_type='campbell', a=57, b=0, outputs='BRF', alpha=40, version='5', tau_method='exact',
+                 wavelengths=None, angle_unit='DEG', hotspot_steps=20, geometry=None, multiangle=False):
 
-        B8 = self.int[(self.int[:, 0] >= b8[0]) & (self.int[:, 0] <= b8[1])]
-        B8 = B8[:, 1].mean()
+        self.outputs = (outputs,) if isinstance(outputs, str) else tuple(outputs)
 
-        B9 = self.int[(self.int[:, 0] >= b9[0]) & (self.int[:, 0] <= b9[1])]
-        B9 = B9[:, 1].mean()
+        for item in self.outputs:
+            if item not in OUTPUTS or item == 'canopy':
+                raise ValueError("Unknown output {0}. Possible outputs are: BRF, BRDF, BHR, DHR, HDR".format(
+                    str(item)))
 
-        self.ASTER = ASTER(B1, B2, B3, B4, B5, B6, B7, B8, B9)
+        leaf = (N, Cab, Cxc, Cbr, Cw, Cm, Can)
+        soil = (reflectance, moisture)
 
-        L8 = namedtuple('L8', 'B2 B3 B4 B5 B6 B7')
+        if any(np.ndim(item) > 0 for item in leaf):
+            prospect = PROSPECT.batch(*leaf, alpha=alpha, version=version, tau_method=tau_method,
+                                      wavelengths=wavelengths)
+        else:
+            prospect = PROSPECT(*leaf, alpha=alpha, version=version, tau_method=tau_method,
+                                wavelengths=wavelengths)
 
-        b2 = (452, 452 + 60)
-        b3 = (533, 533 + 57)
-        b4 = (636, 636 + 37)
-        b5 = (851, 851 + 28)
-        b6 = (1566, 1566 + 85)
-        b7 = (2107, 2107 + 187)
+        self.l = prospect.l
 
-        B2 = self.int[(self.int[:, 0] >= b2[0]) & (self.int[:, 0] <= b2[1])]
-        B2 = B2[:, 1].mean()
+        plan = SAILPlan(iza, vza, raa, lai, hotspot, lidf_type=lidf_type, a=a, b=b, angle_unit=angle_unit,
+                        hotspot_steps=hotspot_steps, geometry=geometry, multiangle=multiangle)
 
-        B3 = self.int[(self.int[:, 0] >= b3[0]) & (self.int[:, 0] <= b3[1])]
-        B3 = B3[:, 1].mean()
+        single = plan.single and all(np.ndim(item) == 0 for item in leaf + soil)
+        spectral_shape = plan.canopy_shape[:-1] + (len(self.l),)
 
-        B4 = self.int[(self.int[:, 0] >= b4[0]) & (self.int[:, 0] <= b4[1])]
-        B4 = B4[:, 1].mean()
+        # ks and kt are views into the coefficient block of PROSPECT
+        ks, kt = [np.reshape(np.atleast_2d(item), spectral_shape) for item in (prospect.ks, prospect.kt)]
+        rho = self.__soil(reflectance, moisture, prospect.lib, spectral_shape)
 
-        B5 = self.int[(self.int[:, 0] >= b5[0]) & (self.int[:, 0] <= b5[1])]
-        B5 = B5[:, 1].mean()
+        rows = [plan.n_rows, len(ks), len(rho)]
+        n_rows = max(rows)
 
-        B6 = self.int[(self.int[:, 0] >= b6[0]) & (self.int[:, 0] <= b6[1])]
-        B6 = B6[:, 1].mean()
+        if any(item != 1 and item != n_rows for item in rows):
+            raise AssertionError("The number of rows of the canopy structure (geometries, lai, hotspot, a, b), the "
+                                 "leaf parameters and the soil parameters must agree or be 1. The actual numbers "
+                                 "are: {0}".format(str(rows)))
 
-        B7 = self.int[(self.int[:, 0] >= b7[0]) & (self.int[:, 0] <= b7[1])]
-        B7 = B7[:, 1].mean()
+        if plan.multiangle:
+            shape = (n_rows, plan.n_geometries, len(self.l))
+        else:
+            shape = (n_rows, len(self.l))
 
-        self.L8 = L8(B2, B3, B4, B5, B6, B7)
+        coupled = _couple(_canopy_terms(plan, ks, kt, self.outputs), rho, self.outputs)
+        names = dict(BRF='rsot', BHR='rddt', DHR='rsdt', HDR='rdot')
 
-    #
-    #        self.int = ReflectanceResult(L8=L8,
-    #   ASTER=ASTER,
-    #   surface=self.surface)
+        for item in self.outputs:
+            value = coupled[names.get(item, 'rsot')]
 
-    def select(self, mins, maxs, function='mean'):
-        # <Help and Info Section> -----------------------------------------
-        """
-        Returns the means of the coefficients in range between min and max.
+            if value.shape != shape:
+                value = np.array(np.broadcast_to(value, shape))
 
-        Args:
-            :min:   (int)
-                                Lower bound of the wavelength (400 - 2500)
+            if item == 'BRDF':
+                value = value / np.pi
 
-            :max:   (int)
-                                Upper bound of the wavelength (400 - 2500)
+            setattr(self, item, value[0] if single else value)
 
+    @staticmethod
+    def __soil(reflectance, moisture, lib, shape):
         """
-        if function == 'mean':
-            ranges = self.int[(self.int[:, 0] >= mins) & (self.int[:, 0] <= maxs)]
-            ref = ranges[:, 1].mean()
+        Soil reflectance of LSM with the shape of the leaf spectra.
+        """
+        if np.ndim(reflectance) > 0 or np.ndim(moisture) > 0:
+            reflectance = np.reshape(reflectance, (-1, 1))
+            moisture = np.reshape(moisture, (-1, 1))
 
-            return ref
+        rho = reflectance * (moisture * lib.soil.rsoil1 + (1 - moisture) * lib.soil.rsoil2)
 
-    def cleanup(self, name):
-        """Do cleanup for an attribute"""
-        try:
-            delattr(self, name)
-        except TypeError:
-            for item in name:
-                delattr(self, item)
+        return np.reshape(np.atleast_2d(rho), shape)
 
 
 class I2EM(Kernel):
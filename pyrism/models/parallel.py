@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import cpu_count
+
+import numpy as np
+
+
+def parallel_map(function, params, path, chunk_size=1000, workers=None, shape=None, dtype=np.float32,
+                 kwargs=None):
+    """
+    Evaluate a model for a table of parameters in a process pool and write the results into a memory mapped .npy
+    file.
+
+    The table is split into chunks of chunk_size rows. Every worker process evaluates one chunk at a time and writes
+    the results directly into its rows of the output file, so only the parameters of the chunks are sent to the
+    workers and no results are sent back. The rows of a chunk are fixed by its position in the table, so the output
+    does not depend on the number of workers or on the order in which the chunks are finished.
+
+    Parameters
+    ----------
+    function : callable
+        Model with the signature function(params, **kwargs). params is a dict with the parameter arrays of one chunk
+        (length m) and the result must be an array with shape (m,) + shape. The function must be picklable, i.e.
+        defined at the top level of a module (e.g. pyrism.models.lut.evaluate).
+    params : dict
+        Parameter arrays with the same length M.
+    path : str
+        Base path of the output file (without extension).
+    chunk_size : int, optional
+        Number of rows that are evaluated at once. Default is 1000.
+    workers : int, optional
+        Number of worker processes. The default (None) is the number of CPUs. With workers = 1 the chunks are
+        evaluated in the calling process.
+    shape : tuple, optional
+        Shape of the result of one row. The default (None) evaluates the first chunk in the calling process to
+        determine the shape.
+    dtype : numpy.dtype, optional
+        Data type of the output. Default is float32.
+    kwargs : dict, optional
+        Further parameters of function.
+
+    Returns
+    -------
+    results : numpy.memmap
+        Read only results with shape (M,) + shape.
+
+    Note
+    ----
+    The models of pyrism are vectorized with numpy and use a single thread. Use one worker per physical core and
+    chunks that are large enough that every worker evaluates several chunks.
+
+    Examples
+    --------
+    Any model that can be evaluated row by row can be used, e.g. I2EM:
+
+    >>> def backscatter(params, frequency):
+    ...     return np.array([I2EM(iza, iza, 0, frequency=frequency, diel_constant=eps, corrlength=l,
+    ...                           sigma=s).BSC.array[:, 0]
+    ...                      for iza, eps, l, s in zip(params['iza'], params['eps'], params['l'], params['s'])])
+    >>> results = parallel_map(backscatter, table, 'i2em', chunk_size=100, workers=64, kwargs=dict(frequency=1.26))
+
+    """
+    kwargs = {} if kwargs is None else kwargs
+    workers = cpu_count() if workers is None else int(workers)
+
+    if workers < 1:
+        raise ValueError("workers must be a positive integer. The actual value is: {}".format(str(workers)))
+
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer. The actual value is: {}".format(str(chunk_size)))
+
+    M = len(next(iter(params.values())))
+
+    for name, item in params.items():
+        if len(item) != M:
+            raise AssertionError("All parameter arrays must have the same length. The length of {0} is {1} and "
+                                 "not {2}".format(str(name), str(len(item)), str(M)))
+
+    chunks = [(start, min(start + chunk_size, M)) for start in range(0, M, chunk_size)]
+
+    first = None
+    if shape is None:
+        first = np.asarray(function(_chunk(params, *chunks[0]), **kwargs))
+        shape = first.shape[1:]
+
+    directory = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    results = np.lib.format.open_memmap(path + '.npy', mode='w+', dtype=dtype, shape=(M,) + tuple(shape))
+
+    if first is not None:
+        results[slice(*chunks[0])] = first
+        chunks = chunks[1:]
+
+    if workers == 1 or len(chunks) < 2:
+        for start, stop in chunks:
+            results[start:stop] = function(_chunk(params, start, stop), **kwargs)
+
+        results.flush()
+        del results
+
+    else:
+        # The header of the file must be written before the workers open it.
+        results.flush()
+        del results
+
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(chunks)))
+
+        try:
+            futures = [executor.submit(_run_chunk, function, _chunk(params, start, stop), path, start, kwargs)
+                       for start, stop in chunks]
+
+            # Raise the first error in the order of the chunks
+            for future in futures:
+                future.result()
+        finally:
+            executor.shutdown(wait=True)
+
+    return np.load(path + '.npy', mmap_mode='r')
+
+
+def _chunk(params, start, stop):
+    return dict((name, np.asarray(item[start:stop])) for name, item in params.items())
+
+
+def _run_chunk(function, params, path, start, kwargs):
+    """
+    Evaluate one chunk in a worker process and write it into the rows start:start + m of the output file.
+    """
+    value = function(params, **kwargs)
+
+    results = np.load(path + '.npy', mmap_mode='r+')
+    results[start:start + len(value)] = value
+    results.flush()
+    del results
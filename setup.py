@@ -51,7 +51,7 @@ setup(name='pyrism',
       ],
       # package_data={"": ["*.txt"]},
       include_package_data=True,
-      install_requires=['numpy', 'scipy'],
+      install_requires=['numpy', 'scipy', 'futures; python_version < "3"'],
       setup_requires=[
           'pytest-runner',
       ],
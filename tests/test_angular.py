@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from pyrism import PROSPECT, SAIL, LSM, AngularGrid
+
+
+@pytest.fixture
+def grid(tmpdir):
+    return AngularGrid.build(str(tmpdir.join('grid')), iza=np.arange(0, 61, 10.), vza=np.arange(0, 61, 10.),
+                             raa=np.arange(0, 181, 30.), params=dict(lai=2, hotspot=0.1), chunk_size=30,
+                             wavelengths=np.arange(400, 2501, 100))
+
+
+class TestAngularGrid:
+    def test_build(self, grid):
+        assert grid.spectra.shape == (7, 7, 7, 22)
+        assert isinstance(grid.spectra, np.memmap)
+        assert grid.params['lai'] == 2
+
+        prospect = PROSPECT(N=1.5, Cab=40, Cxc=8, Cbr=0, Cw=0.01, Cm=0.009, wavelengths=grid.l)
+        soil = LSM(reflectance=1, moisture=1, wavelengths=grid.l)
+        sail = SAIL(iza=30, vza=20, raa=90, ks=prospect.ks, kt=prospect.kt, lai=2, hotspot=0.1,
+                    rho_surface=soil.ref, wavelengths=grid.l)
+
+        assert np.allclose(grid.spectra[3, 2, 3], sail.BRF.ref, atol=1e-6)
+        assert np.allclose(grid.query(30, 20, 90).ref, sail.BRF.ref, atol=1e-6)
+        assert np.allclose(AngularGrid(grid.path).spectra, grid.spectra)
+
+    @pytest.mark.parametrize("method", ['linear', 'cubic'])
+    def test_query(self, grid, method):
+        rs = np.random.RandomState(0)
+        iza, vza, raa = rs.uniform(0, 60, 20), rs.uniform(0, 60, 20), rs.uniform(-180, 180, 20)
+
+        prospect = PROSPECT(N=1.5, Cab=40, Cxc=8, Cbr=0, Cw=0.01, Cm=0.009, wavelengths=grid.l)
+        soil = LSM(reflectance=1, moisture=1, wavelengths=grid.l)
+        sail = SAIL(iza=iza, vza=vza, raa=raa, ks=prospect.ks, kt=prospect.kt, lai=2, hotspot=0.1,
+                    rho_surface=soil.ref, wavelengths=grid.l)
+
+        result = grid.query(iza, vza, raa, method=method)
+
+        assert result.ref.shape == (20, 22)
+        assert result.error.shape == (20, 22)
+        assert np.mean(np.abs(result.ref - sail.BRF.ref)) < 0.01
+
+    def test_unequal_nodes(self, tmpdir):
+        grid = AngularGrid.build(str(tmpdir.join('grid')), iza=[0, 20, 40, 60], vza=[0, 10, 20, 40, 60],
+                                 raa=[0, 60, 120, 180], wavelengths=[500, 800])
+
+        result = grid.query(20, 25, 50)
+        nearest = grid.spectra[1, 2, 1]
+
+        assert result.ref.shape == (2,)
+        assert np.allclose(result.error, np.abs(result.ref - nearest))
+
+        with pytest.raises(ValueError):
+            grid.query(20, 25, 50, method='cubic')
+
+    def test_few_nodes(self, tmpdir):
+        grid = AngularGrid.build(str(tmpdir.join('grid')), iza=[20, 40], vza=[0, 10, 20, 30], raa=[0, 90, 180],
+                                 wavelengths=[500, 800])
+
+        assert grid.query(30, 15, 45).ref.shape == (2,)
+
+        with pytest.raises(ValueError):
+            grid.query(30, 15, 45, method='cubic')
+
+    def test_version_d(self, tmpdir):
+        grid = AngularGrid.build(str(tmpdir.join('grid')), iza=[30], vza=[10], raa=[0], version='D',
+                                 wavelengths=[500, 800])
+
+        assert grid.params['Can'] == 1
+        assert np.all(np.isfinite(grid.spectra))
+
+    def test_raise_exception(self, grid):
+        with pytest.raises(ValueError):
+            grid.query(70, 10, 0)
+
+        with pytest.raises(ValueError):
+            grid.query(30, 10, 0, method='quadratic')
+
+        with pytest.raises(ValueError):
+            AngularGrid.build(grid.path + '_2', iza=[0, 10], vza=[10, 0], raa=[0])
@@ -2,7 +2,7 @@ import numpy as np
 import pytest
 
 from pyrism.core import (ReflectanceResult, EmissivityResult, SailResult, BRF, BSC, BRDF, dB, sec,
-                         cot, linear, load_param)
+                         cot, linear, load_param, exp1_approx)
 
 
 class TestResultClass:
@@ -79,3 +79,17 @@ class TestParam:
         assert param.W1.hs == 0.3
         assert param.W2.hs == 0.55
         assert param.W3.hs == 0.60
+
+
+class TestExp1:
+    def test_exp1_approx(self):
+        from scipy.special import exp1
+
+        x = np.logspace(-6, 2.5, 10000)
+        assert np.allclose(exp1_approx(x), exp1(x), atol=3e-7, rtol=5e-8)
+
+    def test_exp1_tau(self):
+        from scipy.special import exp1
+
+        x = np.logspace(-6, 2.5, 10000)
+        assert np.max(np.abs(x ** 2 * (exp1_approx(x) - exp1(x)))) < 1e-7
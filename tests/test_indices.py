@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from pyrism import PROSPECT, VegetationIndices, INDICES
+from pyrism.core.indices import _engine_cache, _ENGINE_CACHE_SIZE
+
+
+@pytest.fixture
+def prospect():
+    return PROSPECT.batch(N=[1.2, 1.8, 2.5], Cab=[20, 40, 60], Cxc=8, Cbr=0, Cw=[0.005, 0.01, 0.02], Cm=0.009)
+
+
+class TestVegetationIndices:
+    def test_shape(self, prospect):
+        values = VegetationIndices()(prospect.ks)
+
+        assert values.shape == (3, len(INDICES))
+        assert np.all(np.isfinite(values))
+
+    def test_ndvi(self, prospect):
+        red = prospect.ks[:, 236:274].mean(axis=1)
+        nir = prospect.ks[:, 451:480].mean(axis=1)
+
+        assert np.allclose(VegetationIndices('NDVI')(prospect.ks), (nir - red) / (nir + red))
+        assert np.allclose(VegetationIndices(('EVI', 'NDVI'))(prospect.ks)[:, 1], (nir - red) / (nir + red))
+
+    def test_single_spectrum(self, prospect):
+        single = PROSPECT(N=1.8, Cab=40, Cxc=8, Cbr=0, Cw=0.01, Cm=0.009)
+
+        assert np.allclose(single.indices(), VegetationIndices('NDVI')(prospect.ks)[1])
+        assert np.allclose(single.ndvi, single.indices())
+        assert np.allclose(prospect.indices(('NDVI', 'NDWI')), VegetationIndices(('NDVI', 'NDWI'))(prospect.ks))
+
+    def test_custom(self, prospect):
+        engine = VegetationIndices(('SR', 'NDVI'), custom=dict(SR=(dict(red=(636, 673), nir=(851, 879)),
+                                                                   lambda b: b.nir / b.red)))
+        values = engine(prospect.ks)
+        ratio = values[:, 0]
+
+        assert np.allclose(values[:, 1], (ratio - 1) / (ratio + 1))
+
+    def test_custom_replaces_catalogue(self, prospect):
+        engine = VegetationIndices(custom=dict(NDVI=(dict(red=(636, 673), nir=(851, 879)), lambda b: b.nir / b.red)))
+        values = engine(prospect.ks)
+
+        assert engine.names == tuple(sorted(INDICES))
+        assert values.shape == (3, len(INDICES))
+
+        ndvi = VegetationIndices('NDVI')(prospect.ks)
+        assert np.allclose(values[:, engine.names.index('NDVI')], (1 + ndvi) / (1 - ndvi))
+
+    def test_cache(self, prospect):
+        wavelengths = np.arange(400, 2501, 5)
+
+        assert VegetationIndices.get('NDVI') is VegetationIndices.get('NDVI')
+        assert VegetationIndices.get('NDVI', wavelengths) is VegetationIndices.get('NDVI', list(wavelengths))
+        assert VegetationIndices.get('NDVI') is not VegetationIndices.get(('NDVI',))
+        assert np.allclose(VegetationIndices.get(('NDVI', 'NDWI'))(prospect.ks), prospect.indices(('NDVI', 'NDWI')))
+
+    def test_cache_size(self):
+        first = VegetationIndices.get('NDVI', np.arange(400, 2501, 2))
+
+        for step in range(3, 3 + _ENGINE_CACHE_SIZE):
+            VegetationIndices.get('NDVI', np.arange(400, 2501, step))
+
+        assert len(_engine_cache) == _ENGINE_CACHE_SIZE
+        assert VegetationIndices.get('NDVI', np.arange(400, 2501, 2)) is not first
+        assert VegetationIndices.get(u'NDVI').single
+
+    def test_wavelengths(self, prospect):
+        wavelengths = np.arange(400, 2501, 5)
+        engine = VegetationIndices('NDWI', wavelengths=wavelengths)
+        nir = prospect.ks[:, 455:466:5].mean(axis=1)
+        swir = prospect.ks[:, 835:846:5].mean(axis=1)
+
+        assert np.allclose(engine(prospect.ks[:, ::5]), (nir - swir) / (nir + swir))
+
+    def test_raise_exception(self):
+        with pytest.raises(ValueError):
+            VegetationIndices('XYZ')
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from pyrism import PROSPECT, PROSPECTInversion
+
+
+@pytest.fixture
+def truth():
+    rs = np.random.RandomState(1)
+    n = 20
+    return dict(N=rs.uniform(1.2, 2.5, n), Cab=rs.uniform(10, 80, n), Cxc=rs.uniform(2, 15, n),
+                Cbr=rs.uniform(0, 0.5, n), Cw=rs.uniform(0.005, 0.03, n), Cm=rs.uniform(0.002, 0.015, n))
+
+
+class TestPROSPECTInversion:
+    def test_inversion(self, truth):
+        prospect = PROSPECT.batch(**truth)
+        inversion = PROSPECTInversion(prospect.ks, prospect.kt)
+
+        assert np.all(inversion.converged)
+        for name in inversion.names:
+            assert np.allclose(inversion.params[name], truth[name], rtol=1e-3)
+
+    def test_inversion_fixed(self, truth):
+        prospect = PROSPECT.batch(**truth)
+        inversion = PROSPECTInversion(prospect.ks, prospect.kt, fixed=dict(Cbr=truth['Cbr']))
+
+        assert 'Cbr' not in inversion.names
+        assert np.allclose(inversion.params.Cbr, truth['Cbr'])
+        assert np.allclose(inversion.params.Cab, truth['Cab'], rtol=1e-3)
+
+    def test_inversion_bounds(self, truth):
+        prospect = PROSPECT.batch(**truth)
+        inversion = PROSPECTInversion(prospect.ks, prospect.kt, bounds=dict(Cab=(0, 30)), max_iter=20)
+
+        assert np.all(inversion.params.Cab <= 30)
+        assert inversion.std.Cab.shape == (20,)
+
+    def test_bound(self, truth):
+        truth = dict(truth, Cbr=np.zeros(20))
+        prospect = PROSPECT.batch(**truth)
+        inversion = PROSPECTInversion(prospect.ks, prospect.kt)
+
+        assert np.all(inversion.converged)
+        assert not np.any(inversion.stalled)
+        assert np.allclose(inversion.params.Cbr, 0, atol=1e-6)
+
+    def test_stalled(self):
+        prospect = PROSPECT.batch(N=1.5, Cab=[20, 60], Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+        nan = np.full((1, prospect.ks.shape[1]), np.nan)
+        ks, kt = np.vstack((prospect.ks, nan)), np.vstack((prospect.kt, nan))
+
+        inversion = PROSPECTInversion(ks, kt, bounds=dict(Cab=(0, 30)))
+
+        # The optimum of the second spectrum is on the bound
+        assert np.array_equal(inversion.converged, [True, True, False])
+        assert np.array_equal(inversion.stalled, [False, False, True])
+        assert np.allclose(inversion.params.Cab[:2], [20, 30])
+
+    def test_raise_exception_shape(self, truth):
+        prospect = PROSPECT.batch(**truth)
+        with pytest.raises(AssertionError):
+            PROSPECTInversion(prospect.ks, prospect.kt[:, :-1])
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from pyrism import PROSPECT, SAIL, LSM, LUT
+
+
+@pytest.fixture
+def ranges():
+    return dict(N=(1, 3), Cab=(10, 80), Cw=(0.005, 0.03))
+
+
+class TestLUT:
+    def test_build_prospect(self, tmpdir, ranges):
+        path = str(tmpdir.join('lut'))
+        lut = LUT.build(path, ranges, 25, chunk_size=10, seed=0, fixed=dict(Cm=0.01))
+
+        assert lut.spectra.shape == (25, 2, 2101)
+        assert lut.params.shape == (25, 3)
+        assert lut.names == ['N', 'Cab', 'Cw']
+        assert lut.fixed == dict(Cm=0.01)
+
+        i = 13
+        prospect = PROSPECT(N=lut.params[i, 0], Cab=lut.params[i, 1], Cxc=8, Cbr=0, Cw=lut.params[i, 2], Cm=0.01)
+        assert np.allclose(lut.spectra[i, 0], prospect.ks, atol=1e-6)
+        assert np.allclose(lut.spectra[i, 1], prospect.kt, atol=1e-6)
+
+    def test_chunk_size(self, tmpdir, ranges):
+        first = LUT.build(str(tmpdir.join('first')), ranges, 25, chunk_size=7, seed=3)
+        second = LUT.build(str(tmpdir.join('second')), ranges, 25, chunk_size=25, seed=3)
+
+        assert np.array_equal(first.params, second.params)
+        assert np.array_equal(first.spectra, second.spectra)
+
+    def test_reopen_query(self, tmpdir, ranges):
+        path = str(tmpdir.join('lut'))
+        LUT.build(path, ranges, 50, chunk_size=16, seed=1, wavelengths=np.arange(400, 2501, 50))
+
+        lut = LUT(path)
+        assert isinstance(lut.spectra, np.memmap)
+        assert not lut.spectra.flags.writeable
+        assert np.array_equal(lut.l, np.arange(400, 2501, 50))
+
+        result = lut.query(lut.spectra[17, 0], k=3, chunk_size=8)
+        assert result.index[0] == 17
+        assert result.rmse[0] == 0
+        assert np.all(np.diff(result.rmse) >= 0)
+        assert np.allclose(result.params.Cab[0], lut.params[17, 1])
+
+    def test_build_prosail(self, tmpdir):
+        wavelengths = np.arange(400, 2501, 100)
+        lut = LUT.build(str(tmpdir.join('lut')), dict(Cab=(20, 60), lai=(0.5, 5)), 4, model='prosail', seed=2,
+                        wavelengths=wavelengths, fixed=dict(iza=40, vza=20, raa=30))
+
+        assert lut.spectra.shape == (4, 1, len(wavelengths))
+
+        i = 2
+        prospect = PROSPECT(N=1.5, Cab=lut.params[i, 0], Cxc=8, Cbr=0, Cw=0.01, Cm=0.009, wavelengths=wavelengths)
+        soil = LSM(reflectance=1, moisture=1, wavelengths=wavelengths)
+        sail = SAIL(iza=40, vza=20, raa=30, ks=prospect.ks, kt=prospect.kt, lai=lut.params[i, 1], hotspot=0.01,
+                    rho_surface=soil.ref, wavelengths=wavelengths)
+        assert np.allclose(lut.spectra[i, 0], sail.BRF.ref, atol=1e-5)
+
+    def test_version_d(self, tmpdir, ranges):
+        lut = LUT.build(str(tmpdir.join('lut')), ranges, 5, version='D', seed=0)
+        prospect = PROSPECT(N=lut.params[2, 0], Cab=lut.params[2, 1], Cxc=8, Cbr=0, Cw=lut.params[2, 2], Cm=0.009,
+                            Can=1, version='D')
+
+        assert lut.version == 'D'
+        assert np.allclose(lut.spectra[2, 0], prospect.ks, atol=1e-6)
+
+    def test_raise_exception(self, tmpdir):
+        with pytest.raises(ValueError):
+            LUT.build(str(tmpdir.join('lut')), dict(lai=(0, 1)), 5)
+
+        with pytest.raises(ValueError):
+            LUT.build(str(tmpdir.join('lut')), {}, 5, fixed=dict(N=2))
+
+        with pytest.raises(ValueError):
+            LUT.build(str(tmpdir.join('lut')), dict(N=(1, 2)), 5, model='sail')
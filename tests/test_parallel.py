@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from pyrism import LUT, parallel_map
+
+
+def polynomial(params, order):
+    return np.stack([params['x'] ** i for i in range(order)], axis=1)
+
+
+class TestParallelMap:
+    def test_workers(self, tmpdir):
+        params = dict(x=np.linspace(0, 1, 103))
+
+        serial = parallel_map(polynomial, params, str(tmpdir.join('serial')), chunk_size=10, workers=1,
+                              dtype=np.float64, kwargs=dict(order=3))
+        pool = parallel_map(polynomial, params, str(tmpdir.join('pool')), chunk_size=10, workers=2,
+                            dtype=np.float64, kwargs=dict(order=3))
+
+        assert isinstance(pool, np.memmap)
+        assert pool.shape == (103, 3)
+        assert np.array_equal(serial, pool)
+        assert np.array_equal(pool, polynomial(params, 3))
+
+    def test_raise(self, tmpdir):
+        with pytest.raises(ValueError):
+            parallel_map(polynomial, dict(x=np.ones(5)), str(tmpdir.join('out')), workers=0, kwargs=dict(order=2))
+
+        with pytest.raises(AssertionError):
+            parallel_map(polynomial, dict(x=np.ones(5), y=np.ones(4)), str(tmpdir.join('out')),
+                         kwargs=dict(order=2))
+
+
+class TestLUTWorkers:
+    def test_prosail(self, tmpdir):
+        kwargs = dict(ranges=dict(Cab=(20, 60), lai=(0.5, 5), vza=(0, 40)), n_samples=30, model='prosail',
+                      chunk_size=7, seed=4, wavelengths=np.arange(400, 2501, 100))
+
+        serial = LUT.build(str(tmpdir.join('serial')), **kwargs)
+        pool = LUT.build(str(tmpdir.join('pool')), workers=3, **kwargs)
+
+        assert np.array_equal(serial.params, pool.params)
+        assert np.array_equal(serial.spectra, pool.spectra)
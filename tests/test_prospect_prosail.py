@@ -2,11 +2,11 @@ import os
 from distutils import dir_util
 
 import pytest
-from numpy import allclose, loadtxt, atleast_1d
+from numpy import allclose, loadtxt, atleast_1d, array
 from pytest import fixture
 from scipy.io import loadmat
 
-from pyrism import PROSPECT, SAIL, LSM
+from pyrism import PROSPECT, SAIL, LSM, CanopyGeometry, PROSAIL
 
 
 @fixture
@@ -74,6 +74,336 @@ class TestPROSPECT:
             PROSPECT(N=2.1, Cab=40, Cxc=10., Cbr=0.1, Cw=0.015, Cm=0.009, Can=1, version="d")
 
 
+class TestPROSPECTBatch:
+    def test_batch_prospect5(self):
+        N, Cab, Cxc = array([2.1, 1.5, 1.2]), array([40, 30, 0]), array([10., 8., 0.])
+        Cbr, Cw, Cm = array([0.1, 0.0, 0.0]), array([0.015, 0.01, 0.0]), array([0.009, 0.005, 0.0])
+
+        batch = PROSPECT.batch(N=N, Cab=Cab, Cxc=Cxc, Cbr=Cbr, Cw=Cw, Cm=Cm, version='5')
+        assert batch.ks.shape == (3, 2101)
+
+        for i in range(3):
+            prospect = PROSPECT(N=N[i], Cab=Cab[i], Cxc=Cxc[i], Cbr=Cbr[i], Cw=Cw[i], Cm=Cm[i], version='5')
+            assert allclose(prospect.ks, batch.ks[i], atol=1e-6)
+            assert allclose(prospect.kt, batch.kt[i], atol=1e-6)
+
+    def test_batch_prospectd(self):
+        batch = PROSPECT.batch(N=[1.2, 1.5], Cab=30, Cxc=10., Cbr=0.0, Cw=0.015, Cm=0.009, Can=[1, 2], version="D")
+        prospect = PROSPECT(N=1.2, Cab=30, Cxc=10., Cbr=0.0, Cw=0.015, Cm=0.009, Can=1, version="D")
+
+        assert allclose(prospect.ks, batch.ks[0], atol=1e-6)
+        assert allclose(prospect.kt, batch.kt[0], atol=1e-6)
+
+    def test_tau_fast(self):
+        exact = PROSPECT.batch(N=[1.2, 2.5], Cab=[30, 80], Cxc=10., Cbr=[0.0, 0.5], Cw=0.015, Cm=0.009)
+        fast = PROSPECT.batch(N=[1.2, 2.5], Cab=[30, 80], Cxc=10., Cbr=[0.0, 0.5], Cw=0.015, Cm=0.009,
+                              tau_method='fast')
+
+        assert allclose(exact.ks, fast.ks, atol=1e-6)
+        assert allclose(exact.kt, fast.kt, atol=1e-6)
+
+    def test_raise_exception_tau_method(self):
+        with pytest.raises(ValueError):
+            PROSPECT(N=2.1, Cab=40, Cxc=10., Cbr=0.1, Cw=0.015, Cm=0.009, tau_method="approx")
+
+    def test_interface_cache(self):
+        from pyrism.models.models import _interface_cache
+
+        PROSPECT(N=1.5, Cab=40, Cxc=8., Cbr=0.0, Cw=0.01, Cm=0.009, alpha=35, version="5")
+        coef = _interface_cache[('5', 35.0)]
+        PROSPECT.batch(N=[1.5, 2.0], Cab=40, Cxc=8., Cbr=0.0, Cw=0.01, Cm=0.009, alpha=35, version="5")
+
+        assert _interface_cache[('5', 35.0)] is coef
+
+
+class TestBands:
+    def test_prospect_bands(self):
+        prospect = PROSPECT(N=1.5, Cab=40, Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+
+        assert 'L8' not in prospect.__dict__
+        assert allclose(prospect.L8.B4.ks, prospect.select(636, 673)[0])
+        assert allclose(prospect.ASTER.B3.kt, prospect.select(760, 860)[1])
+        assert 'L8' in prospect.__dict__
+
+    def test_batch_bands(self):
+        prospect = PROSPECT.batch(N=[1.5, 2], Cab=40, Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+        single = PROSPECT(N=2, Cab=40, Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+
+        assert prospect.L8.B5.ks.shape == (2,)
+        assert allclose(prospect.L8.B5.ks[1], single.L8.B5.ks)
+
+    def test_sail_bands(self):
+        prospect = PROSPECT(N=1.5, Cab=40, Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+        soil = LSM(reflectance=1, moisture=0.5)
+        sail = SAIL(iza=30, vza=20, raa=40, ks=prospect.ks, kt=prospect.kt, lai=3, hotspot=0.01,
+                    rho_surface=soil.ref)
+
+        assert 'L8' not in sail.BRF
+        assert allclose(sail.BRF.L8.B4, sail.BRF.ref[236:274].mean())
+        assert allclose(sail.BHR.ASTER.B1, sail.BHR.ref[120:201].mean())
+        assert 'L8' in sail.BRF
+        assert allclose(soil.L8.B4, soil.ref[236:274].mean())
+
+
+class TestSelect:
+    def test_views(self):
+        prospect = PROSPECT(N=1.5, Cab=40, Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+
+        assert prospect.array.shape == (5, 2101)
+        assert prospect.array.flags.c_contiguous
+        assert prospect.ks.base is prospect.array
+        assert allclose(prospect.array[1], prospect.kt)
+
+    def test_select(self):
+        prospect = PROSPECT(N=1.5, Cab=40, Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+        mask = (prospect.l >= 636) & (prospect.l <= 673)
+
+        assert allclose(prospect.select(636, 673), prospect.array[:, mask].mean(axis=1))
+        assert allclose(prospect.select(636.5, 673.5)[0], prospect.ks[237:274].mean())
+        assert allclose(prospect.int[:, 1], prospect.ks)
+
+    def test_select_batch_unsorted(self):
+        prospect = PROSPECT.batch(N=[1.5, 2], Cab=40, Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009,
+                                  wavelengths=[700, 500, 600, 650])
+
+        assert prospect.select(550, 660).shape == (5, 2)
+        assert allclose(prospect.select(550, 660)[0], prospect.ks[:, 2:].mean(axis=1))
+
+
+class TestSAILBatch:
+    def test_batch(self):
+        prospect = PROSPECT.batch(N=[1.5, 2, 1.2], Cab=[40, 20, 60], Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+        soil = LSM(reflectance=[1, 0.8, 1.2], moisture=[0.5, 0.2, 0.9])
+        lai, hotspot, a = array([3, 0, 1.5]), array([0.01, 0.1, 0]), array([57, 30, 70])
+        iza, vza, raa = array([30, 45, 20]), array([20, 10, 20]), array([40, 120, 0])
+
+        sail = SAIL(iza=iza, vza=vza, raa=raa, ks=prospect.ks, kt=prospect.kt, lai=lai, hotspot=hotspot,
+                    rho_surface=soil.ref, a=a)
+
+        assert sail.BRF.ref.shape == (3, 2101)
+        assert sail.kt_iza.shape == (3,)
+
+        for i in range(3):
+            single = SAIL(iza=iza[i], vza=vza[i], raa=raa[i], ks=prospect.ks[i], kt=prospect.kt[i], lai=lai[i],
+                          hotspot=hotspot[i], rho_surface=soil.ref[i], a=a[i])
+
+            for name in ['BRF', 'BHR', 'DHR', 'HDR']:
+                assert allclose(getattr(sail, name).ref[i], getattr(single, name).ref)
+            assert allclose(sail.kt[i], single.kt)
+            assert allclose(sail.BRF.L8.B4[i], single.BRF.L8.B4)
+
+    def test_broadcast(self):
+        prospect = PROSPECT(N=1.5, Cab=40, Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+        soil = LSM(reflectance=1, moisture=0.5)
+
+        sail = SAIL(iza=30, vza=[0, 20, 40], raa=40, ks=prospect.ks, kt=prospect.kt, lai=3, hotspot=0.01,
+                    rho_surface=soil.ref, lidf_type='verhoef', a=-0.35, b=-0.15)
+        single = SAIL(iza=30, vza=40, raa=40, ks=prospect.ks, kt=prospect.kt, lai=3, hotspot=0.01,
+                      rho_surface=soil.ref, lidf_type='verhoef', a=-0.35, b=-0.15)
+
+        assert sail.BRF.ref.shape == (3, 2101)
+        assert allclose(sail.BRF.ref[2], single.BRF.ref)
+        assert single.BRF.ref.shape == (2101,)
+
+    def test_hotspot_steps(self):
+        prospect = PROSPECT(N=1.5, Cab=40, Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+        soil = LSM(reflectance=1, moisture=0.5)
+        kwargs = dict(iza=30, vza=[25, 10, 30], raa=[10, 90, 180], ks=prospect.ks, kt=prospect.kt, lai=3,
+                      hotspot=0.2, rho_surface=soil.ref)
+
+        fine = SAIL(hotspot_steps=200, **kwargs)
+        default = SAIL(**kwargs)
+        coarse = SAIL(hotspot_steps=5, **kwargs)
+
+        assert allclose(default.BRF.ref, fine.BRF.ref, atol=5e-4)
+        assert allclose(coarse.BRF.ref, fine.BRF.ref, atol=5e-3)
+
+        with pytest.raises(ValueError):
+            SAIL(hotspot_steps=0, **kwargs)
+
+    def test_raise_exception_rows(self):
+        prospect = PROSPECT.batch(N=[1.5, 2], Cab=40, Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+        soil = LSM(reflectance=1, moisture=0.5)
+
+        with pytest.raises(AssertionError):
+            SAIL(iza=30, vza=20, raa=40, ks=prospect.ks, kt=prospect.kt, lai=[1, 2, 3], hotspot=0.01,
+                 rho_surface=soil.ref)
+
+
+class TestCanopyGeometry:
+    def test_from_geometry(self):
+        prospect = PROSPECT.batch(N=[1.5, 2, 1.2], Cab=[40, 20, 60], Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+        soil = LSM(reflectance=1, moisture=0.5)
+        geometry = CanopyGeometry(iza=30, vza=[0, 20, 40], raa=40, lidf_type='verhoef', a=-0.35, b=-0.15)
+
+        sail = SAIL.from_geometry(geometry, ks=prospect.ks, kt=prospect.kt, lai=3, hotspot=0.01,
+                                  rho_surface=soil.ref)
+        direct = SAIL(iza=30, vza=[0, 20, 40], raa=40, ks=prospect.ks, kt=prospect.kt, lai=3, hotspot=0.01,
+                      rho_surface=soil.ref, lidf_type='verhoef', a=-0.35, b=-0.15)
+
+        assert sail.VollScat is geometry
+        assert allclose(sail.izaDeg, direct.izaDeg)
+        for name in ['BRF', 'BHR', 'DHR', 'HDR']:
+            assert allclose(getattr(sail, name).ref, getattr(direct, name).ref)
+
+    def test_raise_exception(self):
+        with pytest.raises(AssertionError):
+            CanopyGeometry(iza=30, vza=20, raa=0, lidf_type='nilson')
+
+
+class TestSAILPlan:
+    def test_plan(self):
+        prospect = PROSPECT.batch(N=[1.5, 2, 1.2], Cab=[40, 20, 60], Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+        soil = LSM(reflectance=1, moisture=0.5)
+        plan = SAIL.prepare(iza=30, vza=[0, 20, 40], raa=40, lai=[3, 0, 1], hotspot=0.01)
+
+        for i in range(3):
+            sail = plan(ks=prospect.ks[i], kt=prospect.kt[i], rho_surface=soil.ref)
+            direct = SAIL(iza=30, vza=[0, 20, 40], raa=40, ks=prospect.ks[i], kt=prospect.kt[i], lai=[3, 0, 1],
+                          hotspot=0.01, rho_surface=soil.ref)
+
+            assert sail.plan is plan
+            assert sail.BRF.ref.shape == (3, 2101)
+            for name in ['BRF', 'BHR', 'DHR', 'HDR']:
+                assert allclose(getattr(sail, name).ref, getattr(direct, name).ref)
+
+    def test_single(self):
+        prospect = PROSPECT(N=1.5, Cab=40, Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+        soil = LSM(reflectance=1, moisture=0.5)
+        plan = SAIL.prepare(iza=30, vza=20, raa=40, lai=3, hotspot=0.01)
+
+        assert plan(prospect.ks, prospect.kt, soil.ref).BRF.ref.shape == (2101,)
+
+        with pytest.raises(AssertionError):
+            SAIL.prepare(iza=30, vza=[0, 20, 40], raa=40, lai=[3, 1], hotspot=0.01)
+
+
+class TestSAILOutputs:
+    def test_outputs(self):
+        prospect = PROSPECT(N=1.5, Cab=40, Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+        soil = LSM(reflectance=1, moisture=0.5)
+        kwargs = dict(iza=30, vza=[0, 20, 40], raa=40, ks=prospect.ks, kt=prospect.kt, lai=[3, 0, 1],
+                      hotspot=0.01, rho_surface=soil.ref)
+
+        full = SAIL(**kwargs)
+
+        for outputs in ['BRF', 'BRDF', 'BHR', 'DHR', 'HDR']:
+            sail = SAIL(outputs=outputs, **kwargs)
+
+            assert allclose(getattr(sail, outputs).ref, getattr(full, outputs).ref)
+            assert allclose(getattr(sail, outputs).refdB, getattr(full, outputs).refdB)
+            assert allclose(sail.kt, full.kt)
+            assert not hasattr(sail, 'canopy')
+
+        sail = SAIL(outputs=('canopy', 'DHR'), **kwargs)
+        assert allclose(sail.canopy.BRF, full.canopy.BRF)
+        assert allclose(sail.DHR.ref, full.DHR.ref)
+        assert not hasattr(sail, 'BRF')
+
+    def test_raise_exception(self):
+        prospect = PROSPECT(N=1.5, Cab=40, Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+        soil = LSM(reflectance=1, moisture=0.5)
+
+        with pytest.raises(ValueError):
+            SAIL(iza=30, vza=20, raa=40, ks=prospect.ks, kt=prospect.kt, lai=3, hotspot=0.01, rho_surface=soil.ref,
+                 outputs=('BRF', 'albedo'))
+
+
+class TestSAILCouple:
+    def test_couple(self):
+        prospect = PROSPECT.batch(N=[1.5, 2], Cab=[40, 20], Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+        soils = LSM(reflectance=[0.5, 1, 1.5], moisture=[0.1, 0.3, 0.8])
+        kwargs = dict(iza=30, vza=20, raa=40, ks=prospect.ks, kt=prospect.kt, lai=[3, 0], hotspot=0.01)
+
+        sail = SAIL(rho_surface=soils.ref[0], outputs=('BRF', 'DHR'), **kwargs)
+        coupled = sail.couple(soils.ref)
+
+        assert coupled.BRF.ref.shape == (3, 2, 2101)
+        for i in range(3):
+            direct = SAIL(rho_surface=soils.ref[i], **kwargs)
+
+            assert allclose(coupled.BRF.ref[i], direct.BRF.ref)
+            assert allclose(coupled.DHR.ref[i], direct.DHR.ref)
+            assert allclose(sail.couple(soils.ref[i], outputs='BHR').BHR.ref, direct.BHR.ref)
+
+    def test_single(self):
+        prospect = PROSPECT(N=1.5, Cab=40, Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+        soils = LSM(reflectance=[0.5, 1, 1.5], moisture=0.3)
+
+        sail = SAIL(iza=30, vza=20, raa=40, ks=prospect.ks, kt=prospect.kt, lai=3, hotspot=0.01,
+                    rho_surface=soils.ref[0], outputs='BRF')
+
+        assert sail.couple(soils.ref).BRF.ref.shape == (3, 2101)
+        assert allclose(sail.couple(soils.ref[0]).BRF.ref, sail.BRF.ref)
+
+        with pytest.raises(ValueError):
+            SAIL(iza=30, vza=20, raa=40, ks=prospect.ks, kt=prospect.kt, lai=3, hotspot=0.01,
+                 rho_surface=soils.ref[0], outputs='BHR').couple(soils.ref, outputs='BRF')
+
+
+class TestSAILMultiangle:
+    def test_multiangle(self):
+        prospect = PROSPECT.batch(N=[1.5, 2, 1.2], Cab=[40, 20, 60], Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+        soil = LSM(reflectance=[1, 0.5, 0.8], moisture=0.5)
+        lai, hotspot, a = [3, 1, 0], [0.01, 0.1, 0.05], [57, 40, 20]
+        vza, raa = [0, 10, 20, 30, 40], [0, 45, 90, 135, 180]
+
+        sail = SAIL(iza=30, vza=vza, raa=raa, ks=prospect.ks, kt=prospect.kt, lai=lai, hotspot=hotspot,
+                    rho_surface=soil.ref, a=a, multiangle=True)
+
+        assert sail.BRF.ref.shape == (3, 5, 2101)
+        assert sail.kt.shape == (3, 5)
+
+        for i in range(3):
+            single = SAIL(iza=30, vza=vza, raa=raa, ks=prospect.ks[i], kt=prospect.kt[i], lai=lai[i],
+                          hotspot=hotspot[i], rho_surface=soil.ref[i], a=a[i])
+
+            for name in ['BRF', 'BHR', 'DHR', 'HDR']:
+                assert allclose(getattr(sail, name).ref[i], getattr(single, name).ref)
+            assert allclose(sail.kt[i], single.kt)
+
+    def test_single(self):
+        prospect = PROSPECT(N=1.5, Cab=40, Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+        soils = LSM(reflectance=[1, 0.5], moisture=0.5)
+
+        sail = SAIL(iza=30, vza=[0, 20, 40], raa=0, ks=prospect.ks, kt=prospect.kt, lai=3, hotspot=0.01,
+                    rho_surface=soils.ref[0], multiangle=True)
+
+        assert sail.BRF.ref.shape == (3, 2101)
+        assert sail.couple(soils.ref).BRF.ref.shape == (2, 3, 2101)
+        assert allclose(sail.couple(soils.ref).BRF.ref[0], sail.BRF.ref)
+
+
+class TestSAILHemisphere:
+    def test_bare_soil(self):
+        prospect = PROSPECT(N=1.5, Cab=40, Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+        soil = LSM(reflectance=1, moisture=0.5)
+
+        hemisphere = SAIL.hemisphere(30, prospect.ks, prospect.kt, lai=0, hotspot=0.01, rho_surface=soil.ref)
+
+        assert hemisphere.BRDF.shape == (96, 2101)
+        assert allclose(hemisphere.weights.sum(), 1)
+        assert allclose(hemisphere.black_sky, soil.ref)
+        assert allclose(hemisphere.white_sky, soil.ref)
+
+    def test_convergence(self):
+        prospect = PROSPECT.batch(N=[1.5, 2], Cab=[40, 20], Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+        soil = LSM(reflectance=1, moisture=0.5)
+        args = (30, prospect.ks, prospect.kt, [3, 1], 0.01, soil.ref)
+
+        coarse = SAIL.hemisphere(*args)
+        fine = SAIL.hemisphere(*args, n_zenith=24, n_azimuth=36)
+        sail = SAIL(30, 0, 0, *args[1:])
+
+        assert coarse.BRDF.shape == (2, 96, 2101)
+        assert allclose(coarse.black_sky, fine.black_sky, atol=1e-3)
+        assert allclose(coarse.white_sky, fine.white_sky, atol=1e-3)
+        assert allclose(coarse.black_sky, sail.DHR.ref, atol=0.05)
+
+        with pytest.raises(ValueError):
+            SAIL.hemisphere([30, 40], *args[1:])
+
+
 class TestPROSAIL:
     def test_sdr_prosail5(self, datadir):
         fname = datadir("REFL_CAN.txt")
@@ -120,6 +450,104 @@ class TestPROSAIL:
         assert allclose(dhr, sail.DHR.ref, atol=0.01)
 
 
+class TestPROSAILFused:
+    def test_reference(self, datadir):
+        fname = datadir("REFL_CAN.txt")
+        w, resv, hdr, sdr, bhr, dhr = loadtxt(fname, unpack=True)
+
+        prosail = PROSAIL(iza=30, vza=10, raa=0, N=1.5, Cab=40, Cxc=8., Cbr=0.0, Cw=0.01, Cm=0.009, lai=3,
+                          hotspot=0.01, a=-0.35, b=-0.15, lidf_type='verhoef', outputs=('BRF', 'HDR', 'BHR', 'DHR'))
+
+        assert prosail.BRF.shape == (2101,)
+        assert allclose(sdr, prosail.BRF, atol=0.01)
+        assert allclose(hdr, prosail.HDR, atol=0.01)
+        assert allclose(bhr, prosail.BHR, atol=0.01)
+        assert allclose(dhr, prosail.DHR, atol=0.01)
+        assert not hasattr(prosail, 'BRDF')
+
+    def test_batch(self):
+        Cab, lai, reflectance = [10, 40, 80], [0, 3, 5], [0.5, 1, 1.5]
+
+        prosail = PROSAIL(iza=30, vza=10, raa=0, N=1.5, Cab=Cab, Cxc=8, Cbr=0, Cw=0.01, Cm=0.009, lai=lai,
+                          hotspot=0.01, reflectance=reflectance, moisture=0.3, outputs=('BRF', 'BRDF'))
+
+        prospect = PROSPECT.batch(N=1.5, Cab=Cab, Cxc=8, Cbr=0, Cw=0.01, Cm=0.009)
+        soil = LSM(reflectance=reflectance, moisture=0.3)
+        sail = SAIL(iza=30, vza=10, raa=0, ks=prospect.ks, kt=prospect.kt, lai=lai, hotspot=0.01,
+                    rho_surface=soil.ref)
+
+        assert prosail.BRF.shape == (3, 2101)
+        assert allclose(prosail.BRF, sail.BRF.ref)
+        assert allclose(prosail.BRDF, sail.BRDF.ref)
+
+    def test_multiangle(self):
+        prosail = PROSAIL(iza=[20, 30, 40], vza=10, raa=0, N=1.5, Cab=[20, 40], Cxc=8, Cbr=0, Cw=0.01, Cm=0.009,
+                          lai=3, hotspot=0.01, outputs='HDR', multiangle=True, wavelengths=[500, 600, 700])
+
+        assert prosail.HDR.shape == (2, 3, 3)
+
+        with pytest.raises(ValueError):
+            PROSAIL(iza=30, vza=10, raa=0, N=1.5, Cab=40, Cxc=8, Cbr=0, Cw=0.01, Cm=0.009, lai=3, hotspot=0.01,
+                    outputs='canopy')
+
+        with pytest.raises(AssertionError):
+            PROSAIL(iza=30, vza=10, raa=0, N=1.5, Cab=[20, 40], Cxc=8, Cbr=0, Cw=0.01, Cm=0.009, lai=3,
+                    hotspot=0.01, reflectance=[0.5, 1, 1.5])
+
+
+class TestJacobian:
+    @pytest.mark.parametrize("version", ['5', 'D'])
+    def test_jacobian_finite_differences(self, version):
+        params = dict(N=array([1.6, 2.3]), Cab=array([40., 10.]), Cxc=array([8., 2.]), Cbr=array([0.3, 0.]),
+                      Cw=array([0.012, 0.03]), Cm=array([0.006, 0.01]), Can=array([2., 1.]))
+
+        jacobian = PROSPECT.batch(version=version, **params).jacobian()
+
+        for i, name in enumerate(jacobian.names):
+            h = 1e-6 * (1 + abs(params[name]))
+            upper, lower = dict(params), dict(params)
+            upper[name] = params[name] + h
+            lower[name] = params[name] - h
+            upper = PROSPECT.batch(version=version, **upper)
+            lower = PROSPECT.batch(version=version, **lower)
+
+            assert allclose((upper.ks - lower.ks) / (2 * h[:, None]), jacobian.ks[..., i], atol=1e-6)
+            assert allclose((upper.kt - lower.kt) / (2 * h[:, None]), jacobian.kt[..., i], atol=1e-6)
+
+    def test_jacobian_shape(self):
+        prospect = PROSPECT(N=1.5, Cab=40, Cxc=8., Cbr=0.0, Cw=0.01, Cm=0.009, version="5")
+        jacobian = prospect.jacobian()
+
+        assert jacobian.ks.shape == (2101, 7)
+        assert jacobian.kt.shape == (2101, 7)
+
+
+class TestWavelengths:
+    def test_prospect_wavelengths(self):
+        wavelengths = array([450, 550, 670, 865, 1610, 2200])
+        prospect = PROSPECT(N=1.5, Cab=40, Cxc=8., Cbr=0.0, Cw=0.01, Cm=0.009, version="5")
+        subset = PROSPECT(N=1.5, Cab=40, Cxc=8., Cbr=0.0, Cw=0.01, Cm=0.009, version="5", wavelengths=wavelengths)
+
+        assert allclose(prospect.ks[wavelengths - 400], subset.ks)
+        assert allclose(prospect.kt[wavelengths - 400], subset.kt)
+
+    def test_prosail_wavelengths(self, datadir):
+        fname = datadir("REFL_CAN.txt")
+        w, resv, hdr, sdr, bhr, dhr = loadtxt(fname, unpack=True)
+        wavelengths = array(range(400, 2501, 10))
+
+        lsm = LSM(reflectance=1, moisture=1, wavelengths=wavelengths)
+        prospect = PROSPECT(N=1.5, Cab=40, Cxc=8., Cbr=0.0, Cw=0.01, Cm=0.009, version="5", wavelengths=wavelengths)
+        sail = SAIL(iza=30, vza=10, raa=0, ks=prospect.ks, kt=prospect.kt, lai=3, hotspot=0.01, rho_surface=lsm.ref,
+                    a=-0.35, b=-0.15, lidf_type='verhoef', wavelengths=wavelengths)
+
+        assert allclose(sdr[wavelengths - 400], sail.BRF.ref, atol=0.01)
+
+    def test_raise_exception_wavelengths(self):
+        with pytest.raises(ValueError):
+            PROSPECT(N=1.5, Cab=40, Cxc=8., Cbr=0.0, Cw=0.01, Cm=0.009, wavelengths=[350, 500])
+
+
 class TestPROSAILError:
     def test_ks(self, datadir):
         fname = datadir("REFL_CAN.txt")
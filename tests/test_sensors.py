@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from pyrism import PROSPECT, Sensor, SENSORS
+
+
+@pytest.fixture
+def spectra():
+    return PROSPECT.batch(N=[1.2, 1.8, 2.5], Cab=[20, 40, 60], Cxc=8, Cbr=0, Cw=0.01, Cm=0.009).ks
+
+
+class TestSensor:
+    def test_registry(self):
+        for name in ['L8', 'ASTER', 'S2', 'MODIS']:
+            assert SENSORS[name].response.shape == (len(SENSORS[name].bands), 2101)
+            assert np.allclose(SENSORS[name].response.sum(axis=1), 1)
+
+    def test_boxcar(self, spectra):
+        bands = SENSORS['L8'](spectra)
+
+        assert bands.shape == (3, 6)
+        assert np.allclose(bands[:, 2], spectra[:, 236:274].mean(axis=1))
+
+    def test_gaussian(self):
+        sensor = Sensor.gaussian('test', ('B1',), [1000], [20])
+        l = np.arange(400, 2501)
+
+        assert np.allclose(sensor(l), 1000)
+        assert np.allclose(sensor(np.ones(2101)), 1)
+
+    def test_tabulated(self):
+        sensor = Sensor.tabulated('test', ('B1', 'B2'), [500, 510, 520], [[0, 1, 0], [1, 1, 1]])
+
+        assert np.allclose(sensor.response[0, 100:121].sum(), 1)
+        assert np.allclose(sensor.response[0, 110], 0.1)
+        assert np.allclose(sensor.response[1, 100:121], 1 / 21.)
+
+    def test_wavelengths(self, spectra):
+        wavelengths = np.arange(400, 2501, 10)
+        bands = SENSORS['ASTER'](spectra[:, ::10], wavelengths)
+
+        assert np.allclose(bands[:, 0], spectra[:, 120:201:10].mean(axis=1))
+        assert np.isnan(SENSORS['ASTER'](np.ones(3), [400, 410, 420])).all()
+
+    def test_raise_exception(self):
+        with pytest.raises(AssertionError):
+            Sensor('test', ('B1', 'B2'), np.ones((1, 2101)))
+
+        with pytest.raises(ValueError):
+            SENSORS['L8'].weights([300, 500])
+
+        with pytest.raises(ValueError):
+            SENSORS['L8'].weights([500, 550.9])
+
+        with pytest.raises(ValueError):
+            SENSORS['L8'].weights([500, 550, 550])
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from pyrism import SAIL, PROSPECT, LSM, solar_position, sun_sensor_geometry
+from pyrism.core.solar import julian_day
+
+
+class TestSolarPosition:
+    def test_julian_day(self):
+        assert np.allclose(julian_day('2000-01-01T12:00'), 2451545.)
+
+    @pytest.mark.parametrize("time, declination, equation_of_time", [
+        ('2020-06-20T21:44', 23.44, -1.8),
+        ('2020-03-20T03:50', 0.0, -7.4),
+        ('2020-11-03T12:00', -15.3, 16.5),
+        ('2020-02-11T12:00', -14.1, -14.2),
+    ])
+    def test_declination(self, time, declination, equation_of_time):
+        sun = solar_position(time, 0, 0)
+
+        assert np.allclose(sun.declination, declination, atol=0.05)
+        assert np.allclose(sun.equation_of_time, equation_of_time, atol=0.1)
+
+    def test_noon(self):
+        # At solar noon the sun is in the south (north) and the zenith is |latitude - declination|
+        sun = solar_position('2020-06-20T12:00', [48., -33.], 0)
+        noon = np.datetime64('2020-06-20T12:00') - np.timedelta64(int(round(sun.equation_of_time[0] * 60)), 's')
+        sun = solar_position(noon, [48., -33.], 0)
+
+        assert np.allclose(sun.zenith, np.abs([48., -33.] - sun.declination), atol=0.01)
+        assert np.allclose(sun.azimuth, [180., 0.], atol=0.1)
+
+    def test_broadcast(self):
+        times = np.arange('2020-01-01T06', '2020-01-01T18', np.timedelta64(1, 'h'), dtype='datetime64[m]')
+        sun = solar_position(times[:, np.newaxis], [48., -33., 10.], [16., 151., -60.])
+
+        assert sun.zenith.shape == (12, 3)
+        assert np.allclose(sun.zenith[4, 1], solar_position(times[4], -33., 151.).zenith)
+
+
+class TestSunSensorGeometry:
+    def test_geometry(self):
+        geometry = sun_sensor_geometry('2020-06-21T10:00', 48, 16, vza=10, vaa=[100, 350])
+
+        assert np.allclose(geometry.iza, solar_position('2020-06-21T10:00', 48, 16).zenith)
+        assert np.all((geometry.raa >= 0) & (geometry.raa <= 180))
+        assert np.allclose(geometry.raa[0], np.abs(geometry.saa[0] - 100))
+        assert np.allclose(geometry.raa[1], 360 - np.abs(geometry.saa[1] - 350))
+
+    def test_sail(self):
+        times = np.arange('2020-06-21T08', '2020-06-21T16', np.timedelta64(2, 'h'), dtype='datetime64[m]')
+        geometry = sun_sensor_geometry(times, 48, 16, vza=5, vaa=90)
+
+        prospect = PROSPECT(N=1.5, Cab=40, Cxc=8, Cbr=0.1, Cw=0.01, Cm=0.009)
+        soil = LSM(reflectance=1, moisture=0.5)
+        sail = SAIL(iza=geometry.iza, vza=geometry.vza, raa=geometry.raa, ks=prospect.ks, kt=prospect.kt, lai=3,
+                    hotspot=0.01, rho_surface=soil.ref)
+
+        assert sail.BRF.ref.shape == (4, 2101)
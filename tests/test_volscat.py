@@ -50,3 +50,54 @@ class TestVolScatVerhoef:
         res = (vol.ks[0], vol.ko[0], vol.bf, vol.Fs[0], vol.Ft[0])
         true = (ks, ko, bf, Fs, Ft)
         assert np.allclose(res, true, atol=1e-4)
+
+
+class TestVolScatArray:
+    def test_geometries(self):
+        iza, vza, raa = [50, 0, 30, 45], [30, 0, 30, 100], [50, 0, 0, 20]
+        vol = VolScatt(iza, vza, raa)
+        vol.coef(a=-0.35, b=-0.15, lidf_type='verhoef')
+
+        for i in range(len(iza)):
+            single = VolScatt(iza[i], vza[i], raa[i])
+            single.coef(a=-0.35, b=-0.15, lidf_type='verhoef')
+            assert np.allclose([vol.ks[i], vol.ko[i], vol.Fs[i], vol.Ft[i]],
+                               [single.ks[0], single.ko[0], single.Fs[0], single.Ft[0]])
+
+    def test_volume_shape(self):
+        vol = VolScatt([50, 20, 10], [30, 10, 0], [50, 0, 120])
+        lza = np.arange(5, 90, 10)
+
+        chi_s, chi_o, frho, ftau = vol.volume(lza)
+        assert chi_s.shape == (3, 9)
+        assert np.all(frho >= 0) and np.all(ftau >= 0)
+        assert np.allclose(vol.volume(lza[4])[2], frho[:, 4])
+
+
+class TestLIDFArray:
+    def test_verhoef(self):
+        a, b = np.array([-0.35, 0, 1, 1.5]), np.array([-0.15, 0, 0, 0])
+        lidf = LIDF.verhoef(a, b)
+
+        assert lidf.shape == (4, 18)
+        assert np.allclose(lidf.sum(axis=1), 1)
+        for i in range(len(a)):
+            assert np.allclose(lidf[i], LIDF.verhoef(a[i], b[i]))
+
+    def test_campbell(self):
+        a = np.array([10, 40, 57, 80])
+        lidf = LIDF.campbell(a)
+
+        assert lidf.shape == (4, 18)
+        for i in range(len(a)):
+            assert np.allclose(lidf[i], LIDF.campbell(a[i]))
+
+    def test_cache(self):
+        lidf = LIDF.get('verhoef', -0.35, -0.15)
+
+        assert lidf is LIDF.get('verhoef', -0.35, -0.15)
+        assert not lidf.flags.writeable
+        assert np.allclose(LIDF.get('campbell', [57, 20, 57]), LIDF.campbell([57, 20, 57]))
+
+        with pytest.raises(AttributeError):
+            LIDF.get('nilson', 57)